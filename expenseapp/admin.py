@@ -1,15 +1,19 @@
 from django.contrib import admin
 from .models import (
-    BudgetPlan, User, Account, Transaction, Bill, Stock, 
-    DateStockPrice, PortfolioValue, OverdueBillMessage
+    BudgetPlan, User, Account, Transaction, Bill, Security, Holding, StockJob,
+    DateStockPrice, PortfolioValue, OverdueBillMessage, DailyCategorySpend, RetentionCheckpoint
 )
 
 admin.site.register(User)
 admin.site.register(Account)
 admin.site.register(Transaction)
+admin.site.register(DailyCategorySpend)
 admin.site.register(BudgetPlan)
 admin.site.register(Bill)
-admin.site.register(Stock)
+admin.site.register(Security)
+admin.site.register(Holding)
+admin.site.register(StockJob)
 admin.site.register(DateStockPrice)
 admin.site.register(PortfolioValue)
-admin.site.register(OverdueBillMessage)
\ No newline at end of file
+admin.site.register(OverdueBillMessage)
+admin.site.register(RetentionCheckpoint)
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ExpenseappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenseapp'
+
+    def ready(self):
+        # connect the receivers that invalidate the cached analytics
+        from . import signals
@@ -1,4 +1,12 @@
 from .utils import *
 from .expense_finance import *
 from .budget_finance import *
+from .market_data import *
 from .stock_finance import *
+from .rollup_finance import *
+from .analytics_cache import *
+from .ledger_finance import *
+from .import_finance import *
+from .retention_finance import *
+from .partition_finance import *
+from .archive_finance import *
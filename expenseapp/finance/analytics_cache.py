@@ -0,0 +1,60 @@
+""" THESE ARE FUNCTIONS CACHING THE ANALYTICS OF THE SUMMARY ENDPOINTS, PER USER AND DATA VERSION """
+
+from typing import Callable, Dict
+import time as clock
+from django.core.cache import cache
+from django.db import transaction
+from datetime import date, datetime, time, timedelta
+from .utils import get_period_calendar
+
+
+# the cache key of the version of the user's data
+def data_version_key(user_id: int) -> str:
+    return f"analytics:data_version:{user_id}"
+
+
+# a new version of the data, the time in nanoseconds, so the version evicted from the cache is never given again
+def new_data_version() -> int:
+    return clock.time_ns()
+
+
+# return the current version of the user's data
+def get_data_version(user_id: int) -> int:
+    version = cache.get(data_version_key(user_id))
+    if version is None: # the version was never set, or has been evicted
+        # add() does nothing if another request has just set the version
+        cache.add(data_version_key(user_id), new_data_version(), timeout=None)
+        version = cache.get(data_version_key(user_id), new_data_version())
+    return version
+
+
+"""
+    bump the version of the user's data, so that the cached analytics of the older version are never read again
+    this should be called whenever the user's transactions, accounts, bills, or budget plans change
+    the version is only bumped once the changes are committed, otherwise the concurrent request could cache 
+    the analytics of the uncommitted data under the new version
+"""
+def bump_data_version(user_id: int) -> None:
+    transaction.on_commit(lambda: cache.set(data_version_key(user_id), new_data_version(), timeout=None))
+
+
+# the number of seconds from now till the (local) midnight
+def seconds_until_midnight() -> int:
+    next_midnight = datetime.combine(date.today() + timedelta(days=1), time.min)
+    return max(int((next_midnight - datetime.now()).total_seconds()), 1)
+
+
+"""
+    return the cached response data of the endpoint for the user (and the scope, like the account's pk)
+    otherwise, compute the response data and cache it until the data changes or the date changes,
+    since the current periods depend on the period calendar of today
+"""
+def cached_analytics(endpoint: str, user_id: int, compute_response: Callable[[], Dict], scope=None) -> Dict:
+    today = get_period_calendar().today
+    cache_key = f"analytics:{endpoint}:{user_id}:{scope}:v{get_data_version(user_id)}:{today.isoformat()}"
+
+    response_data = cache.get(cache_key)
+    if response_data is None:
+        response_data = compute_response()
+        cache.set(cache_key, response_data, timeout=seconds_until_midnight())
+    return response_data
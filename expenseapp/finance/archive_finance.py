@@ -0,0 +1,291 @@
+"""
+THESE ARE FUNCTIONS ARCHIVING THE EXPIRED TRANSACTIONS TO COMPRESSED COLUMNAR FILES (NUMPY .npz) ON THE LOCAL DISK
+ONE FILE PER MONTH AND SHARD OF USERS, SO THE ANALYTICS OF THE OLD MONTHS ARE READ FROM THEM INSTEAD OF THE DATABASE
+"""
+
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+from pathlib import Path
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+from threading import Lock
+import json
+import os
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from expenseapp.models import Account, Transaction, category_dict
+from .rollup_finance import to_local_date
+from .partition_finance import add_months, month_starts
+
+# the code of each category in the archive, in the same order as category_dict
+ARCHIVE_CATEGORIES = list(category_dict.keys())
+ARCHIVE_CATEGORY_CODES = {category: code for code, category in enumerate(ARCHIVE_CATEGORIES)}
+
+# the first date the local dates of the archive are counted from
+ARCHIVE_EPOCH = date(1970, 1, 1)
+
+# the columns of the archive read by the analytics, the descriptions are only read to rewrite the file
+ANALYTICS_COLUMNS = ["id", "user_id", "account_id", "occur_date", "local_date", "category", "amount_cents"]
+
+# the columns of the archive files read by the analytics, the most recently used ones are at the end
+archive_file_cache = OrderedDict()
+archive_file_cache_bytes = 0
+archive_file_cache_lock = Lock()
+
+# the horizon of the archive along with the (path, modified time) of the file it was read from
+cached_archive_horizon = (None, None)
+
+
+# the directory of the archive
+def archive_dir() -> Path:
+    return Path(getattr(settings, "TRANSACTION_ARCHIVE_DIR"))
+
+
+# the shard of the user in the archive
+def archive_shard(user_id: int) -> int:
+    return user_id % getattr(settings, "TRANSACTION_ARCHIVE_SHARDS", 64)
+
+
+# the file of the archived transactions of the month of the shard of users
+def archive_path(this_month: date, shard: int) -> Path:
+    return archive_dir() / f"{this_month.year}-{this_month.month:02d}" / f"shard-{shard:03d}.npz"
+
+
+"""
+    the first date that isn't archived, the transactions before it are read from the archive only
+    (None if nothing has been archived yet), the rows before it still in the database are ignored until they are deleted
+"""
+def get_archive_horizon() -> date:
+    global cached_archive_horizon
+    horizon_path = archive_dir() / "horizon.json"
+    try:
+        horizon_version = (horizon_path, horizon_path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    # the file is only read again after it's replaced by set_archive_horizon()
+    cached_version, horizon = cached_archive_horizon
+    if cached_version != horizon_version:
+        with open(horizon_path) as horizon_file:
+            horizon = date.fromisoformat(json.load(horizon_file)["archived_before"])
+        cached_archive_horizon = (horizon_version, horizon)
+    return horizon
+
+
+# move the horizon of the archive to the given date, it never goes back
+def set_archive_horizon(horizon: date) -> None:
+    current_horizon = get_archive_horizon()
+    if current_horizon is not None and current_horizon >= horizon:
+        return
+    archive_dir().mkdir(parents=True, exist_ok=True)
+    temporary_path = archive_dir() / "horizon.json.tmp"
+    with open(temporary_path, "w") as horizon_file:
+        json.dump({"archived_before": horizon.isoformat()}, horizon_file)
+    os.replace(temporary_path, archive_dir() / "horizon.json")
+
+
+"""
+    the analytics columns of the archive file, read only once until the file changes
+    the files are kept in the memory up to TRANSACTION_ARCHIVE_CACHE_MAX_MEMORY bytes, the least recently used ones are evicted
+"""
+def load_archive_file(path: Path, modified_time: float) -> Dict[str, np.ndarray]:
+    global archive_file_cache_bytes
+    cache_key = (path, modified_time)
+    with archive_file_cache_lock:
+        if cache_key in archive_file_cache:
+            archive_file_cache.move_to_end(cache_key)
+            return archive_file_cache[cache_key]
+
+    with np.load(path, allow_pickle=False) as archive_file:
+        columns = {column: archive_file[column] for column in ANALYTICS_COLUMNS}
+    num_bytes = sum(values.nbytes for values in columns.values())
+
+    max_memory_bytes = getattr(settings, "TRANSACTION_ARCHIVE_CACHE_MAX_MEMORY", 32 * 1024 * 1024)
+    with archive_file_cache_lock:
+        # the file larger than the whole cache is read every time instead
+        if num_bytes <= max_memory_bytes and cache_key not in archive_file_cache:
+            archive_file_cache[cache_key] = columns
+            archive_file_cache_bytes += num_bytes
+        while archive_file_cache_bytes > max_memory_bytes:
+            _, evicted = archive_file_cache.popitem(last=False)
+            archive_file_cache_bytes -= sum(values.nbytes for values in evicted.values())
+    return columns
+
+
+# the analytics columns of the archive file, None if there is no file
+def read_archive_file(path: Path) -> Dict[str, np.ndarray]:
+    try:
+        return load_archive_file(path, path.stat().st_mtime)
+    except FileNotFoundError:
+        return None
+
+
+# all of the columns of the archive file including the descriptions, to rewrite it, None if there is no file
+def read_full_archive_file(path: Path) -> Dict[str, np.ndarray]:
+    try:
+        archive_file = np.load(path, allow_pickle=False)
+    except FileNotFoundError:
+        return None
+    with archive_file:
+        columns = {column: archive_file[column] for column in ANALYTICS_COLUMNS}
+        columns["description"] = decode_descriptions(archive_file["description_bytes"], archive_file["description_offsets"])
+    return columns
+
+
+"""
+    the descriptions as one array of their UTF-8 bytes, along with the offset of each description in it, 
+    so each description takes its own length instead of the length of the longest one 
+"""
+def encode_descriptions(descriptions: np.ndarray) -> Dict[str, np.ndarray]:
+    encoded_descriptions = [description.encode() for description in descriptions]
+    description_offsets = np.zeros(len(encoded_descriptions) + 1, dtype=np.int64)
+    np.cumsum([len(encoded) for encoded in encoded_descriptions], out=description_offsets[1:])
+    return {
+        "description_bytes": np.frombuffer(b"".join(encoded_descriptions), dtype=np.uint8),
+        "description_offsets": description_offsets,
+    }
+
+
+# the descriptions (as the array of the strings) of the bytes and offsets of encode_descriptions()
+def decode_descriptions(description_bytes: np.ndarray, description_offsets: np.ndarray) -> np.ndarray:
+    raw_bytes = description_bytes.tobytes()
+    offsets = description_offsets.tolist()
+    return np.array(
+        [raw_bytes[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)], dtype=object)
+
+
+# write the columns to the archive file, replacing the whole file at once so the readers never see a partial file
+def write_archive_file(path: Path, columns: Dict[str, np.ndarray]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_columns = {column: values for column, values in columns.items() if column != "description"}
+    file_columns.update(encode_descriptions(columns["description"]))
+
+    temporary_path = path.with_name(f"{path.stem}.tmp.npz")
+    np.savez_compressed(temporary_path, **file_columns)
+    os.replace(temporary_path, path)
+
+
+# the columns of the given transaction rows (id, user, account, occur date, category, amount, description)
+def transaction_columns(transaction_rows: List[tuple]) -> Dict[str, np.ndarray]:
+    num_rows = len(transaction_rows)
+    return {
+        "id": np.fromiter((row[0] for row in transaction_rows), dtype=np.int64, count=num_rows),
+        "user_id": np.fromiter((row[1] for row in transaction_rows), dtype=np.int64, count=num_rows),
+        "account_id": np.fromiter((row[2] for row in transaction_rows), dtype=np.int64, count=num_rows),
+        "occur_date": np.fromiter((int(row[3].timestamp()) for row in transaction_rows), dtype=np.int64, count=num_rows),
+        "local_date": np.fromiter(
+            ((to_local_date(row[3]) - ARCHIVE_EPOCH).days for row in transaction_rows), dtype=np.int32, count=num_rows),
+        "category": np.fromiter(
+            (ARCHIVE_CATEGORY_CODES[row[4]] for row in transaction_rows), dtype=np.int8, count=num_rows),
+        "amount_cents": np.fromiter(
+            (int((row[5] * 100).to_integral_value()) for row in transaction_rows), dtype=np.int64, count=num_rows),
+        "description": np.array([row[6] for row in transaction_rows], dtype=object),
+    }
+
+
+# add the new columns to the ones already archived, the new rows replace the archived rows of the same id
+def merge_archive_columns(archived_columns: Dict[str, np.ndarray], new_columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    if archived_columns is None:
+        return new_columns
+    kept = ~np.isin(archived_columns["id"], new_columns["id"])
+    merged_columns = {
+        column: np.concatenate([archived_columns[column][kept], new_columns[column]]) for column in new_columns
+    }
+    # the rows of the file are in the order of the user and the occur date
+    order = np.lexsort((merged_columns["id"], merged_columns["occur_date"], merged_columns["user_id"]))
+    return {column: values[order] for column, values in merged_columns.items()}
+
+
+"""
+    archive the transactions that occurred before the cutoff date, one month and one shard of users at a time,
+    into one file per month and shard of users, before the retention deletes them
+    only the transactions of one shard of one month are in the memory at once
+    archiving the same transactions again just replaces them, so the killed job can simply run again
+    return the number of transactions archived and the number of files written
+"""
+def archive_transactions_before(cutoff_date: date) -> Dict:
+    expired_transactions = Transaction.objects.filter(occur_date__lt=cutoff_date)
+    first_transaction = expired_transactions.order_by("occur_date").first()
+    if first_transaction is None:
+        return {"archived": 0, "files": 0}
+
+    num_archived, num_files = 0, 0
+    for this_month in month_starts(to_local_date(first_transaction.occur_date), cutoff_date - timedelta(days=1)):
+        # the months start at the local midnight, like the dates of the rollup
+        month_first_time = timezone.make_aware(datetime.combine(this_month, datetime.min.time()))
+        month_last_time = timezone.make_aware(datetime.combine(add_months(this_month, 1), datetime.min.time()))
+        month_transactions = expired_transactions.filter(
+            occur_date__gte=month_first_time, occur_date__lt=month_last_time
+        ).annotate(shard=F("user_id") % getattr(settings, "TRANSACTION_ARCHIVE_SHARDS", 64))
+
+        # the shards of the users with the transactions in the month, each one is read and written on its own
+        month_shards = list(month_transactions.values_list("shard", flat=True).distinct().order_by("shard"))
+        for shard in month_shards:
+            transaction_rows = list(month_transactions.filter(shard=shard).values_list(
+                "id", "user_id", "account_id", "occur_date", "category", "amount", "description"
+            ).order_by("user_id", "occur_date", "id").iterator(chunk_size=5000))
+            if not transaction_rows:
+                continue
+
+            path = archive_path(this_month, int(shard))
+            write_archive_file(path, merge_archive_columns(read_full_archive_file(path), transaction_columns(transaction_rows)))
+            num_files += 1
+            num_archived += len(transaction_rows)
+    return {"archived": num_archived, "files": num_files}
+
+
+"""
+    the archived amount of each (local) date and category of the user (or the account) between 2 dates (inclusive),
+    along with the part of it made exactly at midnight, like the rows of the daily rollup
+"""
+def archived_rollup_rows(arg_obj, first_date: date, last_date: date) -> List[Tuple[date, str, Decimal, Decimal]]:
+    if isinstance(arg_obj, Account):
+        user_id, account_id = arg_obj.user_id, arg_obj.pk
+    else:
+        user_id, account_id = arg_obj.pk, None
+    first_day, last_day = (first_date - ARCHIVE_EPOCH).days, (last_date - ARCHIVE_EPOCH).days
+
+    rollup_rows = []
+    for this_month in month_starts(first_date, last_date):
+        columns = read_archive_file(archive_path(this_month, archive_shard(user_id)))
+        if columns is None:
+            continue
+        selected = (columns["user_id"] == user_id) & (columns["local_date"] >= first_day) & (columns["local_date"] <= last_day)
+        if account_id is not None:
+            selected &= columns["account_id"] == account_id
+        if not selected.any():
+            continue
+
+        # the transactions made exactly at the midnight of their local date
+        local_days, day_index = np.unique(columns["local_date"][selected], return_inverse=True)
+        midnight_times = np.array([int(timezone.make_aware(
+            datetime.combine(ARCHIVE_EPOCH + timedelta(days=int(day)), datetime.min.time()), timezone.get_default_timezone()
+        ).timestamp()) for day in local_days], dtype=np.int64)
+        is_midnight = columns["occur_date"][selected] == midnight_times[day_index]
+
+        # add up the amount of each date and category, like the rollup added up by the database
+        keys = columns["local_date"][selected].astype(np.int64) * len(ARCHIVE_CATEGORIES) + columns["category"][selected]
+        unique_keys, key_index = np.unique(keys, return_inverse=True)
+        key_cents = np.zeros(len(unique_keys), dtype=np.int64)
+        np.add.at(key_cents, key_index, columns["amount_cents"][selected])
+        midnight_cents = np.zeros(len(unique_keys), dtype=np.int64)
+        np.add.at(midnight_cents, key_index[is_midnight], columns["amount_cents"][selected][is_midnight])
+        for key, cents, midnight in zip(unique_keys.tolist(), key_cents.tolist(), midnight_cents.tolist()):
+            rollup_rows.append((
+                ARCHIVE_EPOCH + timedelta(days=key // len(ARCHIVE_CATEGORIES)),
+                ARCHIVE_CATEGORIES[key % len(ARCHIVE_CATEGORIES)], Decimal(cents) / 100, Decimal(midnight) / 100
+            ))
+    return rollup_rows
+
+
+"""
+    split the range of dates at the horizon of the archive
+    return the archived rollup rows of the dates before the horizon, and the first date to read from the database
+"""
+def split_archived_range(arg_obj, first_date: date, last_date: date) -> Tuple[List, date]:
+    horizon = get_archive_horizon()
+    if horizon is None or first_date >= horizon:
+        return [], first_date
+    return archived_rollup_rows(arg_obj, first_date, min(last_date, horizon - timedelta(days=1))), horizon
@@ -3,6 +3,7 @@
 from typing import Dict
 from expenseapp.models import BudgetPlan, User
 from .utils import *
+from . import vector_finance
 
 
 # calculate the actual compostion percentage of each category vs the goal
@@ -11,6 +12,8 @@ def budget_composition_percentage(arg_user: User, period_type: str) -> Dict:
  
     # the total expense of each category 
     first_date, last_date = get_current_dates(period_type)
+    if vector_backend_enabled(): 
+        return vector_finance.budget_composition_percentage(arg_user, queried_plan, first_date, last_date)
     category_expense = category_expense_dict(arg_user, first_date, last_date)
 
     # dictionary mapping the type's name to the set of composition percentage of that type
@@ -39,6 +42,8 @@ def budget_progress_percentage(arg_user: User, interval_type: str) -> Dict:
     # the total expense of each category 
     # dates of the current interval of given type
     first_date, last_date = get_current_dates(interval_type) 
+    if vector_backend_enabled(): 
+        return vector_finance.budget_progress_percentage(arg_user, queried_plan, first_date, last_date)
     category_expenses = category_expense_dict(arg_user, first_date, last_date)
 
     """
@@ -1,10 +1,16 @@
 """ THESE ARE FUNCTIONS COMPUTING THE FINANCE OF THE USER'S EXPENSE """
 
 from typing import Dict, List, Tuple
-from django.db.models import Sum
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Q, Sum
 from datetime import date, timedelta
-from expenseapp.models import Account, Transaction, User, category_dict
+from calendar import monthrange
+from expenseapp.models import Account, DailyCategorySpend, Transaction, User, category_dict
 from .utils import *
+from .ledger_finance import BalanceLedger, balance_delta, spending_delta
+from .archive_finance import split_archived_range
+from . import vector_finance
 
 
 # return the total balance of all debit accounts of the user as a tuple 
@@ -24,47 +30,42 @@ def total_income(arg_user: User, arg_first_date: date=None, arg_last_date: date=
     # determine the first and last date of the month
     first_date, last_date = get_current_dates("month", arg_first_date, arg_last_date)
 
-    # query the list of incomes of the user between the first and last date 
-    income_list = Transaction.objects.filter(
+    # the dates before the horizon of the archive are read from the archive instead 
+    archived_rows, hot_first_date = split_archived_range(arg_user, first_date, last_date)
+
+    # query the daily rollup of incomes of the user between the first and last date 
+    income_list = DailyCategorySpend.objects.filter(
         user=arg_user, category="Income", 
-        occur_date__gte=first_date, occur_date__lte=last_date
+        local_date__gte=hot_first_date, local_date__lte=last_date
     )
 
-    # compute the total income 
-    total_income = income_list.aggregate(total=Sum("amount", default=0))["total"]
+    # compute the total income, till the midnight of the last date (like category_expense_dict())
+    income_totals = income_list.aggregate(
+        whole_days=Sum("amount_total", default=0, filter=Q(local_date__lt=last_date)), 
+        midnight=Sum("midnight_total", default=0, filter=Q(local_date=last_date)), 
+    )
+    total_income = income_totals["whole_days"] + income_totals["midnight"]
+    for local_date, category, amount, midnight_amount in archived_rows: 
+        if category == "Income": 
+            total_income += amount if local_date < last_date else midnight_amount
     return total_income 
 
 
 # return the dictionary mapping the date to the total expense of that date 
 # up until the current date 
 def daily_expense(arg_user: User, arg_first_date: date=None, arg_last_date: date=None) -> Dict: 
-    daily_exepense = {} # result dict 
-
     if not arg_first_date or not arg_last_date: 
-        first_date , last_date = date(
-            year=date.today().year, 
-            month=date.today().month, 
-            day=1), date.today()
+        # from the first date of the current month till today
+        calendar = get_period_calendar()
+        first_date, last_date = calendar.current_dates("month")[0], calendar.today
     else: 
         first_date, last_date = arg_first_date, arg_last_date
     
-    # loop through the dates from first date to today 
-    current_date = first_date
-    while current_date <= last_date: 
-        # query list of expenses between current date and next date 
-        current_expense_list = Transaction.objects.filter(
-            user=arg_user, 
-            occur_date__gte=current_date, 
-            occur_date__lt=(current_date + timedelta(days=1))).exclude(category="Income")
-        
-        # compute the total_expense 
-        total_expense = float(current_expense_list.aggregate(total=Sum("amount", default=0))["total"])
-
-        # add the mapping betweeen date and expense to the dict
-        daily_exepense[current_date.strftime("%m/%d/%Y")] = total_expense
-        current_date += timedelta(days=1)
+    if vector_backend_enabled(): 
+        return vector_finance.daily_expense(arg_user, first_date, last_date)
 
-    return daily_exepense 
+    # the total expense of each date, from the daily rollup (and the archive) read in one query 
+    return amounts_daily_expense(daily_category_amounts(arg_user, first_date, last_date), first_date, last_date)
 
 
 """
@@ -74,22 +75,11 @@ def daily_expense(arg_user: User, arg_first_date: date=None, arg_last_date: date
 def expense_composition_percentage(arg_obj, arg_first_date: date=None, arg_last_date: date=None) -> Dict: 
     # dictionary mapping the category to the total expense this month 
     first_date, last_date = get_current_dates("month", arg_first_date, arg_last_date)
-    category_expense = category_expense_dict(arg_obj, first_date, last_date)
-    
-    """
-        dictionary mapping the expense's category to the percentage of expense
-        avoid hardcoding the category 
-    """
-    composition_percentage = {category : 0.0 for category in list(category_dict.keys()) if category != "Income"}
-
-    # total expense indicates that no transactions have been made 
-    if category_expense["Total"] != 0:  
-        # list of the keys of this dictionary
-        for category in list(composition_percentage.keys()):  
-            composition_percentage[category] = (category_expense[category] / category_expense["Total"]) * 100
-            composition_percentage[category] = round(composition_percentage[category], 2)
+    if vector_backend_enabled(): 
+        return vector_finance.expense_composition_percentage(arg_obj, first_date, last_date)
 
-    return composition_percentage
+    category_expense = category_expense_dict(arg_obj, first_date, last_date)
+    return compute_composition_percentage(category_expense)
 
 
 # calculate how the total expenses and expense of each category have changed 
@@ -97,56 +87,155 @@ def expense_change_percentage(arg_obj, period_type: str="month", arg_first_date:
     # the first and last date of the current period and the previous period
     curr_date1, curr_date2 = get_current_dates(period_type, arg_first_date, arg_last_date)
     prev_date1, prev_date2 = get_previous_dates(period_type, curr_date1, curr_date2)
+    if vector_backend_enabled(): 
+        return vector_finance.expense_change_percentage(arg_obj, (curr_date1, curr_date2), (prev_date1, prev_date2))
 
-    # dict mapping the expense's category to amount for the current and previous month 
-    curr_expense_dict = category_expense_dict(arg_obj, curr_date1, curr_date2)
-    prev_expense_dict = category_expense_dict(arg_obj, prev_date1, prev_date2)
+    # dict mapping the expense's category to amount for the current and previous month, in the same query 
+    curr_expense_dict, prev_expense_dict = category_expense_dicts(
+        arg_obj, [(curr_date1, curr_date2), (prev_date1, prev_date2)])
 
-    # dict mapping each category to the list [current, previous, change percentage]
-    change_percentage = {category : 0.0 for category in list(category_dict.keys()) if category != "Income"}
-
-    # calculate the change percentage 
-    for category in list(change_percentage.keys()): 
-        if prev_expense_dict[category] != 0: 
-            # calculate the percentage change and then add to the dict
-            change_percentage[category] = curr_expense_dict[category] - prev_expense_dict[category]
-            change_percentage[category] = (change_percentage[category] / prev_expense_dict[category]) * 100
-            change_percentage[category] = round(change_percentage[category], 2)
-        else: 
-            # if no expenses made during previous month, obviously expenses increase 100% 
-            change_percentage[category] = 100.00 if curr_expense_dict[category] != 0 else 0.00
-
-    return change_percentage
+    return compute_change_percentage(curr_expense_dict, prev_expense_dict)
 
 
 # adjust the balance of the debit account based on the amount and flow
 # return nothing
 def adjust_account_balance(account: Account, transaction: Transaction) -> None: 
-    # multiplier will determine the result based on if transaction is expense or income
-    multiplier = 1 
-    if transaction.category == "Income":
-        multiplier = -1
-    """
-        if the account is debit, amount is extracted from the balance
-        otherwise, amount is added to the balance
-    """
-    if account.account_type == "Debit":
-        account.balance -= multiplier * transaction.amount
-    else:  
-        account.balance += multiplier * transaction.amount
-    # save the adjustment to the database 
-    account.save() 
+    # the database adds the delta with F("balance"), so the concurrent transactions don't overwrite each other
+    with BalanceLedger() as ledger: 
+        ledger.add(account.pk, spending_delta(transaction.category, transaction.amount))
+
+    # the balance of the instance follows the same delta 
+    account.balance += balance_delta(account.account_type, transaction.category, transaction.amount)
 
 
 # return the list of latest intervals (month, bi_week, or week), intervals = tuple (first_date, last_date)
 def latest_periods(period_type: str, num_periods: int) -> List: 
-    # the list of latest time intervals 
-    latest_intervals = [] 
-    first_date, last_date = get_current_dates(period_type)
-    for i in range(num_periods): 
-        latest_intervals.append((first_date, last_date))
-        first_date, last_date = get_previous_dates(period_type, first_date, last_date)
-    return latest_intervals
+    # the latest intervals are precomputed by the calendar of today 
+    return get_period_calendar().latest_periods(period_type, num_periods)
+
+
+"""
+    fetch the (local_date, category, amount, amount made at midnight) rows of the user's daily rollup between 2 dates 
+    with only one query, and group the amounts by the date and category in memory 
+    return the tuple (amount of each date, amount of each date that was made exactly at midnight)
+"""
+def daily_category_amounts(arg_user: User, first_date: date, last_date: date) -> Tuple: 
+    # the dates before the horizon of the archive are read from the archive instead 
+    rollup_rows, first_date = split_archived_range(arg_user, first_date, last_date)
+    if first_date <= last_date: 
+        rollup_rows += list(DailyCategorySpend.objects.filter(
+            user=arg_user, 
+            local_date__gte=first_date, 
+            local_date__lte=last_date).values_list("local_date", "category").annotate(
+                total_amount=Sum("amount_total", default=0), 
+                midnight_amount=Sum("midnight_total", default=0)).order_by())
+
+    date_amounts = defaultdict(lambda: defaultdict(Decimal))
+    midnight_amounts = defaultdict(lambda: defaultdict(Decimal))
+    for local_date, category, amount, midnight_amount in rollup_rows: 
+        date_amounts[local_date][category] += amount
+        if midnight_amount: 
+            midnight_amounts[local_date][category] += midnight_amount
+    return date_amounts, midnight_amounts
+
+
+# the same as category_expense_dict(), but computed from the amounts of daily_category_amounts()
+def amounts_category_expense_dict(daily_amounts: Tuple, first_date: date, last_date: date) -> Dict: 
+    date_amounts, midnight_amounts = daily_amounts
+    category_amounts = defaultdict(Decimal)
+
+    # the whole days from the first date till the date before the last date 
+    current_date = first_date
+    while current_date < last_date: 
+        for category, amount in date_amounts.get(current_date, {}).items(): 
+            category_amounts[category] += amount
+        current_date += timedelta(days=1)
+
+    # only the midnight of the last date 
+    for category, amount in midnight_amounts.get(last_date, {}).items(): 
+        category_amounts[category] += amount
+
+    category_expense = {category: 0.0 for category in list(category_dict.keys())}
+    for category, amount in category_amounts.items(): 
+        category_expense[category] = float(amount)
+
+    # compute expense transactions, and income transactions
+    category_expense["Expense"] = float(sum(
+        (amount for category, amount in category_amounts.items() if category != "Income"), Decimal(0)))
+    category_expense["Income"] = float(category_amounts["Income"])
+
+    # total transactions is really just sum of expense and income 
+    category_expense["Total"] = category_expense["Expense"] + category_expense["Income"]
+    return category_expense
+
+
+# the same as daily_expense(), but computed from the amounts of daily_category_amounts()
+def amounts_daily_expense(daily_amounts: Tuple, first_date: date, last_date: date) -> Dict: 
+    date_amounts = daily_amounts[0]
+    daily_expense = {}
+    current_date = first_date
+    while current_date <= last_date: 
+        total_expense = sum(
+            (amount for category, amount in date_amounts.get(current_date, {}).items() if category != "Income"), 
+            Decimal(0))
+        daily_expense[current_date.strftime("%m/%d/%Y")] = float(total_expense)
+        current_date += timedelta(days=1)
+    return daily_expense
+
+
+"""
+    return the list of the expense summary (total, change, and composition) of each interval, 
+    interval_list has to be ordered like latest_periods(), so the interval after each interval is the one previous to it
+    the category expense of each interval (and the one previous to the oldest interval) is computed only once,
+    in one query, or from the amounts of daily_category_amounts() if they're given
+"""
+def period_expense_series(arg_obj, period_type: str, interval_list: List, daily_amounts: Tuple=None) -> List: 
+    series_intervals = list(interval_list) + [get_previous_dates(period_type, *interval_list[-1])]
+    if vector_backend_enabled() and daily_amounts is None: 
+        return vector_finance.period_expense_series(arg_obj, series_intervals)
+
+    if daily_amounts is None: 
+        expense_dict_list = category_expense_dicts(arg_obj, series_intervals)
+    else: 
+        expense_dict_list = [
+            amounts_category_expense_dict(daily_amounts, first_date, last_date) 
+            for first_date, last_date in series_intervals
+        ]
+
+    period_expense_list = []
+    for i, (first_date, last_date) in enumerate(interval_list): 
+        # the change is derived from the adjacent entry, which is the previous interval 
+        period_expense_list.append({
+            "first_date": first_date, 
+            "last_date": last_date, 
+            "total_expense": expense_dict_list[i]["Total"],
+            "expense_change": compute_change_percentage(expense_dict_list[i], expense_dict_list[i + 1]), 
+            "expense_composition": compute_composition_percentage(expense_dict_list[i]),
+        })
+    return period_expense_list
+
+
+"""
+    return the category expense of each month between the months of 2 dates, latest first,
+    the archived months are aggregated from the archive, and only the months after its horizon are queried 
+"""
+def monthly_expense_history(arg_user: User, first_date: date, last_date: date) -> List: 
+    first_month = date(first_date.year, first_date.month, 1)
+    last_month_end = date(last_date.year, last_date.month, monthrange(last_date.year, last_date.month)[1])
+    date_amounts = daily_category_amounts(arg_user, first_month, last_month_end)[0]
+
+    monthly_expense_list = []
+    this_month = first_month
+    while this_month <= last_month_end: 
+        this_month_end = date(this_month.year, this_month.month, monthrange(this_month.year, this_month.month)[1])
+        next_month = this_month_end + timedelta(days=1)
+        # the whole days of the month, without the midnight of the next month (which belongs to the next month)
+        monthly_expense_list.append({
+            "month": this_month.strftime("%m/%Y"), 
+            "category_expense": amounts_category_expense_dict((date_amounts, {}), this_month, next_month), 
+        })
+        this_month = next_month
+    return monthly_expense_list[::-1]
 
 
 # return the total expense of each interval depending on the type of the interval
@@ -157,34 +246,36 @@ def interval_total_expense(arg_user: User) -> Dict:
     for time_type in ["month", "bi_week", "week"]: 
         latest_periods_dict[time_type] = latest_periods(time_type, num_latest_periods)
 
+    """
+        the widest window that covers every interval and the interval previous to it,
+        so that the transactions of the user are only queried once
+    """
+    window_first_date, window_last_date = None, None
+    for period_type in list(latest_periods_dict.keys()): 
+        for first_date, last_date in latest_periods_dict[period_type]: 
+            prev_first_date = get_previous_dates(period_type, first_date, last_date)[0]
+            if window_first_date is None or prev_first_date < window_first_date: 
+                window_first_date = prev_first_date
+            if window_last_date is None or last_date > window_last_date: 
+                window_last_date = last_date
+
+    if vector_backend_enabled(): 
+        series_intervals_dict = {
+            period_type: interval_list + [get_previous_dates(period_type, *interval_list[-1])] 
+            for period_type, interval_list in latest_periods_dict.items()
+        }
+        return vector_finance.interval_total_expense(arg_user, series_intervals_dict, window_first_date, window_last_date)
+    daily_amounts = daily_category_amounts(arg_user, window_first_date, window_last_date)
+
     # the dictionary mapping the interval type to the list of expense of each interval
     period_expense_dict = {}
     for period_type in list(latest_periods_dict.keys()): 
-        period_expense_dict[period_type] = []
-        interval_list = latest_periods_dict[period_type]
-
-        # compute total expense for each interval of the list 
-        for interval in interval_list: 
-            # first and last date of the interval 
-            first_date, last_date = interval[0], interval[1]
-
-            # first key-value pair of total_expense_dict is total expense of all categories
-            total_expense = category_expense_dict(arg_user, first_date, last_date)["Total"]
-
-            # the expense change and composition of the user during this period
-            expense_change = expense_change_percentage(arg_user, period_type, first_date, last_date)
-            expense_composition = expense_composition_percentage(arg_user, first_date, last_date)
-            
-            # daily expense of the user during this period
-            period_daily_expense = daily_expense(arg_user, first_date, last_date)
-            
-            period_expense_dict[period_type].append({
-                "first_date": first_date, 
-                "last_date": last_date, 
-                "total_expense": total_expense,
-                "expense_change": expense_change, 
-                "expense_composition": expense_composition,
-                "daily_expense": period_daily_expense,
-            })
+        period_expense_dict[period_type] = period_expense_series(
+            arg_user, period_type, latest_periods_dict[period_type], daily_amounts)
+
+        # daily expense of the user during each period
+        for period_expense in period_expense_dict[period_type]: 
+            period_expense["daily_expense"] = amounts_daily_expense(
+                daily_amounts, period_expense["first_date"], period_expense["last_date"])
      
-    return period_expense_dict
\ No newline at end of file
+    return period_expense_dict
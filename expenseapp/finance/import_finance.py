@@ -0,0 +1,215 @@
+""" THESE ARE FUNCTIONS IMPORTING THE TRANSACTIONS OF THE USER FROM THE BANK EXPORTS (CSV OR OFX) """
+
+import csv
+import re
+from typing import Dict, Iterable, Iterator, List
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime
+from django.db import transaction
+from django.utils import timezone
+from expenseapp.models import Account, Transaction, User, category_dict
+from .rollup_finance import group_rollup_amounts, apply_grouped_rollup
+from .ledger_finance import BalanceLedger, balance_delta
+from .archive_finance import get_archive_horizon
+
+# the maximum number of errors of the invalid rows reported in the summary
+MAX_REPORTED_ERRORS = 50
+
+
+# the error of the row of the bank export that can't be imported
+class ImportRowError(ValueError):
+    pass
+
+
+# parse the date (and time) of the transaction, the date only means midnight in TIME_ZONE
+def parse_occur_date(raw_date: str) -> datetime:
+    raw_date = raw_date.strip()
+    try:
+        occur_date = datetime.fromisoformat(raw_date)
+    except ValueError:
+        try:
+            occur_date = datetime.strptime(raw_date, "%m/%d/%Y")
+        except ValueError:
+            raise ImportRowError(f"Invalid date '{raw_date}'")
+
+    if timezone.is_naive(occur_date):
+        occur_date = timezone.make_aware(occur_date, timezone.get_default_timezone())
+    return occur_date
+
+
+"""
+    parse the amount of the transaction, the bank exports have negative amounts for the expenses
+    the amount has to fit the digits of the amount of the transaction, so the database accepts it
+    return the tuple (amount, True if the amount is negative)
+"""
+def parse_amount(raw_amount: str) -> tuple:
+    amount_field = Transaction._meta.get_field("amount")
+    try:
+        amount = Decimal(raw_amount.strip().replace(",", "").replace("$", ""))
+        if not amount.is_finite():
+            raise ImportRowError(f"Invalid amount '{raw_amount}'")
+        # the huge exponent (like 1e400) can't be quantized at all
+        rounded_amount = abs(amount).quantize(Decimal(1).scaleb(-amount_field.decimal_places))
+    except InvalidOperation:
+        raise ImportRowError(f"Invalid amount '{raw_amount}'")
+
+    if rounded_amount < Decimal("0.01"):
+        raise ImportRowError(f"Invalid amount '{raw_amount}'")
+    if len(rounded_amount.as_tuple().digits) > amount_field.max_digits:
+        raise ImportRowError(f"Amount '{raw_amount}' is too large")
+    return rounded_amount, amount < 0
+
+
+"""
+    validate the raw fields of the row into the fields of the transaction
+    if the category isn't given, the positive amount is the income and the negative one is "Others"
+    the dates before the horizon of the archive are rejected, since their transactions and rollup are already deleted
+"""
+def validate_row(raw_row: Dict, account_ids: set, default_account_id: int=None, archived_before: date=None) -> Dict:
+    raw_account = (raw_row.get("account") or "").strip()
+    try:
+        account_id = int(raw_account) if raw_account else default_account_id
+    except ValueError:
+        raise ImportRowError(f"Invalid account '{raw_account}'")
+    if account_id not in account_ids:
+        raise ImportRowError(f"Account '{account_id}' not found")
+
+    amount, is_negative = parse_amount(raw_row.get("amount") or "")
+    category = (raw_row.get("category") or "").strip()
+    if not category:
+        category = "Others" if is_negative else "Income"
+    if category not in category_dict:
+        raise ImportRowError(f"Invalid category '{category}'")
+
+    description = (raw_row.get("description") or "").strip()[:200]
+    if not description:
+        raise ImportRowError("Description not specified")
+
+    occur_date = parse_occur_date(raw_row.get("date") or "")
+    if archived_before is not None and timezone.localtime(occur_date).date() < archived_before:
+        raise ImportRowError(
+            f"Date '{timezone.localtime(occur_date).strftime('%m/%d/%Y')}' is before the archived transactions "
+            f"({archived_before.strftime('%m/%d/%Y')})")
+
+    return {
+        "account_id": account_id, "description": description, "category": category,
+        "amount": amount, "occur_date": occur_date,
+    }
+
+
+"""
+    parse the lines of the CSV export into raw rows, one line at a time
+    the header must have the columns date, description, amount, and optionally category and account
+"""
+def parse_csv_rows(lines: Iterable[str]) -> Iterator[Dict]:
+    reader = csv.DictReader(lines)
+    for raw_row in reader:
+        # the keys of the header are case-insensitive
+        yield {(key or "").strip().lower(): value for key, value in raw_row.items()}
+
+
+# the tags of each transaction (<STMTTRN>) of the OFX export
+OFX_TAG_PATTERN = re.compile(r"<(/?)(\w+)>([^<\r\n]*)")
+
+
+"""
+    parse the lines of the OFX export into raw rows, one line at a time
+    OFX 1.x (SGML, without the closing tags of the fields) and OFX 2.x (XML) are both accepted
+"""
+def parse_ofx_rows(lines: Iterable[str]) -> Iterator[Dict]:
+    raw_row = None
+    for line in lines:
+        for closing, tag, value in OFX_TAG_PATTERN.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                # the transaction ends at its closing tag, or at the start of the next one
+                if raw_row is not None:
+                    yield raw_row
+                raw_row = None if closing else {}
+            elif raw_row is not None and not closing:
+                raw_row[tag] = value.strip()
+    if raw_row is not None:
+        yield raw_row
+
+
+# convert the raw row of the OFX export to the raw row of the CSV export
+def ofx_to_csv_row(raw_row: Dict) -> Dict:
+    posted_date = raw_row.get("DTPOSTED", "")
+    # the date is YYYYMMDD, optionally followed by the time and the time zone
+    if len(posted_date) >= 8:
+        posted_date = f"{posted_date[0:4]}-{posted_date[4:6]}-{posted_date[6:8]}"
+    return {
+        "date": posted_date,
+        "description": raw_row.get("NAME") or raw_row.get("MEMO") or "",
+        "amount": raw_row.get("TRNAMT", ""),
+    }
+
+
+"""
+    import the raw rows (from parse_csv_rows() or parse_ofx_rows()) as the transactions of the user
+    the valid rows are created with bulk_create() in chunks, the invalid ones are skipped and reported,
+    then the balance of each account (with one UPDATE) and the daily rollup are adjusted once for the whole import
+    return the summary of the import
+"""
+@transaction.atomic
+def import_transactions(arg_user: User, raw_rows: Iterable[Dict], default_account_id: int=None, chunk_size: int=5000) -> Dict:
+    account_types = dict(Account.objects.filter(user=arg_user).values_list("id", "account_type"))
+    account_ids = set(account_types.keys())
+    archived_before = get_archive_horizon()
+
+    num_imported, num_skipped = 0, 0
+    errors: List[Dict] = []
+    account_summary = defaultdict(lambda: {"imported": 0, "balance_delta": Decimal(0)})
+    grouped_amounts = None
+    balance_ledger = BalanceLedger()
+    first_date, last_date = None, None
+
+    chunk = []
+    # the rows are numbered from 1, after the header of the CSV export
+    for row_number, raw_row in enumerate(raw_rows, start=1):
+        try:
+            row = validate_row(raw_row, account_ids, default_account_id, archived_before)
+        except ImportRowError as error:
+            num_skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": str(error)})
+            continue
+
+        chunk.append(Transaction(user=arg_user, **row))
+        this_account = account_summary[row["account_id"]]
+        this_account["imported"] += 1
+        this_account["balance_delta"] += balance_delta(account_types[row["account_id"]], row["category"], row["amount"])
+        balance_ledger.add_transaction(chunk[-1])
+
+        occur_date = row["occur_date"]
+        first_date = occur_date if first_date is None else min(first_date, occur_date)
+        last_date = occur_date if last_date is None else max(last_date, occur_date)
+
+        if len(chunk) >= chunk_size:
+            Transaction.objects.bulk_create(chunk)
+            grouped_amounts = group_rollup_amounts(chunk, grouped_amounts)
+            num_imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        Transaction.objects.bulk_create(chunk)
+        grouped_amounts = group_rollup_amounts(chunk, grouped_amounts)
+        num_imported += len(chunk)
+
+    # one balance update of all of the accounts, and one rollup update of each date and category
+    balance_ledger.flush()
+    if grouped_amounts:
+        apply_grouped_rollup(grouped_amounts)
+
+    return {
+        "imported": num_imported,
+        "skipped": num_skipped,
+        "errors": errors,
+        "accounts": {
+            account_id: {"imported": summary["imported"], "balance_delta": str(summary["balance_delta"])}
+            for account_id, summary in account_summary.items()
+        },
+        "first_date": timezone.localtime(first_date).strftime("%m/%d/%Y") if first_date else None,
+        "last_date": timezone.localtime(last_date).strftime("%m/%d/%Y") if last_date else None,
+    }
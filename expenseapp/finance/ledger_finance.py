@@ -0,0 +1,85 @@
+""" THESE ARE FUNCTIONS KEEPING THE BALANCE OF THE ACCOUNTS AS THE LEDGER OF SIGNED DELTAS """
+
+from typing import List
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, Value, When
+from expenseapp.models import Account, Transaction
+
+# the maximum number of accounts updated by each UPDATE of the ledger
+LEDGER_BATCH_SIZE = 500
+
+
+# the signed change of the balance of the account caused by the transaction
+def balance_delta(account_type: str, category: str, amount: Decimal) -> Decimal:
+    """
+        if the account is debit, amount is extracted from the balance
+        otherwise, amount is added to the balance, and the other way around for the income
+    """
+    spending = spending_delta(category, amount)
+    return -spending if account_type == "Debit" else spending
+
+
+# the amount the transaction adds to the spending of the account, negative for the income
+def spending_delta(category: str, amount: Decimal) -> Decimal:
+    return -Decimal(amount) if category == "Income" else Decimal(amount)
+
+
+"""
+    the batch of the signed deltas of the spending of each account, applied with F("balance") when flushed
+    the deltas of the same account are added up, so each account is updated only once per batch,
+    and the database converts the spending to the balance by the account type, so no account is read first
+    usage:
+        with BalanceLedger() as ledger:
+            ledger.add_transaction(transaction)
+"""
+class BalanceLedger:
+    def __init__(self, batch_size: int=LEDGER_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.spending_deltas = defaultdict(Decimal)
+
+    # add the signed spending to the account
+    def add(self, account_id: int, spending: Decimal) -> None:
+        self.spending_deltas[account_id] += spending
+
+    # add the transaction to its account, or subtract it if sign is -1
+    def add_transaction(self, transaction: Transaction, sign: int=1) -> None:
+        self.add(transaction.account_id, sign * spending_delta(transaction.category, transaction.amount))
+
+    # apply the deltas to the balances of the accounts, return the number of accounts updated
+    def flush(self) -> int:
+        spending_items = [(account_id, spending) for account_id, spending in self.spending_deltas.items() if spending != 0]
+        self.spending_deltas.clear()
+
+        num_updated = 0
+        for i in range(0, len(spending_items), self.batch_size):
+            batch = spending_items[i:i + self.batch_size]
+            spending = Case(
+                *[When(pk=account_id, then=Value(delta)) for account_id, delta in batch],
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+            # balance of debit accounts goes down with the spending, and the one of credit accounts goes up
+            num_updated += Account.objects.filter(pk__in=[account_id for account_id, _ in batch]).update(
+                balance=Case(
+                    When(account_type="Debit", then=F("balance") - spending),
+                    default=F("balance") + spending,
+                    output_field=DecimalField(max_digits=12, decimal_places=2)
+                )
+            )
+        return num_updated
+
+    def __enter__(self):
+        return self
+
+    # the deltas are only applied if nothing goes wrong in the block
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        return False
+
+
+# adjust the balances of the accounts by the given transactions, or reverse them if sign is -1
+def apply_transactions_to_balances(transaction_list: List[Transaction], sign: int=1) -> None:
+    with BalanceLedger() as ledger:
+        for this_transaction in transaction_list:
+            ledger.add_transaction(this_transaction, sign)
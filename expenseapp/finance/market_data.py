@@ -0,0 +1,284 @@
+"""
+THESE ARE THE PROVIDERS OF THE MARKET DATA (OHLCV FRAMES) OF THE STOCKS
+SELECTED WITH MARKET_DATA_PROVIDER IN THE SETTINGS, SO THE STOCK FUNCTIONS CAN RUN OFFLINE AGAINST THE FIXTURES
+AND THE DOWNLOADS OF THE SAME SYMBOLS ARE CACHED BY THE CACHING PROVIDER
+"""
+
+from typing import Dict, List
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from datetime import date
+from threading import Lock
+import re
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# the columns of each OHLCV frame, indexed by the date
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+# the interface of the providers of the market data
+class MarketDataProvider:
+    """
+        return the OHLCV frame of each of the symbols between 2 dates (the last date is exclusive, like yf.download())
+        the symbols without any data are left out
+    """
+    def download(self, symbols: List[str], first_date: date, last_date: date) -> Dict[str, pd.DataFrame]:
+        raise NotImplementedError
+
+
+# the provider downloading the market data from Yahoo Finance, many symbols per request
+class YFinanceProvider(MarketDataProvider):
+    def download(self, symbols, first_date, last_date):
+        if not symbols:
+            return {}
+        downloaded_data = yf.download(
+            list(symbols), start=first_date.isoformat(), end=last_date.isoformat(),
+            group_by="ticker", auto_adjust=False, progress=False
+        )
+        return split_symbol_frames(downloaded_data, symbols)
+
+
+"""
+    the provider reading the market data from the local fixtures, for the tests and the offline development
+    the fixtures are either the frames given directly, or the CSV file <SYMBOL>.csv of each symbol in the directory
+    (the same format as the CSV exported by pandas from yf.download(), with the Date column as the index)
+"""
+class FixtureProvider(MarketDataProvider):
+    def __init__(self, fixture_dir=None, frames: Dict[str, pd.DataFrame]=None):
+        if fixture_dir is None:
+            fixture_dir = getattr(settings, "MARKET_DATA_FIXTURE_DIR", None)
+        self.fixture_dir = Path(fixture_dir) if fixture_dir else None
+        self.frames = {symbol.upper(): frame for symbol, frame in (frames or {}).items()}
+
+    # the whole frame of the symbol, None if there is no fixture of it
+    def load_frame(self, symbol: str) -> pd.DataFrame:
+        if symbol.upper() in self.frames:
+            return self.frames[symbol.upper()]
+        if self.fixture_dir is None:
+            return None
+        fixture_path = self.fixture_dir / f"{symbol.upper()}.csv"
+        if not fixture_path.exists():
+            return None
+        return pd.read_csv(fixture_path, index_col=0, parse_dates=True)
+
+    def download(self, symbols, first_date, last_date):
+        symbol_frames = {}
+        for symbol in symbols:
+            frame = self.load_frame(symbol)
+            if frame is None:
+                continue
+            frame = frame[(frame.index >= pd.Timestamp(first_date)) & (frame.index < pd.Timestamp(last_date))]
+            if not frame.empty:
+                symbol_frames[symbol] = frame
+        return symbol_frames
+
+
+# the frame of the symbol cached for the range of dates it was downloaded for
+class CachedFrame:
+    def __init__(self, first_date: date, last_date: date, downloaded_at: float, frame: pd.DataFrame):
+        self.first_date = first_date
+        self.last_date = last_date
+        self.downloaded_at = downloaded_at
+        self.frame = frame # empty if the provider has no data of the symbol 
+        self.num_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+
+    # if the cached frame is still fresh and covers the range of dates
+    def covers(self, first_date: date, last_date: date, ttl: float) -> bool:
+        return (
+            time.time() - self.downloaded_at < ttl 
+            and self.first_date <= first_date and last_date <= self.last_date
+        )
+
+    # the part of the cached frame between 2 dates (the last date is exclusive)
+    def between(self, first_date: date, last_date: date) -> pd.DataFrame:
+        frame = self.frame
+        if frame.empty:
+            return frame
+        return frame[(frame.index >= pd.Timestamp(first_date)) & (frame.index < pd.Timestamp(last_date))]
+
+    """
+        write the cached frame to the file as the plain arrays (numpy .npz), one array per column, 
+        so it's read back without unpickling anything
+    """
+    def save(self, cache_file) -> None: 
+        frame = self.frame
+        index = frame.index if isinstance(frame.index, pd.DatetimeIndex) else pd.DatetimeIndex([])
+        arrays = {
+            "range": np.array([self.first_date.toordinal(), self.last_date.toordinal()], dtype=np.int64), 
+            "downloaded_at": np.array(self.downloaded_at, dtype=np.float64), 
+            # the dates of the aware index are written in UTC, along with its time zone 
+            "index": (index.tz_convert("UTC").tz_localize(None) if index.tz else index).to_numpy(), 
+            "index_tz": np.array(str(index.tz) if index.tz else ""), "index_name": np.array(index.name or ""), 
+            "columns": np.array([str(column) for column in frame.columns]), 
+        }
+        for i, column in enumerate(frame.columns): 
+            values = frame[column].to_numpy()
+            # the frame of the symbol without any data has no dtype 
+            arrays[f"column_{i}"] = values.astype(np.float64) if values.dtype == object else values
+        np.savez(cache_file, **arrays)
+
+    # the cached frame read from the file written by save() 
+    @classmethod
+    def load(cls, cache_file) -> "CachedFrame": 
+        with np.load(cache_file, allow_pickle=False) as arrays: 
+            index = pd.DatetimeIndex(arrays["index"], name=str(arrays["index_name"]) or None)
+            index_tz = str(arrays["index_tz"])
+            if index_tz: 
+                index = index.tz_localize("UTC").tz_convert(index_tz)
+            frame = pd.DataFrame(
+                {column: arrays[f"column_{i}"] for i, column in enumerate(arrays["columns"].tolist())}, index=index)
+            first_ordinal, last_ordinal = arrays["range"].tolist()
+            return cls(
+                date.fromordinal(first_ordinal), date.fromordinal(last_ordinal), float(arrays["downloaded_at"]), frame)
+
+
+"""
+    the decorator of another provider, caching the frame of each symbol on the disk for the time to live (ttl, in seconds),
+    along with the most recently used frames in the memory, up to max_memory_bytes
+    so the repeated downloads of the same symbol (in any process sharing the cache directory) never hit the network
+"""
+class CachingProvider(MarketDataProvider):
+    def __init__(self, provider: MarketDataProvider=None, cache_dir=None, ttl: float=None, max_memory_bytes: int=None):
+        if provider is None:
+            provider = import_string(getattr(
+                settings, "MARKET_DATA_CACHED_PROVIDER", "expenseapp.finance.market_data.YFinanceProvider"))()
+        self.provider = provider
+        self.cache_dir = Path(cache_dir or getattr(settings, "MARKET_DATA_CACHE_DIR"))
+        self.ttl = ttl if ttl is not None else getattr(settings, "MARKET_DATA_CACHE_TTL", 6 * 60 * 60)
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else getattr(
+            settings, "MARKET_DATA_CACHE_MAX_MEMORY", 64 * 1024 * 1024)
+
+        # the most recently used frames are at the end 
+        self.memory_cache = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = Lock()
+
+    # the path of the cached frame of the symbol on the disk
+    def cache_path(self, symbol: str) -> Path:
+        return self.cache_dir / f"{re.sub(r'[^A-Za-z0-9_.^=-]', '_', symbol.upper())}.npz"
+    
+    # the cached frame of the symbol from the memory, or from the disk, None if there is none 
+    def get_cached(self, symbol: str) -> CachedFrame:
+        with self.lock:
+            if symbol in self.memory_cache:
+                self.memory_cache.move_to_end(symbol)
+                return self.memory_cache[symbol]
+        
+        cache_path = self.cache_path(symbol)
+        if not cache_path.exists():
+            return None
+        try:
+            cached = CachedFrame.load(cache_path)
+        except Exception: # the file is corrupt or is being written, so download it again 
+            return None
+        self.remember(symbol, cached)
+        return cached
+    
+    # add the cached frame to the memory, evicting the least recently used frames over the limit
+    def remember(self, symbol: str, cached: CachedFrame) -> None:
+        with self.lock:
+            if symbol in self.memory_cache:
+                self.memory_bytes -= self.memory_cache.pop(symbol).num_bytes
+            self.memory_cache[symbol] = cached
+            self.memory_bytes += cached.num_bytes
+
+            while self.memory_bytes > self.max_memory_bytes and len(self.memory_cache) > 1:
+                _, evicted = self.memory_cache.popitem(last=False)
+                self.memory_bytes -= evicted.num_bytes
+
+    # cache the frame of the symbol in the memory and on the disk 
+    def store(self, symbol: str, cached: CachedFrame) -> None:
+        self.remember(symbol, cached)
+        # only the user running the app can read and write the cache 
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        # the file is replaced at once, so the other processes never read a partial file
+        cache_path = self.cache_path(symbol)
+        temporary_path = cache_path.with_name(f"{cache_path.stem}.{id(cached)}.tmp")
+        with open(temporary_path, "wb") as cache_file:
+            cached.save(cache_file)
+        temporary_path.replace(cache_path)
+
+    def download(self, symbols, first_date, last_date):
+        symbol_frames, missing_symbols = {}, []
+        for symbol in symbols:
+            cached = self.get_cached(symbol)
+            if cached is not None and cached.covers(first_date, last_date, self.ttl):
+                frame = cached.between(first_date, last_date)
+                if not frame.empty:
+                    symbol_frames[symbol] = frame
+            else:
+                missing_symbols.append(symbol)
+        
+        if missing_symbols:
+            downloaded_at = time.time()
+            downloaded_frames = self.provider.download(missing_symbols, first_date, last_date)
+            for symbol in missing_symbols:
+                # the symbols without any data are cached too, so they aren't downloaded again until they expire
+                frame = downloaded_frames.get(symbol, pd.DataFrame(columns=OHLCV_COLUMNS))
+                self.store(symbol, CachedFrame(first_date, last_date, downloaded_at, frame))
+                if not frame.empty:
+                    symbol_frames[symbol] = frame
+        return symbol_frames
+
+
+"""
+    split the frame downloaded by yf.download() into the frame of each symbol
+    the columns are (symbol, field) for many symbols, (field, symbol) if grouped by the column,
+    and only the fields for one symbol
+"""
+def split_symbol_frames(downloaded_data: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    symbol_frames = {}
+    for symbol in symbols:
+        if isinstance(downloaded_data.columns, pd.MultiIndex):
+            if symbol in downloaded_data.columns.get_level_values(0):
+                frame = downloaded_data.xs(symbol, axis=1, level=0)
+            elif symbol in downloaded_data.columns.get_level_values(1):
+                frame = downloaded_data.xs(symbol, axis=1, level=1)
+            else:
+                continue
+        elif len(symbols) == 1:
+            frame = downloaded_data
+        else:
+            continue
+
+        # the dates the symbol wasn't traded have no data at all
+        frame = frame.dropna(how="all")
+        if not frame.empty:
+            symbol_frames[symbol] = frame
+    return symbol_frames
+
+
+# the provider of the given dotted path, created only once
+@lru_cache(maxsize=None)
+def load_market_data_provider(provider_path: str) -> MarketDataProvider:
+    return import_string(provider_path)()
+
+
+# the provider selected in the settings
+def get_market_data_provider() -> MarketDataProvider:
+    return load_market_data_provider(
+        getattr(settings, "MARKET_DATA_PROVIDER", "expenseapp.finance.market_data.CachingProvider"))
+
+
+"""
+    download the OHLCV frames of the symbols with the provider, chunk_size symbols per download
+    each symbol is downloaded only once, however many times it is given
+"""
+def download_symbol_frames(symbols: List[str], first_date: date, last_date: date, chunk_size: int=None, provider: MarketDataProvider=None) -> Dict[str, pd.DataFrame]:
+    if chunk_size is None:
+        chunk_size = getattr(settings, "MARKET_DATA_CHUNK_SIZE", 100)
+    if provider is None:
+        provider = get_market_data_provider()
+
+    distinct_symbols = list(dict.fromkeys(symbols))
+    symbol_frames = {}
+    for i in range(0, len(distinct_symbols), chunk_size):
+        symbol_frames.update(provider.download(distinct_symbols[i:i + chunk_size], first_date, last_date))
+    return symbol_frames
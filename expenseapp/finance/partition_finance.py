@@ -0,0 +1,177 @@
+"""
+THESE ARE FUNCTIONS KEEPING THE TABLES OF THE DATED ROWS AS MONTHLY RANGE PARTITIONS ON POSTGRESQL
+SO THE QUERIES OF A RANGE OF DATES ONLY SCAN THEIR MONTHS, AND THE RETENTION DROPS THE WHOLE EXPIRED MONTHS
+ON THE OTHER DATABASES (SQLITE), THE TABLES STAY AS THEY ARE AND THE RETENTION DELETES THE ROWS IN BATCHES
+"""
+
+from typing import Dict, List
+from datetime import date, datetime
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Model
+from django.utils import timezone
+from .retention_finance import delete_in_batches
+
+# the field each partitioned model is partitioned by
+PARTITIONED_MODELS = {
+    "expenseapp.Transaction": "occur_date",
+    "expenseapp.DateStockPrice": "date",
+    "expenseapp.PortfolioValue": "date",
+}
+
+
+# the first date of the month of the date
+def month_start(arg_date: date) -> date:
+    return date(arg_date.year, arg_date.month, 1)
+
+
+# the first date of the month after (or before, if months is negative) the month of the date
+def add_months(arg_date: date, months: int) -> date:
+    num_months = arg_date.year * 12 + arg_date.month - 1 + months
+    return date(num_months // 12, num_months % 12 + 1, 1)
+
+
+# the first date of each month from the first month till the last month
+def month_starts(first_date: date, last_date: date) -> List[date]:
+    month_list = []
+    this_month = month_start(first_date)
+    while this_month <= last_date:
+        month_list.append(this_month)
+        this_month = add_months(this_month, 1)
+    return month_list
+
+
+# the partition of the table for the month
+def partition_name(table: str, this_month: date) -> str:
+    return f"{table}_p{this_month.year}{this_month.month:02d}"
+
+
+# the partition of the table for the rows of the dates without their monthly partition
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+"""
+    the SQL literal of the first moment of the month, the bound of its partition
+    the months of the date times start at the local midnight (TIME_ZONE), like the dates the views and tasks filter by
+"""
+def month_bound(field, this_month: date) -> str:
+    if isinstance(field, DateTimeField):
+        return f"'{timezone.make_aware(datetime.combine(this_month, datetime.min.time())).isoformat()}'"
+    return f"'{this_month.isoformat()}'"
+
+
+# the field the model is partitioned by
+def partition_field(model: Model):
+    return model._meta.get_field(PARTITIONED_MODELS[model._meta.label])
+
+
+# the partitioned models of the app
+def partitioned_models() -> List[Model]:
+    return [apps.get_model(label) for label in PARTITIONED_MODELS]
+
+
+# if the database supports the declarative partitions the tables are converted to
+def supports_partitions(db_connection=connection) -> bool:
+    return db_connection.vendor == "postgresql" and db_connection.pg_version >= 110000
+
+
+# if the table of the model is partitioned
+def is_partitioned(model: Model, db_connection=connection) -> bool:
+    if not supports_partitions(db_connection):
+        return False
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [model._meta.db_table])
+        return cursor.fetchone() is not None
+
+
+# the first date of the month of each (monthly) partition of the table of the model, in order
+def partition_months(model: Model, db_connection=connection) -> List[date]:
+    table = model._meta.db_table
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)", [table]
+        )
+        partition_names = [row[0] for row in cursor.fetchall()]
+
+    month_list = []
+    for name in partition_names:
+        suffix = name[len(table) + 2:]
+        if name.startswith(f"{table}_p") and len(suffix) == 6 and suffix.isdigit():
+            month_list.append(date(int(suffix[:4]), int(suffix[4:]), 1))
+    return sorted(month_list)
+
+
+"""
+    create the monthly partitions of the table of the model from the month of the first date (the current one by default) 
+    till months_ahead months after the current one
+    each partition is created as the table on its own, the rows of its month are moved into it from the default partition,
+    and then it's attached, so the rows added before their month had the partition are never lost
+    return the names of the partitions created
+"""
+def create_partitions(model: Model, months_ahead: int=3, first_date: date=None, db_connection=connection) -> List[str]:
+    if not is_partitioned(model, db_connection):
+        return []
+    table, field = model._meta.db_table, partition_field(model)
+    quote = db_connection.ops.quote_name
+
+    this_month = month_start(timezone.localdate())
+    existing_months = set(partition_months(model, db_connection))
+    created_partitions = []
+    first_month = month_start(first_date or this_month)
+    for new_month in month_starts(first_month, max(first_month, add_months(this_month, months_ahead))):
+        if new_month in existing_months:
+            continue
+        name = partition_name(table, new_month)
+        lower_bound, upper_bound = month_bound(field, new_month), month_bound(field, add_months(new_month, 1))
+
+        with transaction.atomic(using=db_connection.alias), db_connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            cursor.execute(
+                f"WITH moved_rows AS (DELETE FROM {quote(default_partition_name(table))} "
+                f"WHERE {quote(field.column)} >= {lower_bound} AND {quote(field.column)} < {upper_bound} RETURNING *) "
+                f"INSERT INTO {quote(name)} SELECT * FROM moved_rows"
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM ({lower_bound}) TO ({upper_bound})")
+        created_partitions.append(name)
+    return created_partitions
+
+
+"""
+    detach and drop the monthly partitions of the table of the model whose whole month is before the cutoff date,
+    instead of deleting their rows one by one, so the expired rows leave no dead tuples to vacuum
+    return the names of the partitions dropped
+"""
+def drop_partitions_before(model: Model, cutoff_date: date, db_connection=connection) -> List[str]:
+    if not is_partitioned(model, db_connection):
+        return []
+    table = model._meta.db_table
+    quote = db_connection.ops.quote_name
+
+    dropped_partitions = []
+    for old_month in partition_months(model, db_connection):
+        if add_months(old_month, 1) > cutoff_date:
+            break
+        name = partition_name(table, old_month)
+        with transaction.atomic(using=db_connection.alias), db_connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+            cursor.execute(f"DROP TABLE {quote(name)}")
+        dropped_partitions.append(name)
+    return dropped_partitions
+
+
+"""
+    expire the rows of the partitioned model dated before the cutoff date
+    the whole months before it are dropped as partitions (on PostgreSQL), and the rest of the expired rows,
+    in the month of the cutoff date or the default partition, are deleted in batches
+    return the report of the deletion, along with the number of partitions dropped
+"""
+def expire_rows_before(model: Model, cutoff_date: date, job_name: str=None) -> Dict:
+    dropped_partitions = drop_partitions_before(model, cutoff_date)
+    expired_rows = model.objects.filter(**{f"{partition_field(model).name}__lt": cutoff_date})
+    report = delete_in_batches(expired_rows, job_name)
+    report["dropped_partitions"] = len(dropped_partitions)
+    return report
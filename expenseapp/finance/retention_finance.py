@@ -0,0 +1,99 @@
+""" THESE ARE FUNCTIONS DELETING THE EXPIRED ROWS IN BOUNDED BATCHES, SO THE HOT TABLES ARE NEVER LOCKED FOR LONG """
+
+from typing import Dict, List
+import time
+from timeit import default_timer
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Model, QuerySet
+from django.db.models.deletion import Collector
+from expenseapp.models import RetentionCheckpoint
+
+
+"""
+    delete the rows of the model with the given primary keys with one DELETE, without the delete collector,
+    so no signal is sent and nothing is cascaded, the caller handles what they would do
+    return the number of rows deleted
+"""
+def delete_rows_by_pk(model: Model, pks: List, using: str=DEFAULT_DB_ALIAS) -> int:
+    if not pks:
+        return 0
+    db_connection = connections[using]
+    table = db_connection.ops.quote_name(model._meta.db_table)
+    pk_column = db_connection.ops.quote_name(model._meta.pk.column)
+    with db_connection.cursor() as cursor:
+        # the whole list is one array parameter on PostgreSQL
+        if db_connection.vendor == "postgresql":
+            cursor.execute(f"DELETE FROM {table} WHERE {pk_column} = ANY(%s)", [list(pks)])
+        else:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk_column} IN ({', '.join(['%s'] * len(pks))})", list(pks))
+        return cursor.rowcount
+
+
+"""
+    delete the rows of the queryset in batches of primary keys, each batch in its own short database transaction,
+    pausing between the batches so the writers waiting for the locks get their turn
+    the rows are deleted with one plain DELETE per batch if nothing is cascaded and no signal listens to their deletion
+    (or if raw is True, when the caller handles what the signals would do), otherwise with the delete collector
+
+    the batches go in the order of the primary key, and the last one deleted is checkpointed in the database 
+    under the job name, in the same database transaction as the batch, so if the worker is killed, 
+    the next run of the job (on any worker) skips the rows before it instead of scanning them again
+    return the report of the deletion, with the number of rows deleted per second
+"""
+def delete_in_batches(queryset: QuerySet, job_name: str=None, batch_size: int=None, pause: float=None, raw: bool=None) -> Dict:
+    if batch_size is None:
+        batch_size = getattr(settings, "RETENTION_BATCH_SIZE", 5000)
+    if pause is None:
+        pause = getattr(settings, "RETENTION_PAUSE", 0.05)
+    model = queryset.model
+    if raw is None:
+        raw = Collector(using=queryset.db).can_fast_delete(queryset)
+
+    checkpoints = RetentionCheckpoint.objects.using(queryset.db)
+    last_pk = checkpoints.filter(job_name=job_name).values_list("last_pk", flat=True).first() if job_name else None
+    num_deleted, num_batches = 0, 0
+    start_time = default_timer()
+    while True:
+        with transaction.atomic(using=queryset.db):
+            batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch_pks = list(batch_queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not batch_pks:
+                break
+
+            if raw:
+                num_deleted += delete_rows_by_pk(model, batch_pks, queryset.db)
+            else:
+                batch_rows = model._base_manager.using(queryset.db).filter(pk__in=batch_pks)
+                num_deleted += batch_rows.delete()[1].get(model._meta.label, 0)
+
+            last_pk = batch_pks[-1]
+            if job_name:
+                checkpoints.update_or_create(job_name=job_name, defaults={"last_pk": last_pk})
+        num_batches += 1
+
+        # the last batch is smaller than the others, so there is nothing left to delete
+        if len(batch_pks) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    # the job is done, so its next run starts from the first row again
+    if job_name:
+        checkpoints.filter(job_name=job_name).delete()
+    elapsed_time = default_timer() - start_time
+    return {
+        "model": model._meta.label, "deleted": num_deleted, "batches": num_batches, "raw": raw,
+        "seconds": round(elapsed_time, 3), "rows_per_second": round(num_deleted / elapsed_time) if elapsed_time else 0,
+    }
+
+
+# the line of the report of the deletion, printed by the retention tasks
+def format_retention_report(report: Dict) -> str:
+    report_line = (
+        f"{report['deleted']} {report['model']} deleted in {report['batches']} batches "
+        f"in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+    )
+    if report.get("dropped_partitions"):
+        report_line += f", {report['dropped_partitions']} monthly partitions dropped"
+    return report_line
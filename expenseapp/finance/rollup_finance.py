@@ -0,0 +1,115 @@
+""" THESE ARE FUNCTIONS KEEPING THE DAILY CATEGORY SPEND ROLLUP OF THE TRANSACTIONS UP TO DATE """
+
+from typing import List
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction, IntegrityError
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncTime
+from django.utils import timezone
+from datetime import date, time
+from expenseapp.models import DailyCategorySpend, Transaction
+from .analytics_cache import bump_data_version
+
+
+# return the date (in TIME_ZONE of the settings) the transaction was made
+def to_local_date(occur_date) -> date:
+    # datetime.now() is naive, which django would interpret in the default time zone
+    if timezone.is_naive(occur_date):
+        occur_date = timezone.make_aware(occur_date, timezone.get_default_timezone())
+    return timezone.localtime(occur_date, timezone.get_default_timezone()).date()
+
+
+"""
+    if the transaction was made exactly at the (local) midnight
+    the periods (first_date, last_date) cover the transactions till the midnight of the last date (inclusive), 
+    so these are the only transactions of the last date they include 
+"""
+def is_local_midnight(occur_date) -> bool:
+    if timezone.is_naive(occur_date):
+        occur_date = timezone.make_aware(occur_date, timezone.get_default_timezone())
+    return timezone.localtime(occur_date, timezone.get_default_timezone()).time() == time.min
+
+
+# add the given transactions to the rollup, or subtract them if sign is -1
+def apply_transactions_to_rollup(transaction_list: List[Transaction], sign: int=1) -> None:
+    apply_grouped_rollup(group_rollup_amounts(transaction_list), sign)
+
+
+"""
+    group the amount, the number, and the amount made at midnight of the transactions by user, account, date, and category
+    the groups can be accumulated over many lists of transactions by passing the previous groups
+"""
+def group_rollup_amounts(transaction_list: List[Transaction], grouped_amounts: defaultdict=None) -> defaultdict:
+    if grouped_amounts is None:
+        grouped_amounts = defaultdict(lambda: [Decimal(0), 0, Decimal(0)])
+    for this_transaction in transaction_list:
+        key = (
+            this_transaction.user_id, this_transaction.account_id,
+            to_local_date(this_transaction.occur_date), this_transaction.category
+        )
+        grouped_amounts[key][0] += Decimal(this_transaction.amount)
+        grouped_amounts[key][1] += 1
+        if is_local_midnight(this_transaction.occur_date):
+            grouped_amounts[key][2] += Decimal(this_transaction.amount)
+    return grouped_amounts
+
+
+# add the grouped amounts to the rollup, or subtract them if sign is -1
+def apply_grouped_rollup(grouped_amounts: defaultdict, sign: int=1) -> None:
+    for key, (amount_total, txn_count, midnight_total) in grouped_amounts.items():
+        apply_rollup_delta(*key, sign * amount_total, sign * txn_count, sign * midnight_total)
+
+    # the records that no longer have any transactions are removed
+    user_ids = {key[0] for key in grouped_amounts.keys()}
+    if sign < 0 and grouped_amounts:
+        DailyCategorySpend.objects.filter(user_id__in=user_ids, txn_count__lte=0).delete()
+
+    # the cached analytics of these users are out of date
+    for user_id in user_ids:
+        bump_data_version(user_id)
+
+
+# add the amount, number of transactions, and amount made at midnight to the rollup of the given account, date, and category
+def apply_rollup_delta(user_id: int, account_id: int, local_date: date, category: str, amount_delta: Decimal, count_delta: int, midnight_delta: Decimal=0) -> None:
+    rollup_filter = dict(user_id=user_id, account_id=account_id, local_date=local_date, category=category)
+    rollup_update = dict(
+        amount_total=F("amount_total") + amount_delta, txn_count=F("txn_count") + count_delta, 
+        midnight_total=F("midnight_total") + midnight_delta
+    )
+
+    # update in place with F() so that the concurrent writers don't overwrite each other
+    num_updated = DailyCategorySpend.objects.filter(**rollup_filter).update(**rollup_update)
+    if num_updated == 0:
+        try:
+            # the savepoint makes sure that the outer transaction survives the integrity error
+            with transaction.atomic():
+                DailyCategorySpend.objects.create(
+                    amount_total=amount_delta, txn_count=count_delta, midnight_total=midnight_delta, **rollup_filter
+                )
+        except IntegrityError:
+            # another writer has created the record in the mean time
+            DailyCategorySpend.objects.filter(**rollup_filter).update(**rollup_update)
+
+
+# rebuild the rollup of the given users from their transactions, return the number of rollup records created
+@transaction.atomic
+def rebuild_rollup(user_ids: List[int]) -> int:
+    DailyCategorySpend.objects.filter(user_id__in=user_ids).delete()
+
+    # group the transactions by user, account, local date, and category with one query
+    annotated_results = Transaction.objects.filter(user_id__in=user_ids).annotate(
+        local_date=TruncDate("occur_date", tzinfo=timezone.get_default_timezone()), 
+        local_time=TruncTime("occur_date", tzinfo=timezone.get_default_timezone())
+    ).values("user_id", "account_id", "local_date", "category").annotate(
+        amount_total=Sum("amount", default=0), txn_count=Count("id"), 
+        midnight_total=Sum("amount", default=0, filter=Q(local_time=time.min))
+    ).order_by()
+
+    created_rollup_list = [DailyCategorySpend(**result) for result in annotated_results]
+    DailyCategorySpend.objects.bulk_create(created_rollup_list, batch_size=1000)
+
+    for user_id in user_ids:
+        bump_data_version(user_id)
+    return len(created_rollup_list)
+
@@ -1,23 +1,22 @@
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, List
 from datetime import date, timedelta
-import yfinance as yf
+import hashlib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from expenseapp.models import DateStockPrice, Holding
+from .utils import get_period_calendar
+from .market_data import download_symbol_frames
 
 # get the first date of last month and current date 
 def get_first_and_last_dates(): 
-    current_date = date.today() # the last date (which is today)
+    calendar = get_period_calendar()
 
-    """
-        the first date (which is first date of last month)
-        month and year of the last date 
-    """
-    current_month, current_year = current_date.month, current_date.year
-    prev_month, prev_year = current_month - 1, current_year
-    if prev_month < 0: 
-        prev_month, prev_year = 12, prev_year - 1
-
-    first_date_last_month = date(year=prev_year, month=prev_month, day=1)
-    return first_date_last_month, current_date
+    # the first date of last month is the first date of the previous month in the calendar 
+    first_date_last_month = calendar.latest_periods("month", 2)[1][0]
+    return first_date_last_month, calendar.today
 
 
 # convert the date obj to string 
@@ -38,13 +37,17 @@ def to_date(arg_str):
 def load_stock_data(symbol: str) -> Dict: 
     # get the first and last date 
     first_date, last_date = get_first_and_last_dates()
-    # load data of the stock's info 
-    recent_data = yf.download([symbol], start=to_string(first_date), end=to_string(last_date))
+    # load data of the stock's info from the provider, which doesn't download the cached symbols again 
+    symbol_frames = download_symbol_frames([symbol], first_date, last_date)
+    if symbol not in symbol_frames: 
+        raise IndexError(f"There is no market data of the stock {symbol}.")
+    recent_data = field_frame(symbol_frames[symbol])
+    close = close_column(recent_data)
 
     # current info of the stock 
     custom_data = {
-        "current_close": round(Decimal(recent_data["Adj Close"].iloc[-1]), 2),
-        "previous_close": round(Decimal(recent_data["Adj Close"].iloc[-2]), 2), 
+        "current_close": round(Decimal(recent_data[close].iloc[-1]), 2),
+        "previous_close": round(Decimal(recent_data[close].iloc[-2]), 2), 
         "open": round(Decimal(recent_data["Open"].iloc[-1]), 2), 
         "high": round(Decimal(recent_data["High"].iloc[-1]), 2), 
         "low": round(Decimal(recent_data["Low"].iloc[-1]), 2), 
@@ -52,20 +55,7 @@ def load_stock_data(symbol: str) -> Dict:
     }
 
     # the price of the stock over the past
-    custom_data["price_data"] = []
-    current_date = first_date 
-    while current_date < last_date: 
-        try: 
-            given_date_price = recent_data["Adj Close"][to_string(current_date)]
-            item_data = {
-                "date": current_date, 
-                "given_date_close": float(round(given_date_price, 2))
-            }
-            custom_data["price_data"].append(item_data)
-        # the key error means that the price of stock on that date doesn't exist
-        except KeyError: 
-            pass
-        current_date += timedelta(days=1) # increment the date
+    custom_data["price_data"] = price_records(recent_data, first_date, last_date)
 
     # the date the price of the stock was updated 
     last_updated_date = custom_data["price_data"][-1]["date"]
@@ -73,19 +63,159 @@ def load_stock_data(symbol: str) -> Dict:
     return custom_data
 
 
-# update the info the stock, and add new record of the stock price 
-def update_stock_data(symbol: str) -> Dict: 
-    previous_date = to_string(date.today() - timedelta(days=1))
-    today = to_string(date.today())
-    
-    # return the Panda data frame 
-    updated_data = yf.download(symbol, start=previous_date, end=today)
+"""
+    the frame of one symbol with the OHLCV fields as its columns
+    yfinance gives the columns (field, symbol) or (symbol, field) even for one symbol, so the levels other than the fields are dropped
+"""
+def field_frame(frame: pd.DataFrame) -> pd.DataFrame: 
+    if not isinstance(frame.columns, pd.MultiIndex): 
+        return frame 
     
-    custom_data = {
-        "new_close": round(Decimal(updated_data["Adj Close"].iloc[0]), 2), 
-        "new_open": round(Decimal(updated_data["Open"].iloc[0]), 2), 
-        "new_high": round(Decimal(updated_data["High"].iloc[0]), 2), 
-        "new_low": round(Decimal(updated_data["Low"].iloc[0]), 2), 
-        "new_volume": int(updated_data["Volume"].iloc[0])
+    for field_level in range(frame.columns.nlevels): 
+        if "Open" in frame.columns.get_level_values(field_level): 
+            other_levels = [level for level in range(frame.columns.nlevels) if level != field_level]
+            return frame.droplevel(other_levels, axis=1)
+    raise ValueError("The frame has no OHLCV columns.")
+
+
+"""
+    convert the close of the frame between 2 dates (the last date is exclusive) into the records of the prices,
+    each with the date and the close rounded to 2 decimal places, ready to create DateStockPrice 
+    the dates without any close (the non-trading days) are left out 
+"""
+def price_records(frame: pd.DataFrame, first_date: date=None, last_date: date=None) -> List[Dict]: 
+    frame = field_frame(frame)
+    closes = frame[close_column(frame)].dropna()
+
+    # the dates of the prices are local to the exchange, whatever the time zone of the index 
+    dates = closes.index
+    if dates.tz is not None: 
+        dates = dates.tz_localize(None)
+    in_range = np.ones(len(dates), dtype=bool)
+    if first_date is not None: 
+        in_range &= dates >= pd.Timestamp(first_date)
+    if last_date is not None: 
+        in_range &= dates < pd.Timestamp(last_date)
+
+    price_dates = dates[in_range].date
+    price_closes = closes.to_numpy(dtype=float)[in_range].round(2).tolist()
+    return [
+        {"date": price_date, "given_date_close": price_close} 
+        for price_date, price_close in zip(price_dates, price_closes)
+    ]
+
+
+# the close of the frame, adjusted if the provider gives it 
+def close_column(frame) -> str: 
+    return "Adj Close" if "Adj Close" in frame.columns else "Close"
+
+
+# the latest info of the stock in the OHLCV frame, along with the date of that info 
+def latest_stock_data(frame) -> Dict: 
+    frame = field_frame(frame)
+    latest_row = frame.iloc[-1]
+    return {
+        "new_close": round(Decimal(latest_row[close_column(frame)]), 2), 
+        "new_open": round(Decimal(latest_row["Open"]), 2), 
+        "new_high": round(Decimal(latest_row["High"]), 2), 
+        "new_low": round(Decimal(latest_row["Low"]), 2), 
+        "new_volume": int(latest_row["Volume"]), 
+        "date": frame.index[-1].date(),
     }
-    return custom_data
\ No newline at end of file
+
+
+"""
+    fetch the updated info of the distinct symbols of the previous day, 
+    with one download of the provider per chunk of symbols instead of one per stock
+    return the dictionary mapping each symbol found to its updated info 
+"""
+def update_stocks_data(symbols: List[str], chunk_size: int=None) -> Dict: 
+    previous_date = date.today() - timedelta(days=1)
+    symbol_frames = download_symbol_frames(symbols, previous_date, date.today(), chunk_size)
+    return {symbol: latest_stock_data(frame) for symbol, frame in symbol_frames.items()}
+
+
+# update the info the stock, and add new record of the stock price 
+def update_stock_data(symbol: str) -> Dict: 
+    return update_stocks_data([symbol])[symbol]
+
+
+# if the portfolio values are materialized in PortfolioValue by the daily task, instead of computed from the prices 
+def portfolio_values_materialized() -> bool: 
+    return getattr(settings, "PORTFOLIO_VALUE_SOURCE", "computed") == "materialized"
+
+
+"""
+    compute the value of the portfolio of the user on each date between 2 dates (the last date is exclusive), 
+    as the close of each held security on the date times its shares, vectorized over the holdings 
+    only the dates with the price of any held security are valued, so the weekends and holidays are skipped, 
+    the security without the price on the valued date keeps its previous close, and is worth 0 before its first price 
+    return the list of (date, value) in the order of the date 
+"""
+def portfolio_value_points(arg_user, first_date: date=None, last_date: date=None, holding_rows: List=None) -> List: 
+    if first_date is None or last_date is None: 
+        first_date, last_date = get_first_and_last_dates()
+    if holding_rows is None: 
+        holding_rows = list(Holding.objects.filter(user=arg_user).values_list("security_id", "shares"))
+
+    num_dates = max((last_date - first_date).days, 0)
+    if not holding_rows or not num_dates: 
+        return []
+    # the column of each security in the matrix of the closes, and its shares in cents 
+    security_columns = {security_id: column for column, (security_id, _) in enumerate(holding_rows)}
+    share_cents = np.array([int(shares * 100) for _, shares in holding_rows], dtype=np.int64)
+
+    price_rows = list(DateStockPrice.objects.filter(
+        security_id__in=security_columns.keys(), date__gte=first_date, date__lt=last_date
+    ).values_list("security_id", "date", "given_date_close").order_by())
+    if not price_rows: 
+        return []
+    close_cents = np.zeros((num_dates, len(holding_rows)), dtype=np.int64)
+    has_close = np.zeros((num_dates, len(holding_rows)), dtype=bool)
+    date_offsets = np.array([(price_date - first_date).days for _, price_date, _ in price_rows])
+    columns = np.array([security_columns[security_id] for security_id, _, _ in price_rows])
+    close_cents[date_offsets, columns] = [int(close * 100) for _, _, close in price_rows]
+    has_close[date_offsets, columns] = True
+
+    # the row of the latest close on or before each date, for each security (forward filled) 
+    latest_rows = np.maximum.accumulate(np.where(has_close, np.arange(num_dates)[:, None], 0), axis=0)
+    filled_cents = np.where(
+        np.logical_or.accumulate(has_close, axis=0), 
+        np.take_along_axis(close_cents, latest_rows, axis=0), 0
+    )
+    # the closes and shares are both in cents, so the products are in 1/10000 
+    value_cents = filled_cents @ share_cents
+
+    # only the dates with any price, like the series materialized from the prices 
+    price_offsets = np.flatnonzero(has_close.any(axis=1))
+    return [
+        (first_date + timedelta(days=offset), (Decimal(int(value)) / 10000).quantize(Decimal("0.01")))
+        for offset, value in zip(price_offsets.tolist(), value_cents[price_offsets].tolist())
+    ]
+
+
+# the dictionary mapping each date (MM/DD/YYYY) to the value of the points, like the materialized portfolio values 
+def portfolio_value_series(points: List) -> Dict: 
+    return {point_date.strftime("%m/%d/%Y"): str(value) for point_date, value in points}
+
+
+"""
+    the same as portfolio_value_points() between the default dates, cached for PORTFOLIO_VALUE_CACHE_TIMEOUT seconds
+    the cache key has the holdings of the user along with the latest close of their securities, 
+    so the cached points are never read after the shares or the prices have changed 
+"""
+def cached_portfolio_value_points(arg_user) -> List: 
+    first_date, last_date = get_first_and_last_dates()
+    holding_rows = list(Holding.objects.filter(user=arg_user).order_by("security_id").values_list(
+        "security_id", "shares", "security__current_close", "security__last_updated_date"))
+    cache_timeout = getattr(settings, "PORTFOLIO_VALUE_CACHE_TIMEOUT", 300)
+    if not cache_timeout: 
+        return portfolio_value_points(arg_user, first_date, last_date, [row[:2] for row in holding_rows])
+
+    holdings_digest = hashlib.md5(repr(holding_rows).encode()).hexdigest()
+    cache_key = f"portfolio_value:{arg_user.pk}:{first_date}:{last_date}:{holdings_digest}"
+    points = cache.get(cache_key)
+    if points is None: 
+        points = portfolio_value_points(arg_user, first_date, last_date, [row[:2] for row in holding_rows])
+        cache.set(cache_key, points, timeout=cache_timeout)
+    return points
@@ -3,41 +3,43 @@ THESE ARE THE SUPPLEMENTAL FUNCTIONS THAT WILL SUPPORT OTHER FINANCE FUNCTIONS
 """
 
 from ast import Tuple
-from typing import Dict
-from django.db.models import Sum
+from typing import Dict, List
+from decimal import Decimal
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+from django.conf import settings
+from django.db.models import Q, Sum
 from expenseapp.models import category_dict
 from datetime import date, timedelta
 from calendar import monthrange
 
-# get the current first and last dates based on the interval type
-def get_current_dates(period_type: str=None, arg_first_date: date=None, arg_last_date: date=None) -> Tuple: 
-    if not arg_first_date: 
-        if period_type != "month": 
-            # the number of days of the intervals of given type (week or bi_week)
-            in_between_days = 7 if period_type == "week" else 14
+# whether the finance functions use the vectorized (numpy) backend instead of the ORM 
+def vector_backend_enabled() -> bool: 
+    return getattr(settings, "FINANCE_BACKEND", "orm") == "numpy"
 
-            # first and last date of the current interval 
-            last_date = date.today() + timedelta(days=(6 - date.today().weekday()))
-            first_date = last_date - timedelta(days=(in_between_days - 1))
-        else: 
-            """
-                if the type is month
-                first date and last date of the current month
-            """
-            first_date = date(year=date.today().year, month=date.today().month, day=1)
-            last_date = date(
-                year=date.today().year, 
-                month=date.today().month, 
-                day=monthrange(date.today().year, date.today().month)[1]
-            )
-    else: 
-        first_date, last_date = arg_first_date, arg_last_date
 
-    return first_date, last_date 
+# compute the current first and last dates based on the interval type, as of the given date
+def compute_current_dates(period_type: str, today: date) -> Tuple: 
+    if period_type != "month": 
+        # the number of days of the intervals of given type (week or bi_week)
+        in_between_days = 7 if period_type == "week" else 14
 
+        # first and last date of the current interval 
+        last_date = today + timedelta(days=(6 - today.weekday()))
+        first_date = last_date - timedelta(days=(in_between_days - 1))
+    else: 
+        """
+            if the type is month
+            first date and last date of the current month
+        """
+        first_date = date(year=today.year, month=today.month, day=1)
+        last_date = date(year=today.year, month=today.month, day=monthrange(today.year, today.month)[1])
+    return first_date, last_date
 
-# get the previous first and last dates 
-def get_previous_dates(period_type: str, arg_first_date: date, arg_last_date: date) -> Tuple: 
+
+# compute the previous first and last dates 
+def compute_previous_dates(period_type: str, arg_first_date: date, arg_last_date: date) -> Tuple: 
     if period_type != "month": 
         # the number of days of the intervals of given type (week or bi_week)
         in_between_days = 7 if period_type == "week" else 14
@@ -58,31 +60,205 @@ def get_previous_dates(period_type: str, arg_first_date: date, arg_last_date: da
     return prev_first_date, prev_last_date 
 
 
+"""
+    the current and previous months, bi-weeks, and weeks as of the given date, computed only once
+    one calendar is shared by the whole process, and rebuilt when the (local) date changes
+"""
+class PeriodCalendar: 
+    period_types = ["month", "bi_week", "week"]
+    num_precomputed_periods = 12 # the current period and 11 previous periods
+
+    def __init__(self, today: date): 
+        self.today = today
+
+        # the list of latest intervals of each type, and the mapping from each interval to the previous one
+        self.periods = {}
+        self.previous_periods = {}
+        for period_type in self.period_types: 
+            self.periods[period_type] = [compute_current_dates(period_type, today)]
+            # the calendar isn't shared yet, so it doesn't need the lock 
+            self.append_previous_periods(period_type, self.num_precomputed_periods)
+
+    # append the previous intervals to the list of latest intervals of the type, up to the given number of intervals 
+    def append_previous_periods(self, period_type: str, num_periods: int) -> None: 
+        interval_list = self.periods[period_type]
+        while len(interval_list) < num_periods + 1: 
+            previous_interval = compute_previous_dates(period_type, *interval_list[-1])
+            self.previous_periods[(period_type, interval_list[-1])] = previous_interval
+            interval_list.append(previous_interval)
+
+    """
+        extend the list of latest intervals of the type to the given number of intervals 
+        the calendar is shared by the threads of the process, so only one of them extends it at a time 
+    """
+    def extend_periods(self, period_type: str, num_periods: int) -> None: 
+        with shared_period_calendar_lock: 
+            self.append_previous_periods(period_type, num_periods)
+
+    # the first and last date of the current interval of the type 
+    def current_dates(self, period_type: str) -> Tuple: 
+        # like get_current_dates(), any type other than month or week has the length of bi-week 
+        if period_type not in self.periods: 
+            period_type = "bi_week"
+        return self.periods[period_type][0]
+
+    # the first and last date of the interval previous to the given one 
+    def previous_dates(self, period_type: str, first_date: date, last_date: date) -> Tuple: 
+        previous_interval = self.previous_periods.get((period_type, (first_date, last_date)))
+        if previous_interval is None: 
+            previous_interval = compute_previous_dates(period_type, first_date, last_date)
+        return previous_interval
+
+    # the list of latest intervals of the type, from the current one
+    def latest_periods(self, period_type: str, num_periods: int) -> List: 
+        if period_type not in self.periods: 
+            period_type = "bi_week"
+        if num_periods > len(self.periods[period_type]): 
+            self.extend_periods(period_type, num_periods)
+        return list(self.periods[period_type][:num_periods])
+
+
+# the calendar shared by the process, and the calendar pinned by the current request (or task)
+shared_period_calendar = None
+shared_period_calendar_lock = threading.Lock()
+pinned_period_calendar = ContextVar("pinned_period_calendar", default=None)
+
+
+# return the calendar pinned by the current request, or the shared calendar of today 
+def get_period_calendar() -> PeriodCalendar: 
+    global shared_period_calendar
+    calendar = pinned_period_calendar.get()
+    if calendar is not None: 
+        return calendar
+
+    calendar = shared_period_calendar
+    if calendar is None or calendar.today != date.today(): 
+        with shared_period_calendar_lock: 
+            if shared_period_calendar is None or shared_period_calendar.today != date.today(): 
+                shared_period_calendar = PeriodCalendar(date.today())
+            calendar = shared_period_calendar
+    return calendar
+
+
+"""
+    pin the calendar of today for the block, so that the whole request (or task) uses the same boundaries
+    even if it crosses midnight
+"""
+@contextmanager
+def pin_period_calendar(): 
+    token = pinned_period_calendar.set(get_period_calendar())
+    try: 
+        yield pinned_period_calendar.get()
+    finally: 
+        pinned_period_calendar.reset(token)
+
+
+# get the current first and last dates based on the interval type
+def get_current_dates(period_type: str=None, arg_first_date: date=None, arg_last_date: date=None) -> Tuple: 
+    if not arg_first_date: 
+        first_date, last_date = get_period_calendar().current_dates(period_type)
+    else: 
+        first_date, last_date = arg_first_date, arg_last_date
+
+    return first_date, last_date 
+
+
+# get the previous first and last dates 
+def get_previous_dates(period_type: str, arg_first_date: date, arg_last_date: date) -> Tuple: 
+    return get_period_calendar().previous_dates(period_type, arg_first_date, arg_last_date)
+
+
 # return the dictionary mapping the expense's category to amount for the interval between 2 dates
 def category_expense_dict(arg_obj, first_date: date, last_date: date) -> Dict:
-    # query the list of transactions (in general) incomes and expenses between 2 dates 
-    expense_list = arg_obj.transaction_set.filter(
-        occur_date__gte=first_date, 
-        occur_date__lte=last_date).exclude(category="Income")
-    
-    income_list = arg_obj.transaction_set.filter(
-        occur_date__gte=first_date, occur_date__lte=last_date, category="Income"
-    )
-    
+    return category_expense_dicts(arg_obj, [(first_date, last_date)])[0]
+
+
+"""
+    return the list of dictionaries mapping the expense's category to amount, one for each interval (first_date, last_date)
+    arg_obj can be either the user or the account, since both of them have the daily rollup 
+    each interval covers the transactions from the midnight of the first date till the midnight of the last date (inclusive),
+    the whole dates before the last date, and only the amount made at midnight of the last date
+"""
+def category_expense_dicts(arg_obj, date_ranges: List) -> List:
     """
-    calculate the total expense and the expense of each category
-    use the GROUP_BY technique for better query
+    calculate the amount of each category of every interval with only one query
+    use the GROUP_BY technique, with the filtered sums of each interval
+    the dates before the horizon of the archive are read from the archive instead, since their rollup is deleted
     """ 
-    category_expense = {category: 0.0 for category in list(category_dict.keys())}
-    annotated_results = expense_list.values("category").annotate(
-        total_amount=Sum("amount", default=0)).order_by()
+    # imported here, since the archive imports the analytics cache which imports this module 
+    from .archive_finance import split_archived_range
+
+    interval_sums = {}
+    for i, (first_date, last_date) in enumerate(date_ranges): 
+        interval_sums[f"interval_{i}"] = Sum(
+            "amount_total", default=0, filter=Q(local_date__gte=first_date, local_date__lt=last_date))
+        interval_sums[f"midnight_{i}"] = Sum("midnight_total", default=0, filter=Q(local_date=last_date))
+    
+    # only query the rollup within the widest window of the intervals 
+    window_first_date = min(first_date for first_date, _ in date_ranges)
+    window_last_date = max(last_date for _, last_date in date_ranges)
+    archived_rows, hot_first_date = split_archived_range(arg_obj, window_first_date, window_last_date)
+    annotated_results = arg_obj.dailycategoryspend_set.filter(
+        local_date__gte=hot_first_date, local_date__lte=window_last_date
+    ).values("category").annotate(**interval_sums).order_by()
+
+    category_amount_list = [{category: Decimal(0) for category in list(category_dict.keys())} for _ in date_ranges]
     for result in annotated_results: 
-        category_expense[result["category"]] = float(result["total_amount"])
+        for i in range(len(date_ranges)): 
+            category_amount_list[i][result["category"]] += result[f"interval_{i}"] + result[f"midnight_{i}"]
+
+    # add the archived days of each interval, like the filtered sums above 
+    for local_date, category, amount, midnight_amount in archived_rows: 
+        for i, (first_date, last_date) in enumerate(date_ranges): 
+            if first_date <= local_date < last_date: 
+                category_amount_list[i][category] += amount
+            elif local_date == last_date: 
+                category_amount_list[i][category] += midnight_amount
+
+    category_expense_list = [
+        {category: float(amount) for category, amount in category_amount.items()} for category_amount in category_amount_list]
+    for i, category_expense in enumerate(category_expense_list): 
+        total_expense = sum(amount for category, amount in category_amount_list[i].items() if category != "Income")
+        # compute expense transactions (income transactions is already computed as a category)
+        category_expense["Expense"] = float(total_expense)
+
+        # total transactions is really just sum of expense and income 
+        category_expense["Total"] = category_expense["Expense"] + category_expense["Income"]
+    return category_expense_list
+
 
-    # compute expense transactions, and income transactions
-    category_expense["Expense"] = float(expense_list.aggregate(total=Sum("amount", default=0))["total"])
-    category_expense["Income"] = float(income_list.aggregate(total=Sum("amount", default=0))["total"])
+# calculate the percent composition of each expense category, given the category expense dict
+def compute_composition_percentage(category_expense: Dict) -> Dict: 
+    """
+        dictionary mapping the expense's category to the percentage of expense
+        avoid hardcoding the category 
+    """
+    composition_percentage = {category : 0.0 for category in list(category_dict.keys()) if category != "Income"}
+
+    # total expense indicates that no transactions have been made 
+    if category_expense["Total"] != 0:  
+        # list of the keys of this dictionary
+        for category in list(composition_percentage.keys()):  
+            composition_percentage[category] = (category_expense[category] / category_expense["Total"]) * 100
+            composition_percentage[category] = round(composition_percentage[category], 2)
+
+    return composition_percentage
+
+
+# calculate the change percentage of each expense category, given the category expense dicts of 2 periods
+def compute_change_percentage(curr_expense_dict: Dict, prev_expense_dict: Dict) -> Dict: 
+    # dict mapping each category to the list [current, previous, change percentage]
+    change_percentage = {category : 0.0 for category in list(category_dict.keys()) if category != "Income"}
+
+    # calculate the change percentage 
+    for category in list(change_percentage.keys()): 
+        if prev_expense_dict[category] != 0: 
+            # calculate the percentage change and then add to the dict
+            change_percentage[category] = curr_expense_dict[category] - prev_expense_dict[category]
+            change_percentage[category] = (change_percentage[category] / prev_expense_dict[category]) * 100
+            change_percentage[category] = round(change_percentage[category], 2)
+        else: 
+            # if no expenses made during previous month, obviously expenses increase 100% 
+            change_percentage[category] = 100.00 if curr_expense_dict[category] != 0 else 0.00
 
-    # total transactions is really just sum of expense and income 
-    category_expense["Total"] = category_expense["Expense"] + category_expense["Income"]
-    return category_expense
\ No newline at end of file
+    return change_percentage
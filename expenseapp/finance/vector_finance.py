@@ -0,0 +1,243 @@
+"""
+THESE ARE THE VECTORIZED (NUMPY) VERSIONS OF THE EXPENSE AND BUDGET FUNCTIONS
+SELECTED WITH FINANCE_BACKEND = "numpy" IN THE SETTINGS, THEY GIVE THE SAME RESULTS AS THE ORM VERSIONS
+"""
+
+from typing import Dict, List, NamedTuple
+from datetime import date, timedelta
+from django.db.models import Sum
+import numpy as np
+from expenseapp.models import BudgetPlan, category_dict
+from .utils import *
+from .archive_finance import split_archived_range
+
+# the code of each category in the arrays, in the same order as category_dict
+CATEGORY_LIST = list(category_dict.keys())
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORY_LIST)}
+INCOME_CODE = CATEGORY_CODES["Income"]
+EXPENSE_CODES = np.array([code for code, category in enumerate(CATEGORY_LIST) if category != "Income"])
+
+
+# the daily rollup of the user (or the account) between 2 dates, as compact arrays
+class ExpenseArrays(NamedTuple):
+    first_date: date
+    num_days: int
+    day_offsets: np.ndarray # int32, the number of days since the first date
+    category_codes: np.ndarray # int8, the code of the category in CATEGORY_LIST
+    amount_cents: np.ndarray # int64, the amount in cents
+    midnight_cents: np.ndarray # int64, the part of the amount made exactly at midnight, in cents
+
+
+# query the daily rollup of the user (or the account) between 2 dates (inclusive) as arrays, with one query
+def load_expense_arrays(arg_obj, first_date: date, last_date: date) -> ExpenseArrays:
+    # the dates before the horizon of the archive are read from the archive instead 
+    rollup_rows, hot_first_date = split_archived_range(arg_obj, first_date, last_date)
+
+    # the rollup of the accounts are added up by the database first 
+    if hot_first_date <= last_date:
+        rollup_rows += list(arg_obj.dailycategoryspend_set.filter(
+            local_date__gte=hot_first_date, local_date__lte=last_date
+        ).values_list("local_date", "category").annotate(
+            total_amount=Sum("amount_total", default=0), midnight_amount=Sum("midnight_total", default=0)
+        ).order_by())
+
+    num_rows = len(rollup_rows)
+    return ExpenseArrays(
+        first_date=first_date,
+        num_days=(last_date - first_date).days + 1,
+        day_offsets=np.fromiter(
+            ((row[0] - first_date).days for row in rollup_rows), dtype=np.int32, count=num_rows),
+        category_codes=np.fromiter(
+            (CATEGORY_CODES[row[1]] for row in rollup_rows), dtype=np.int8, count=num_rows),
+        amount_cents=np.fromiter(
+            (int((row[2] * 100).to_integral_value()) for row in rollup_rows), dtype=np.int64, count=num_rows),
+        midnight_cents=np.fromiter(
+            (int((row[3] * 100).to_integral_value()) for row in rollup_rows), dtype=np.int64, count=num_rows),
+    )
+
+
+"""
+    the matrix (number of days x number of categories) of the amount in cents of each category on each date,
+    or of the amount made exactly at midnight if midnight is True
+"""
+def daily_category_cents(expense_arrays: ExpenseArrays, midnight: bool=False) -> np.ndarray:
+    num_categories = len(CATEGORY_LIST)
+    flat_cents = np.bincount(
+        expense_arrays.day_offsets.astype(np.int64) * num_categories + expense_arrays.category_codes,
+        weights=expense_arrays.midnight_cents if midnight else expense_arrays.amount_cents,
+        minlength=expense_arrays.num_days * num_categories
+    )
+    # the sums of the weights are floats, but exact as long as they are below 2^53 cents
+    return np.rint(flat_cents).astype(np.int64).reshape(expense_arrays.num_days, num_categories)
+
+
+"""
+    the matrix (number of intervals x number of categories) of the amount in cents of each category of each interval,
+    the whole dates before the last date and the amount made at midnight of the last date, like category_expense_dicts()
+"""
+def interval_category_cents(expense_arrays: ExpenseArrays, date_ranges: List, daily_cents: np.ndarray=None) -> np.ndarray:
+    if daily_cents is None:
+        daily_cents = daily_category_cents(expense_arrays)
+    midnight_cents = daily_category_cents(expense_arrays, midnight=True)
+
+    # the prefix sums over the dates, so the amount of any interval is the difference of 2 rows
+    prefix_cents = np.vstack([np.zeros((1, len(CATEGORY_LIST)), dtype=np.int64), np.cumsum(daily_cents, axis=0)])
+    first_offsets = np.array([(first_date - expense_arrays.first_date).days for first_date, _ in date_ranges])
+    last_offsets = np.array([(last_date - expense_arrays.first_date).days for _, last_date in date_ranges])
+    return prefix_cents[last_offsets] - prefix_cents[first_offsets] + midnight_cents[last_offsets]
+
+
+"""
+    the matrices of the category expense of each interval (in dollars, like category_expense_dict()),
+    return the tuple (category matrix, expense vector, income vector, total vector)
+"""
+def interval_category_expense(category_cents: np.ndarray) -> tuple:
+    category_expense = category_cents / 100
+    expense = category_cents[:, EXPENSE_CODES].sum(axis=1) / 100
+    income = category_cents[:, INCOME_CODE] / 100
+    return category_expense, expense, income, expense + income
+
+
+# the matrix of the composition percentage of each category of each interval (not rounded yet)
+def composition_matrix(category_expense: np.ndarray, total: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = (category_expense / total[:, np.newaxis]) * 100
+    # total expense of 0 indicates that no transactions have been made
+    return np.where(total[:, np.newaxis] != 0, percentage, 0.0)
+
+
+# the matrix of the change percentage of each category between the current and previous intervals (not rounded yet)
+def change_matrix(curr_expense: np.ndarray, prev_expense: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = ((curr_expense - prev_expense) / prev_expense) * 100
+    # if no expenses made during previous interval, obviously expenses increase 100%
+    return np.where(prev_expense != 0, percentage, np.where(curr_expense != 0, 100.00, 0.00))
+
+
+# convert the row of the percentage matrix to the dictionary mapping each expense category to its percentage
+def percentage_dict(percentage_row: np.ndarray) -> Dict:
+    return {CATEGORY_LIST[code]: round(float(percentage_row[code]), 2) for code in EXPENSE_CODES}
+
+
+# the same as daily_expense()
+def daily_expense(arg_user, first_date: date, last_date: date) -> Dict:
+    expense_arrays = load_expense_arrays(arg_user, first_date, last_date)
+    daily_cents = daily_category_cents(expense_arrays)[:, EXPENSE_CODES].sum(axis=1)
+    return daily_expense_dict(first_date, daily_cents / 100)
+
+
+# the dictionary mapping each date from the first date to its expense in the vector
+def daily_expense_dict(first_date: date, expense_vector: np.ndarray) -> Dict:
+    return {
+        (first_date + timedelta(days=i)).strftime("%m/%d/%Y"): float(expense)
+        for i, expense in enumerate(expense_vector)
+    }
+
+
+# the same as expense_composition_percentage(), given the first and last date
+def expense_composition_percentage(arg_obj, first_date: date, last_date: date) -> Dict:
+    expense_arrays = load_expense_arrays(arg_obj, first_date, last_date)
+    category_cents = interval_category_cents(expense_arrays, [(first_date, last_date)])
+    category_expense, _, _, total = interval_category_expense(category_cents)
+    return percentage_dict(composition_matrix(category_expense, total)[0])
+
+
+# the same as expense_change_percentage(), given the current and previous intervals
+def expense_change_percentage(arg_obj, curr_interval: tuple, prev_interval: tuple) -> Dict:
+    date_ranges = [curr_interval, prev_interval]
+    expense_arrays = load_expense_arrays(
+        arg_obj, min(first_date for first_date, _ in date_ranges), max(last_date for _, last_date in date_ranges))
+    category_expense = interval_category_expense(interval_category_cents(expense_arrays, date_ranges))[0]
+    return percentage_dict(change_matrix(category_expense[0], category_expense[1]))
+
+
+# the same as period_expense_series(), given the intervals including the one previous to the oldest interval
+def period_expense_series(arg_obj, series_intervals: List, expense_arrays: ExpenseArrays=None, daily_cents: np.ndarray=None) -> List:
+    if expense_arrays is None:
+        expense_arrays = load_expense_arrays(arg_obj, series_intervals[-1][0], series_intervals[0][1])
+
+    category_cents = interval_category_cents(expense_arrays, series_intervals, daily_cents)
+    category_expense, _, _, total = interval_category_expense(category_cents)
+
+    # the previous interval of each interval is the next row of the matrix
+    compositions = composition_matrix(category_expense[:-1], total[:-1])
+    changes = change_matrix(category_expense[:-1], category_expense[1:])
+
+    period_expense_list = []
+    for i, (first_date, last_date) in enumerate(series_intervals[:-1]):
+        period_expense_list.append({
+            "first_date": first_date,
+            "last_date": last_date,
+            "total_expense": float(total[i]),
+            "expense_change": percentage_dict(changes[i]),
+            "expense_composition": percentage_dict(compositions[i]),
+        })
+    return period_expense_list
+
+
+# the same as interval_total_expense(), given the latest intervals of each type and the window covering them
+def interval_total_expense(arg_user, series_intervals_dict: Dict, window_first_date: date, window_last_date: date) -> Dict:
+    expense_arrays = load_expense_arrays(arg_user, window_first_date, window_last_date)
+    daily_cents = daily_category_cents(expense_arrays)
+    daily_expense_vector = daily_cents[:, EXPENSE_CODES].sum(axis=1) / 100
+
+    period_expense_dict = {}
+    for period_type, series_intervals in series_intervals_dict.items():
+        period_expense_dict[period_type] = period_expense_series(arg_user, series_intervals, expense_arrays, daily_cents)
+
+        # daily expense of the user during each period, sliced from the daily vector
+        for period_expense in period_expense_dict[period_type]:
+            first_offset = (period_expense["first_date"] - window_first_date).days
+            last_offset = (period_expense["last_date"] - window_first_date).days
+            period_expense["daily_expense"] = daily_expense_dict(
+                period_expense["first_date"], daily_expense_vector[first_offset:last_offset + 1])
+    return period_expense_dict
+
+
+# the category expense of the current interval as a vector, and the total expense
+def budget_category_expense(arg_user, first_date: date, last_date: date) -> tuple:
+    expense_arrays = load_expense_arrays(arg_user, first_date, last_date)
+    category_cents = interval_category_cents(expense_arrays, [(first_date, last_date)])
+    category_expense, expense, _, _ = interval_category_expense(category_cents)
+    return category_expense[0], expense[0]
+
+
+# the same as budget_composition_percentage(), given the plan and the current interval
+def budget_composition_percentage(arg_user, queried_plan: BudgetPlan, first_date: date, last_date: date) -> Dict:
+    category_expense, total_expense = budget_category_expense(arg_user, first_date, last_date)
+
+    budget_percentage = {"goal": dict(queried_plan.category_portion), "actual": {}}
+    if total_expense != 0:
+        goal_categories = list(queried_plan.category_portion.keys())
+        goal_codes = np.array([CATEGORY_CODES[category] for category in goal_categories])
+        actual_percentage = (category_expense[goal_codes] / total_expense) * 100
+        for category, percentage in zip(goal_categories, actual_percentage):
+            budget_percentage["actual"][category] = round(float(percentage), 2)
+    return budget_percentage
+
+
+# the same as budget_progress_percentage(), given the plan and the current interval
+def budget_progress_percentage(arg_user, queried_plan: BudgetPlan, first_date: date, last_date: date) -> Dict:
+    category_expense, total_expense = budget_category_expense(arg_user, first_date, last_date)
+    total_budget = float(queried_plan.recurring_income * queried_plan.portion_for_expense / 100)
+
+    # the first entry is the total expense, followed by the categories of the plan
+    progress_categories = ["Expense"] + list(queried_plan.category_portion.keys())
+    goal_codes = np.array([CATEGORY_CODES[category] for category in progress_categories[1:]], dtype=np.int64)
+    category_portion = np.array([float(portion) for portion in queried_plan.category_portion.values()])
+
+    budgets = np.concatenate([[total_budget], category_portion * total_budget / 100])
+    currents = np.concatenate([[total_expense], category_expense[goal_codes]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentages = (currents / budgets) * 100
+    under_budget = currents < budgets
+
+    progress_percentage = {}
+    for i, category in enumerate(progress_categories):
+        progress_percentage[category] = {
+            "budget": float(budgets[i]),
+            "current": float(currents[i]),
+            # otherwise, percentage is automatically 100%
+            "percentage": round(float(percentages[i]), 2) if under_budget[i] else 100,
+        }
+    return progress_percentage
@@ -0,0 +1,86 @@
+"""
+THESE ARE THE HELPERS SHARED BY THE BENCHMARK COMMANDS, SEEDING THE SAME BENCHMARK DATA ON EVERY RUN,
+ROLLING IT BACK AT THE END, AND TIMING THE BEST OF THE REPEATED RUNS
+"""
+
+import random
+from contextlib import contextmanager
+from timeit import default_timer
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Callable, List
+from django.db import transaction
+from django.utils import timezone
+from expenseapp.models import Account, DateStockPrice, PortfolioValue, Security, Transaction, User, category_dict
+
+
+# the benchmark data created inside is rolled back at the end, even if the benchmark fails
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+# the best time (in seconds) of the repeated runs of the function, and the result of the last run
+def best_time(run: Callable, repeat: int) -> tuple:
+    best_seconds, result = None, None
+    for _ in range(max(repeat, 1)):
+        start_time = default_timer()
+        result = run()
+        elapsed_time = default_timer() - start_time
+        best_seconds = elapsed_time if best_seconds is None else min(best_seconds, elapsed_time)
+    return best_seconds, result
+
+
+# the time (in seconds) of the single run of the function, and its result
+def timed(run: Callable) -> tuple:
+    return best_time(run, 1)
+
+
+# the benchmark user, with the random numbers seeded by the size of the benchmark, so every run seeds the same data
+def seed_user(name: str, seed: int) -> User:
+    random.seed(seed)
+    return User.objects.create(username=f"benchmark_{name}_user_{seed}")
+
+
+# the debit accounts of the benchmark user
+def seed_accounts(user: User, num_accounts: int) -> List[Account]:
+    return Account.objects.bulk_create([
+        Account(user=user, account_number=i, name=f"Benchmark {i}", institution="Benchmark", account_type="Debit")
+        for i in range(num_accounts)
+    ])
+
+
+# the security of the benchmark symbol
+def seed_security(symbol: str) -> Security:
+    return Security.objects.create(
+        corporation="Benchmark Corp", name="Benchmark", symbol=symbol,
+        previous_close=100, current_close=101, open=100, low=99, high=102, volume=1000,
+        last_updated_date=date.today()
+    )
+
+
+# the random amount between 1.00 and 500.00
+def random_amount() -> Decimal:
+    return Decimal(random.randint(100, 50000)) / 100
+
+
+# the transaction of the random account, category, and amount, at a random hour of the date
+def random_transaction(user: User, account_list: List[Account], occur_date: date, i: int) -> Transaction:
+    return Transaction(
+        user=user, account=random.choice(account_list), description=f"Benchmark Transaction #{i}",
+        category=random.choice(list(category_dict.keys())), amount=random_amount(),
+        occur_date=timezone.make_aware(datetime.combine(occur_date, time(random.randint(0, 23))))
+    )
+
+
+# the random close of the security on each of the dates, and the value of the portfolio of the user holding 10 shares of it
+def seed_daily_prices(user: User, security: Security, dates: List[date]) -> None:
+    price_list, value_list = [], []
+    for this_date in dates:
+        close = random_amount()
+        price_list.append(DateStockPrice(security=security, date=this_date, given_date_close=close))
+        value_list.append(PortfolioValue(user=user, date=this_date, given_date_value=close * 10))
+    DateStockPrice.objects.bulk_create(price_list, batch_size=5000)
+    PortfolioValue.objects.bulk_create(value_list, batch_size=5000)
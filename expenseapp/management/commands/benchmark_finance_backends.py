@@ -0,0 +1,62 @@
+import random
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from expenseapp.models import BudgetPlan, Transaction
+from expenseapp.finance import interval_total_expense, get_budget_response_data, rebuild_rollup
+from expenseapp.management.benchmark import best_time, random_transaction, rolled_back, seed_accounts, seed_user
+
+
+# compare the ORM and the vectorized (numpy) finance backends over a growing number of transactions
+class Command(BaseCommand): 
+    help = "Benchmark the orm and numpy finance backends, and show the crossover point in number of transactions"
+
+    def add_arguments(self, parser): 
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000, 50000, 100000])
+        parser.add_argument("--repeat", type=int, default=5, help="Number of runs of each backend, the best one is kept")
+
+    # create the benchmark user with the given number of transactions over the last 6 months 
+    def seed_user(self, num_transactions): 
+        user = seed_user("backend", num_transactions)
+        BudgetPlan.objects.create(user=user, interval_type="month", recurring_income=5000, portion_for_expense=50)
+
+        # more accounts for more transactions, so that the rollup grows along with them 
+        account_list = seed_accounts(user, 1 + num_transactions // 2000)
+        first_date = date.today() - timedelta(weeks=26)
+        Transaction.objects.bulk_create([
+            random_transaction(user, account_list, first_date + timedelta(days=random.randint(0, 26 * 7)), i) 
+            for i in range(num_transactions)
+        ], batch_size=5000)
+        num_rollups = rebuild_rollup([user.pk])
+        return user, num_rollups
+
+    # the best time (in ms) of computing the analytics with the given backend 
+    def time_backend(self, backend, user, repeat): 
+        settings.FINANCE_BACKEND = backend
+        elapsed_time, _ = best_time(lambda: (interval_total_expense(user), get_budget_response_data(user, "month")), repeat)
+        return elapsed_time * 1000
+
+    def handle(self, *args, **options): 
+        original_backend = getattr(settings, "FINANCE_BACKEND", "orm")
+        crossover_size = None 
+
+        self.stdout.write(f"{'transactions':>12} {'rollup rows':>12} {'orm (ms)':>10} {'numpy (ms)':>11}")
+        for num_transactions in options["sizes"]: 
+            # the benchmark data is rolled back after each size 
+            with rolled_back(): 
+                user, num_rollups = self.seed_user(num_transactions)
+                orm_time = self.time_backend("orm", user, options["repeat"])
+                numpy_time = self.time_backend("numpy", user, options["repeat"])
+
+            # the smallest size from which the numpy backend stays faster 
+            if numpy_time < orm_time: 
+                crossover_size = num_transactions if crossover_size is None else crossover_size
+            else: 
+                crossover_size = None
+            self.stdout.write(f"{num_transactions:>12} {num_rollups:>12} {orm_time:>10.2f} {numpy_time:>11.2f}")
+
+        settings.FINANCE_BACKEND = original_backend
+        if crossover_size is None: 
+            self.stdout.write(self.style.WARNING("The numpy backend was never faster for the given sizes."))
+        else: 
+            self.stdout.write(self.style.SUCCESS(f"The numpy backend is faster from {crossover_size} transactions."))
@@ -0,0 +1,67 @@
+import random
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from expenseapp.models import Bill, PortfolioValue, Transaction
+from expenseapp.serializers import (
+    BillSerializer, PortfolioValueSerializer, StockPriceSerializer, TransactionSerializer
+)
+from expenseapp.management.benchmark import (
+    best_time, random_amount, random_transaction, rolled_back, seed_accounts, seed_daily_prices, seed_security, seed_user
+)
+
+
+# compare the DRF serializers and their fast path (values()) on the list endpoints, in rows per second
+class Command(BaseCommand):
+    help = "Benchmark the list serializers against their fast path (both give the same JSON, as tested in expenseapp.tests)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Number of rows of each list")
+        parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each path, the best one is kept")
+
+    # create the benchmark user with the given number of rows of each list
+    def seed_user(self, num_rows):
+        user = seed_user("serializer", num_rows)
+        account_list = seed_accounts(user, 5)
+        security = seed_security("BNCH")
+
+        dates = [date.today() - timedelta(days=num_rows - i) for i in range(num_rows)]
+        Transaction.objects.bulk_create(
+            [random_transaction(user, account_list, this_date, i) for i, this_date in enumerate(dates)], batch_size=5000)
+        Bill.objects.bulk_create([
+            Bill(
+                user=user, pay_account=random.choice(account_list), description=f"Benchmark Bill #{i}",
+                category="Bills", amount=random_amount(), due_date=this_date
+            )
+            for i, this_date in enumerate(dates)
+        ], batch_size=5000)
+        seed_daily_prices(user, security, dates)
+        return user, security
+
+    # the best time (in seconds) of rendering the list with the given function, and the rendered JSON
+    def time_render(self, serialize, repeat):
+        return best_time(lambda: JSONRenderer().render(serialize()), repeat)
+
+    # the queryset of the benchmark rows of each list serializer
+    def list_querysets(self, user, security):
+        return {
+            TransactionSerializer: Transaction.objects.filter(user=user).order_by("-occur_date", "-id"),
+            BillSerializer: Bill.objects.filter(user=user),
+            StockPriceSerializer: security.datestockprice_set.order_by("date"),
+            PortfolioValueSerializer: PortfolioValue.objects.filter(user=user).order_by("date"),
+        }
+
+    def handle(self, *args, **options):
+        num_rows, repeat = options["rows"], options["repeat"]
+
+        self.stdout.write(f"{'serializer':>26} {'drf (rows/s)':>13} {'fast (rows/s)':>14} {'speedup':>8}")
+        # the benchmark data is rolled back at the end
+        with rolled_back():
+            user, security = self.seed_user(num_rows)
+            for serializer_class, queryset in self.list_querysets(user, security).items():
+                drf_time, _ = self.time_render(lambda: serializer_class(queryset.all(), many=True).data, repeat)
+                fast_time, _ = self.time_render(lambda: serializer_class.fast_list(queryset.all()), repeat)
+                self.stdout.write(
+                    f"{serializer_class.__name__:>26} {num_rows / drf_time:>13.0f} {num_rows / fast_time:>14.0f} "
+                    f"{drf_time / fast_time:>7.1f}x"
+                )
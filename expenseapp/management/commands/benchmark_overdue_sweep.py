@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from expenseapp.models import Bill, OverdueBillMessage, User
+from expenseapp.tasks import sweep_overdue_bills, OVERDUE_BILL_CHUNK_SIZE
+from expenseapp.management.benchmark import rolled_back, timed
+
+
+# measure the set-based overdue bill sweep against the per-user loop it replaced
+class Command(BaseCommand):
+    help = "Benchmark the overdue bill sweep over the given number of users, each with one overdue bill"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100000)
+        parser.add_argument("--chunk-size", type=int, default=OVERDUE_BILL_CHUNK_SIZE)
+        parser.add_argument(
+            "--legacy-sample", type=int, default=1000,
+            help="Number of users swept by the per-user loop, whose time is extrapolated to all users (0 to skip)"
+        )
+
+    # create the benchmark users, each with one overdue bill and one upcoming bill
+    def seed_users(self, num_users):
+        User.objects.bulk_create(
+            [User(username=f"benchmark_sweep_user_{i}") for i in range(num_users)], batch_size=5000)
+        user_ids = list(User.objects.filter(username__startswith="benchmark_sweep_user_").values_list("pk", flat=True))
+
+        today = date.today()
+        bill_list = []
+        for user_id in user_ids:
+            bill_list.append(Bill(
+                user_id=user_id, pay_account=None, description="Overdue Benchmark Bill", amount=10,
+                due_date=today - timedelta(days=1)
+            ))
+            bill_list.append(Bill(
+                user_id=user_id, pay_account=None, description="Upcoming Benchmark Bill", amount=10,
+                due_date=today + timedelta(days=1)
+            ))
+        Bill.objects.bulk_create(bill_list, batch_size=5000)
+        return user_ids
+
+    # the per-user loop of the previous version of the task, on the given users
+    def legacy_sweep(self, user_ids, today):
+        for user in User.objects.filter(pk__in=user_ids):
+            overdue_bill_list = user.bill_set.filter(due_date__lt=today)
+            created_overdue_message_list = []
+            for overdue_bill in overdue_bill_list:
+                created_overdue_message_list.append(OverdueBillMessage(
+                    user=user, bill_description=overdue_bill.description,
+                    bill_amount=overdue_bill.amount, bill_due_date=overdue_bill.due_date, appear_date=today
+                ))
+            OverdueBillMessage.objects.bulk_create(created_overdue_message_list)
+            overdue_bill_list.delete()
+
+    def handle(self, *args, **options):
+        num_users, legacy_sample = options["users"], min(options["legacy_sample"], options["users"])
+        today = date.today()
+
+        # the benchmark data is rolled back at the end
+        with rolled_back():
+            seed_time, user_ids = timed(lambda: self.seed_users(num_users))
+            self.stdout.write(f"Seeded {num_users} users in {seed_time:.2f}s")
+
+            if legacy_sample:
+                # the bills swept by the per-user loop are restored for the set-based sweep
+                with rolled_back(), CaptureQueriesContext(connection) as legacy_queries:
+                    legacy_time, _ = timed(lambda: self.legacy_sweep(user_ids[:legacy_sample], today))
+                self.stdout.write(
+                    f"Per-user loop: {len(legacy_queries)} queries for {legacy_sample} users in {legacy_time:.2f}s, "
+                    f"about {legacy_time * num_users / legacy_sample:.1f}s for {num_users} users"
+                )
+
+            with CaptureQueriesContext(connection) as sweep_queries:
+                sweep_time, num_swept = timed(lambda: sweep_overdue_bills(today, options["chunk_size"]))
+            self.stdout.write(
+                f"Set-based sweep: {len(sweep_queries)} queries for {num_swept} bills in {sweep_time:.2f}s "
+                f"({num_swept / sweep_time:.0f} bills/s)"
+            )
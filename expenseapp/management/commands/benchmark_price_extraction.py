@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from expenseapp.finance import price_records, to_string
+from expenseapp.management.benchmark import best_time
+
+
+# compare the day-by-day extraction of the prices from the downloaded frame with the vectorized one, over years of history
+class Command(BaseCommand): 
+    help = "Benchmark the extraction of the price records from the OHLCV frames of multi-year histories (both give the same prices, as tested in expenseapp.tests)"
+
+    def add_arguments(self, parser): 
+        parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 10, 20])
+        parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each extraction, the best one is kept")
+
+    # the frame of the given years of trading days, with the (field, symbol) columns yfinance gives for one symbol 
+    def make_frame(self, first_date, last_date): 
+        trading_dates = pd.bdate_range(first_date, last_date - timedelta(days=1), name="Date")
+        rng = np.random.default_rng(len(trading_dates))
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(trading_dates))))
+        fields = {
+            "Adj Close": closes, "Close": closes, "High": closes * 1.01, "Low": closes * 0.99, "Open": closes, 
+            "Volume": rng.integers(1000, 100000, len(trading_dates)),
+        }
+        frame = pd.DataFrame(fields, index=trading_dates)
+        frame.columns = pd.MultiIndex.from_product([frame.columns, ["BNCH"]], names=["Price", "Ticker"])
+        return frame
+
+    # the day-by-day loop of the previous version of load_stock_data()
+    def legacy_records(self, frame, first_date, last_date): 
+        closes = frame.xs("BNCH", axis=1, level=1)["Adj Close"]
+        price_data = []
+        current_date = first_date 
+        while current_date < last_date: 
+            try: 
+                given_date_price = closes[to_string(current_date)]
+                price_data.append({"date": current_date, "given_date_close": float(round(given_date_price, 2))})
+            except KeyError: 
+                pass
+            current_date += timedelta(days=1)
+        return price_data
+
+    def handle(self, *args, **options): 
+        last_date = date.today()
+        self.stdout.write(f"{'years':>6} {'prices':>7} {'loop (ms)':>10} {'vectorized (ms)':>16} {'speedup':>8}")
+        for years in options["years"]: 
+            first_date = last_date - timedelta(days=365 * years)
+            frame = self.make_frame(first_date, last_date)
+
+            loop_time, _ = best_time(lambda: self.legacy_records(frame, first_date, last_date), options["repeat"])
+            vectorized_time, vectorized_records = best_time(
+                lambda: price_records(frame, first_date, last_date), options["repeat"])
+            self.stdout.write(
+                f"{years:>6} {len(vectorized_records):>7} {loop_time * 1000:>10.1f} {vectorized_time * 1000:>16.2f} "
+                f"{loop_time / vectorized_time:>7.0f}x"
+            )
@@ -0,0 +1,64 @@
+import gzip
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from expenseapp.models import Holding
+from expenseapp.views import PortfolioValueList, StockPriceDetail
+from expenseapp.management.benchmark import best_time, rolled_back, seed_daily_prices, seed_security, seed_user
+
+
+# compare the payload size and the latency of the time series endpoints, in the default and the columnar format
+class Command(BaseCommand):
+    help = "Benchmark the default and the columnar format of the time series endpoints (both give the same series, as tested in expenseapp.tests)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=3650, help="Number of days of the series")
+        parser.add_argument("--since-days", type=int, default=7, help="Number of days fetched with the since param")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of requests of each format, the best one is kept")
+
+    # create the benchmark user holding the security, with the price and the portfolio value of each day
+    def seed_user(self, num_days):
+        user = seed_user("series", num_days)
+        security = seed_security("BNCHS")
+        Holding.objects.create(user=user, security=security, shares=10)
+        seed_daily_prices(user, security, [date.today() - timedelta(days=num_days - i) for i in range(num_days)])
+        return user, security
+
+    # the best time (in seconds) of the GET request of the view, and the rendered content of its response
+    def time_request(self, view, path, user, repeat, **kwargs):
+        def get_content():
+            request = APIRequestFactory().get(path)
+            force_authenticate(request, user=user)
+            response = view(request, **kwargs)
+            response.render()
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} returned {response.status_code}.")
+            return response.content
+        return best_time(get_content, repeat)
+
+    def handle(self, *args, **options):
+        num_days, repeat = options["days"], options["repeat"]
+
+        self.stdout.write(
+            f"{'endpoint':>28} {'format':>9} {'bytes':>9} {'gzip bytes':>11} {'latency (ms)':>13}")
+        # the benchmark data is rolled back at the end, and the materialized values are served for the whole series
+        with rolled_back(), override_settings(PORTFOLIO_VALUE_SOURCE="materialized"):
+            user, security = self.seed_user(num_days)
+            since = (date.today() - timedelta(days=options["since_days"] + 1)).strftime("%m/%d/%Y")
+            endpoints = {
+                "StockPriceDetail": (StockPriceDetail.as_view(), "/expenseapp/stocks/BNCHS", {"symbol": "BNCHS"}),
+                "PortfolioValueList": (PortfolioValueList.as_view(), "/expenseapp/portfolio_value", {}),
+            }
+
+            for endpoint_name, (view, path, kwargs) in endpoints.items():
+                formats = {
+                    "default": path, "columnar": f"{path}?format=columnar",
+                    "since": f"{path}?format=columnar&since={since}",
+                }
+                for format_name, format_path in formats.items():
+                    elapsed_time, content = self.time_request(view, format_path, user, repeat, **kwargs)
+                    self.stdout.write(
+                        f"{endpoint_name:>28} {format_name:>9} {len(content):>9} "
+                        f"{len(gzip.compress(content)):>11} {elapsed_time * 1000:>13.1f}"
+                    )
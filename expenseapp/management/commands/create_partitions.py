@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from expenseapp.finance import create_partitions, is_partitioned, partition_months, partitioned_models
+
+
+# create the monthly partitions of the partitioned tables ahead of time, so the new rows never go to the default partition
+class Command(BaseCommand): 
+    help = "Create the monthly partitions of the transactions, stock prices, and portfolio values ahead of time (PostgreSQL only)"
+
+    def add_arguments(self, parser): 
+        parser.add_argument("--months-ahead", type=int, default=3, help="Number of months after the current one to create")
+
+    def handle(self, *args, **options): 
+        for partitioned_model in partitioned_models(): 
+            label = partitioned_model._meta.label
+            if not is_partitioned(partitioned_model): 
+                self.stdout.write(f"{label} isn't partitioned on the {connection.vendor} database, skipped.")
+                continue
+
+            created_partitions = create_partitions(partitioned_model, options["months_ahead"])
+            month_list = partition_months(partitioned_model)
+            self.stdout.write(
+                f"{label}: {len(created_partitions)} partitions created, "
+                f"{len(month_list)} months from {month_list[0]:%Y-%m} to {month_list[-1]:%Y-%m}"
+            )
+        self.stdout.write(self.style.SUCCESS("The partitions are up to date."))
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from datetime import date, timedelta
+from expenseapp.models import Account, Transaction, DailyCategorySpend, User
+from expenseapp.finance import get_current_dates
+from expenseapp.views import TransactionView
+
+
+# print the query plan of the transaction query of each endpoint, and whether it uses the indexes
+class Command(BaseCommand): 
+    help = "Show the query plan of the transaction queries of each endpoint against the seeded database"
+
+    def add_arguments(self, parser): 
+        parser.add_argument("--user", type=int, help="Id of the user to explain the queries for (default: the user with the most transactions)")
+        parser.add_argument("--category", default="Grocery", help="Category used by the category endpoints")
+
+    """
+        the queries of the first page of the paginated endpoint and of the page after it (from the cursor), 
+        built by TransactionView like the endpoint builds them 
+    """
+    def get_page_queries(self, endpoint, transaction_list): 
+        page_size = getattr(settings, "TRANSACTION_PAGE_SIZE", 20)
+        first_page = TransactionView.page_queryset(transaction_list, page_size)
+        page_queries = [(f"{endpoint} (first page)", first_page)]
+
+        # the cursor of the next page is the position of the last transaction of the first page 
+        page = list(first_page)
+        if len(page) > page_size: 
+            position = (page[page_size - 1]["occur_date"], page[page_size - 1]["id"])
+            page_queries.append(
+                (f"{endpoint} (next page)", TransactionView.page_queryset(transaction_list, page_size, position)))
+        return page_queries
+
+    # the queryset each endpoint runs, given the user, one of the user's account and the category
+    def get_endpoint_queries(self, user, account, category): 
+        first_date, last_date = get_current_dates("month")
+        interval_first_date, interval_last_date = date.today() - timedelta(weeks=8), date.today()
+        paginated_lists = [
+            ("transactions", Transaction.objects.filter(user=user)),
+            ("transactions/interval", Transaction.objects.filter(
+                user=user, occur_date__gte=interval_first_date, occur_date__lte=interval_last_date)),
+            ("transactions/category/<category>", Transaction.objects.filter(
+                user=user, category=category, occur_date__gte=first_date, occur_date__lte=last_date)),
+            ("transactions/both", Transaction.objects.filter(
+                user=user, category=category, 
+                occur_date__gte=interval_first_date, occur_date__lte=interval_last_date)),
+            ("accounts/<pk>/transactions", Transaction.objects.filter(account=account)),
+            ("accounts/<pk>/transactions/both", Transaction.objects.filter(
+                account=account, category=category, occur_date__gte=first_date, occur_date__lte=last_date)),
+        ]
+        endpoint_queries = []
+        for endpoint, transaction_list in paginated_lists: 
+            endpoint_queries += self.get_page_queries(endpoint, transaction_list)
+
+        return endpoint_queries + [
+            ("full_summary (initial transactions)", Transaction.objects.filter(
+                user=user, occur_date__gte=first_date, occur_date__lte=last_date).order_by("-occur_date")[:10]),
+            ("summary (daily rollup of user)", DailyCategorySpend.objects.filter(
+                user=user, local_date__gte=first_date, local_date__lte=last_date)),
+            ("accounts/<pk>/summary (daily rollup of account)", DailyCategorySpend.objects.filter(
+                account=account, local_date__gte=first_date, local_date__lte=last_date)),
+        ]
+
+    def handle(self, *args, **options): 
+        if options["user"]: 
+            user = User.objects.filter(pk=options["user"]).first()
+        else: 
+            user = User.objects.annotate(num_transactions=Count("transaction")).order_by("-num_transactions").first()
+        account = Account.objects.filter(user=user).first()
+        if user is None or account is None: 
+            raise CommandError("Seed the database with a user that has accounts and transactions first.")
+
+        # the names of the indexes of the transaction and the rollup 
+        index_names = [index.name for index in Transaction._meta.indexes + DailyCategorySpend._meta.indexes]
+
+        self.stdout.write(f"Explaining the queries of {user} ({user.transaction_set.count()} transactions)\n")
+        for endpoint, queryset in self.get_endpoint_queries(user, account, options["category"]): 
+            query_plan = queryset.explain()
+            used_indexes = [index_name for index_name in index_names if index_name in query_plan]
+
+            if used_indexes: 
+                self.stdout.write(self.style.SUCCESS(f"{endpoint}: uses {', '.join(used_indexes)}"))
+            else: 
+                self.stdout.write(self.style.WARNING(f"{endpoint}: uses none of the composite indexes"))
+            self.stdout.write(query_plan + "\n")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from expenseapp.models import User
+from expenseapp.finance import rebuild_rollup
+
+
+# rebuild the daily category spend rollup from the existing transactions, a chunk of users at a time
+class Command(BaseCommand): 
+    help = "Rebuild the daily category spend rollup from the existing transactions"
+
+    def add_arguments(self, parser): 
+        parser.add_argument("--chunk-size", type=int, default=500, help="Number of users rebuilt in each transaction")
+        parser.add_argument("--user", type=int, nargs="*", help="Only rebuild the rollup of the users with these ids")
+
+    def handle(self, *args, **options): 
+        user_list = User.objects.order_by("pk")
+        if options["user"]: 
+            user_list = user_list.filter(pk__in=options["user"])
+
+        # each chunk of users is rebuilt in its own transaction, so that the locks are held briefly
+        chunk_size = options["chunk_size"]
+        user_ids, num_users, num_rollups = [], 0, 0
+        for user_id in user_list.values_list("pk", flat=True).iterator(chunk_size=chunk_size): 
+            user_ids.append(user_id)
+            if len(user_ids) == chunk_size: 
+                num_rollups += rebuild_rollup(user_ids)
+                num_users += len(user_ids)
+                user_ids = []
+        if user_ids: 
+            num_rollups += rebuild_rollup(user_ids)
+            num_users += len(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"{num_rollups} rollup records rebuilt for {num_users} users."))
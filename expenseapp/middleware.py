@@ -0,0 +1,11 @@
+from .finance import pin_period_calendar
+
+
+# pin the period calendar of today for the whole request, so that a request crossing midnight gets consistent periods
+class PeriodCalendarMiddleware: 
+    def __init__(self, get_response): 
+        self.get_response = get_response
+
+    def __call__(self, request): 
+        with pin_period_calendar(): 
+            return self.get_response(request)
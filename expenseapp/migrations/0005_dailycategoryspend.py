@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0004_alter_budgetplan_category_portion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategorySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('local_date', models.DateField(verbose_name='The date (in TIME_ZONE) the transactions were made')),
+                ('category', models.CharField(choices=[('Income', 'INCOME'), ('Housing', 'HOUSING'), ('Automobile', 'AUTO'), ('Medical', 'MEDICAL'), ('Subscription', 'SUBSCRIPTION'), ('Grocery', 'GROCERY'), ('Dining', 'FOOD & DRINK'), ('Shopping', 'SHOPPING'), ('Gas', 'GAS'), ('Others', 'OTHERS')], max_length=30)),
+                ('amount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('txn_count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, to='expenseapp.account')),
+                ('user', models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'account', 'local_date', 'category'), name='unique_daily_category_spend')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0005_dailycategoryspend'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailycategoryspend',
+            index=models.Index(fields=['user', 'local_date'], name='spend_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailycategoryspend',
+            index=models.Index(fields=['account', 'local_date'], name='spend_acc_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-occur_date'], name='transaction_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', '-occur_date'], name='transaction_user_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-occur_date'], name='transaction_acc_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'category', '-occur_date'], name='transaction_acc_cat_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0006_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['due_date', 'id'], name='bill_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overduebillmessage',
+            index=models.Index(fields=['appear_date'], name='message_appear_date_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:26
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# keep only the latest value of each user and date, so the unique constraint can be added
+def remove_duplicate_portfolio_values(apps, schema_editor):
+    PortfolioValue = apps.get_model('expenseapp', 'PortfolioValue')
+    latest_pks = PortfolioValue.objects.values('user', 'date').annotate(latest_pk=Max('pk')).values('latest_pk')
+    PortfolioValue.objects.exclude(pk__in=latest_pks).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0007_overdue_sweep_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_portfolio_values, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='portfoliovalue',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_portfolio_value_per_date'),
+        ),
+    ]
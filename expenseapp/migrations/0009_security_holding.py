@@ -0,0 +1,111 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:29
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+# create the security of each symbol, the holding of each stock, and move the price history to the securities
+def split_stocks_into_securities(apps, schema_editor):
+    Stock = apps.get_model('expenseapp', 'Stock')
+    Security = apps.get_model('expenseapp', 'Security')
+    Holding = apps.get_model('expenseapp', 'Holding')
+    DateStockPrice = apps.get_model('expenseapp', 'DateStockPrice')
+    market_fields = [
+        'corporation', 'name', 'previous_close', 'current_close', 'open', 'low', 'high', 'volume', 'last_updated_date'
+    ]
+
+    # the market data of each symbol is taken from its most recently updated stock
+    securities = {}
+    for stock in Stock.objects.order_by('symbol', '-last_updated_date', '-pk'):
+        if stock.symbol not in securities:
+            securities[stock.symbol] = Security.objects.create(
+                symbol=stock.symbol, **{field: getattr(stock, field) for field in market_fields})
+
+    # one holding of each user and symbol
+    holdings = {}
+    for stock in Stock.objects.order_by('pk'):
+        key = (stock.user_id, stock.symbol)
+        if key in holdings:
+            holdings[key].shares += stock.shares
+        else:
+            holdings[key] = Holding(user_id=stock.user_id, security=securities[stock.symbol], shares=stock.shares)
+    Holding.objects.bulk_create(holdings.values(), batch_size=1000)
+
+    # the price of each symbol is kept once each date, the copies of the other holders are removed
+    for symbol, security in securities.items():
+        DateStockPrice.objects.filter(stock__symbol=symbol).update(security=security)
+    kept_price_pks = DateStockPrice.objects.values('security', 'date').annotate(kept_pk=models.Max('pk')).values('kept_pk')
+    DateStockPrice.objects.exclude(pk__in=kept_price_pks).delete()
+
+
+# create the stock of each holding, with the market data and the price history of its security
+def merge_securities_into_stocks(apps, schema_editor):
+    Stock = apps.get_model('expenseapp', 'Stock')
+    Holding = apps.get_model('expenseapp', 'Holding')
+    DateStockPrice = apps.get_model('expenseapp', 'DateStockPrice')
+
+    for holding in Holding.objects.select_related('security').order_by('pk'):
+        security = holding.security
+        stock = Stock.objects.create(
+            user_id=holding.user_id, shares=holding.shares, symbol=security.symbol,
+            corporation=security.corporation, name=security.name, previous_close=security.previous_close,
+            current_close=security.current_close, open=security.open, low=security.low, high=security.high,
+            volume=security.volume, last_updated_date=security.last_updated_date
+        )
+        DateStockPrice.objects.bulk_create([
+            DateStockPrice(stock=stock, security=security, date=price.date, given_date_close=price.given_date_close)
+            for price in DateStockPrice.objects.filter(security=security, stock__isnull=True)
+        ], batch_size=1000)
+    DateStockPrice.objects.filter(stock__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0008_portfolio_value_per_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Security',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corporation', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+                ('symbol', models.CharField(max_length=10, unique=True)),
+                ('previous_close', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(limit_value=Decimal('0'))])),
+                ('current_close', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(limit_value=Decimal('0'))])),
+                ('open', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(limit_value=Decimal('0'))])),
+                ('low', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(limit_value=Decimal('0'))])),
+                ('high', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(limit_value=Decimal('0'))])),
+                ('volume', models.BigIntegerField(default=0)),
+                ('last_updated_date', models.DateField(verbose_name='The last date the stock was updated')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Holding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shares', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(limit_value=Decimal('0'))])),
+                ('user', models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expenseapp.security')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'security'), name='unique_holding_per_security')],
+            },
+        ),
+        migrations.AddField(
+            model_name='datestockprice',
+            name='security',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='expenseapp.security'),
+        ),
+        migrations.AlterField(
+            model_name='datestockprice',
+            name='stock',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='expenseapp.stock'),
+        ),
+        migrations.RunPython(split_stocks_into_securities, merge_securities_into_stocks),
+    ]
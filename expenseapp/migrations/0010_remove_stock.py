@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0009_security_holding'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='datestockprice',
+            name='stock',
+        ),
+        migrations.AlterField(
+            model_name='datestockprice',
+            name='security',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expenseapp.security'),
+        ),
+        migrations.AlterModelOptions(
+            name='datestockprice',
+            options={'ordering': ['security', 'date']},
+        ),
+        migrations.AddConstraint(
+            model_name='datestockprice',
+            constraint=models.UniqueConstraint(fields=('security', 'date'), name='unique_security_price_per_date'),
+        ),
+        migrations.DeleteModel(
+            name='Stock',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:33
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0010_remove_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='security',
+            name='state',
+            field=models.CharField(choices=[('pending', 'PENDING'), ('ready', 'READY')], default='ready', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='StockJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('symbol', models.CharField(max_length=10)),
+                ('state', models.CharField(choices=[('pending', 'PENDING'), ('running', 'RUNNING'), ('done', 'DONE'), ('failed', 'FAILED')], default='pending', max_length=10)),
+                ('num_prices', models.IntegerField(default=0)),
+                ('error', models.CharField(blank=True, default='', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('security', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='expenseapp.security')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:41
+
+from datetime import date, datetime
+from django.db import migrations
+from django.utils import timezone
+
+"""
+    the tables of the dated rows rebuilt as the monthly range partitions, with the column each is partitioned by,
+    and the SQL of the indexes, constraints, and foreign keys of the table as of this migration
+    (they're dropped along with the old table, so they're created again with the same names)
+"""
+PARTITIONED_TABLES = {
+    "expenseapp_transaction": ("occur_date", [
+        'CREATE INDEX "expenseapp_transaction_account_id_dd39c8ab" ON "expenseapp_transaction" ("account_id")',
+        'CREATE INDEX "expenseapp_transaction_user_id_ec600485" ON "expenseapp_transaction" ("user_id")',
+        'CREATE INDEX "transaction_user_date_idx" ON "expenseapp_transaction" ("user_id", "occur_date" DESC)',
+        'CREATE INDEX "transaction_user_cat_date_idx" ON "expenseapp_transaction" ("user_id", "category", "occur_date" DESC)',
+        'CREATE INDEX "transaction_acc_date_idx" ON "expenseapp_transaction" ("account_id", "occur_date" DESC)',
+        'CREATE INDEX "transaction_acc_cat_date_idx" ON "expenseapp_transaction" ("account_id", "category", "occur_date" DESC)',
+        'ALTER TABLE "expenseapp_transaction" ADD CONSTRAINT "expenseapp_transacti_account_id_dd39c8ab_fk_expenseap" '
+        'FOREIGN KEY ("account_id") REFERENCES "expenseapp_account" ("id") DEFERRABLE INITIALLY DEFERRED',
+        'ALTER TABLE "expenseapp_transaction" ADD CONSTRAINT "expenseapp_transaction_user_id_ec600485_fk_expenseapp_user_id" '
+        'FOREIGN KEY ("user_id") REFERENCES "expenseapp_user" ("id") DEFERRABLE INITIALLY DEFERRED',
+    ]),
+    "expenseapp_datestockprice": ("date", [
+        'CREATE INDEX "expenseapp_datestockprice_security_id_c57a677f" ON "expenseapp_datestockprice" ("security_id")',
+        'ALTER TABLE "expenseapp_datestockprice" ADD CONSTRAINT "unique_security_price_per_date" UNIQUE ("security_id", "date")',
+        'ALTER TABLE "expenseapp_datestockprice" ADD CONSTRAINT "expenseapp_datestock_security_id_c57a677f_fk_expenseap" '
+        'FOREIGN KEY ("security_id") REFERENCES "expenseapp_security" ("id") DEFERRABLE INITIALLY DEFERRED',
+    ]),
+    "expenseapp_portfoliovalue": ("date", [
+        'CREATE INDEX "expenseapp_portfoliovalue_user_id_ffc2b9ab" ON "expenseapp_portfoliovalue" ("user_id")',
+        'ALTER TABLE "expenseapp_portfoliovalue" ADD CONSTRAINT "unique_portfolio_value_per_date" UNIQUE ("user_id", "date")',
+        'ALTER TABLE "expenseapp_portfoliovalue" ADD CONSTRAINT "expenseapp_portfolio_user_id_ffc2b9ab_fk_expenseap" '
+        'FOREIGN KEY ("user_id") REFERENCES "expenseapp_user" ("id") DEFERRABLE INITIALLY DEFERRED',
+    ]),
+}
+
+# the number of the monthly partitions created after the current month
+MONTHS_AHEAD = 3
+
+
+# the first date of the month after (or before, if months is negative) the month of the date
+def add_months(arg_date: date, months: int) -> date:
+    num_months = arg_date.year * 12 + arg_date.month - 1 + months
+    return date(num_months // 12, num_months % 12 + 1, 1)
+
+
+# the SQL literal of the first moment of the month, the months of the date times start at the local midnight
+def month_bound(column_type: str, this_month: date) -> str:
+    if column_type == "timestamp with time zone":
+        return f"'{timezone.make_aware(datetime.combine(this_month, datetime.min.time())).isoformat()}'"
+    return f"'{this_month.isoformat()}'"
+
+
+"""
+    rebuild the table as the table partitioned by month (or as the plain table again if partitioned is False),
+    with the same rows, indexes, constraints, and foreign keys, only on PostgreSQL
+    the id of both tables is given by the sequence of the table, continuing from the last id
+"""
+def rebuild_table(schema_editor, table: str, partitioned: bool) -> None:
+    column, constraint_sql_list = PARTITIONED_TABLES[table]
+    quote = schema_editor.quote_name
+    old_table, sequence = f"{table}_old", f"{table}_pk_seq"
+
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+    partition_clause = f" PARTITION BY RANGE ({quote(column)})" if partitioned else ""
+    schema_editor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} INCLUDING DEFAULTS){partition_clause}")
+
+    # the id continues from the last id of the old table
+    schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {quote(sequence)}")
+    schema_editor.execute(f"ALTER SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{quote('id')}")
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote('id')} SET DEFAULT nextval('{sequence}')")
+    schema_editor.execute(
+        f"SELECT setval('{sequence}', COALESCE((SELECT MAX({quote('id')}) FROM {quote(old_table)}), 0) + 1, false)")
+
+    if partitioned:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns WHERE table_name = %s AND column_name = %s", [table, column])
+            column_type = cursor.fetchone()[0]
+            cursor.execute(f"SELECT MIN({quote(column)}) FROM {quote(old_table)}")
+            first_value = cursor.fetchone()[0]
+
+        # the default partition keeps the rows of the months without their partition, until it's created
+        schema_editor.execute(f"CREATE TABLE {quote(f'{table}_default')} PARTITION OF {quote(table)} DEFAULT")
+
+        # the partitions from the month of the first row (or the current month) till the months ahead
+        this_month = timezone.localdate().replace(day=1)
+        if first_value is None:
+            new_month = this_month
+        else:
+            first_date = timezone.localdate(first_value) if isinstance(first_value, datetime) else first_value
+            new_month = min(first_date.replace(day=1), this_month)
+        while new_month <= add_months(this_month, MONTHS_AHEAD):
+            lower_bound, upper_bound = month_bound(column_type, new_month), month_bound(column_type, add_months(new_month, 1))
+            schema_editor.execute(
+                f"CREATE TABLE {quote(f'{table}_p{new_month.year}{new_month.month:02d}')} PARTITION OF {quote(table)} "
+                f"FOR VALUES FROM ({lower_bound}) TO ({upper_bound})"
+            )
+            new_month = add_months(new_month, 1)
+
+    schema_editor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}")
+    schema_editor.execute(f"DROP TABLE {quote(old_table)}")
+
+    # the primary key of the partitioned table has to include the partitioned column
+    primary_key = f"{quote('id')}, {quote(column)}" if partitioned else quote("id")
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f'{table}_pkey')} PRIMARY KEY ({primary_key})")
+    for constraint_sql in constraint_sql_list:
+        schema_editor.execute(constraint_sql)
+
+
+# if the database supports the declarative partitions the tables are converted to
+def supports_partitions(schema_editor) -> bool:
+    return schema_editor.connection.vendor == "postgresql" and schema_editor.connection.pg_version >= 110000
+
+
+# rebuild the tables of the dated rows as monthly range partitions, only on PostgreSQL
+def partition_tables(apps, schema_editor):
+    if not supports_partitions(schema_editor):
+        return
+    for table in PARTITIONED_TABLES:
+        rebuild_table(schema_editor, table, partitioned=True)
+
+
+# rebuild the partitioned tables as the plain tables again
+def unpartition_tables(apps, schema_editor):
+    if not supports_partitions(schema_editor):
+        return
+    for table in PARTITIONED_TABLES:
+        rebuild_table(schema_editor, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0011_stock_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
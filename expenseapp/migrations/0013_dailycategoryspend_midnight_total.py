@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:41
+
+from datetime import time
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate, TruncTime
+from django.utils import timezone
+
+
+# fill the amount made at midnight of the existing rollup from the transactions made exactly at the (local) midnight
+def backfill_midnight_totals(apps, schema_editor):
+    Transaction = apps.get_model("expenseapp", "Transaction")
+    DailyCategorySpend = apps.get_model("expenseapp", "DailyCategorySpend")
+    default_timezone = timezone.get_default_timezone()
+
+    midnight_results = Transaction.objects.annotate(
+        local_date=TruncDate("occur_date", tzinfo=default_timezone), 
+        local_time=TruncTime("occur_date", tzinfo=default_timezone)
+    ).filter(Q(local_time=time.min)).values("user_id", "account_id", "local_date", "category").annotate(
+        midnight_total=Sum("amount", default=0)
+    ).order_by()
+    for result in midnight_results.iterator(chunk_size=1000):
+        midnight_total = result.pop("midnight_total")
+        DailyCategorySpend.objects.filter(**result).update(midnight_total=midnight_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0012_monthly_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailycategoryspend',
+            name='midnight_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(backfill_midnight_totals, migrations.RunPython.noop),
+    ]
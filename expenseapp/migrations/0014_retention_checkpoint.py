@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenseapp', '0013_dailycategoryspend_midnight_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_name', models.CharField(max_length=100, unique=True)),
+                ('last_pk', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
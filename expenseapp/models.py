@@ -1,3 +1,4 @@
+import uuid
 from decimal import Decimal
 from django.db import models
 from django.contrib.auth.models import AbstractUser
@@ -56,11 +57,50 @@ class Transaction(models.Model):
     )
     occur_date = models.DateTimeField("The date transaction was made") # hours were used to sort 
 
+    class Meta: 
+        # the views and finance functions filter by the user or account (and category), latest first
+        indexes = [
+            models.Index(fields=["user", "-occur_date"], name="transaction_user_date_idx"),
+            models.Index(fields=["user", "category", "-occur_date"], name="transaction_user_cat_date_idx"),
+            models.Index(fields=["account", "-occur_date"], name="transaction_acc_date_idx"),
+            models.Index(fields=["account", "category", "-occur_date"], name="transaction_acc_cat_date_idx"),
+        ]
+
     # representation of the transaction 
     def __str__(self): 
         return self.description
     
 
+# the total amount and number of transactions of each category on each (local) date of the account
+# kept up to date on every write to the transactions, so that the finance functions don't rescan them
+class DailyCategorySpend(models.Model): 
+    user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, default=1)
+    local_date = models.DateField("The date (in TIME_ZONE) the transactions were made")
+    category = models.CharField(max_length=30, choices=category_dict)
+    amount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    txn_count = models.IntegerField(default=0)
+    # the part of the amount made exactly at the (local) midnight, the only part the periods ending on the date include
+    midnight_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta: 
+        # only one record for each account, date, and category 
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "account", "local_date", "category"], name="unique_daily_category_spend"
+            )
+        ]
+        # the finance functions read the rollup of the user or the account between 2 dates
+        indexes = [
+            models.Index(fields=["user", "local_date"], name="spend_user_date_idx"),
+            models.Index(fields=["account", "local_date"], name="spend_acc_date_idx"),
+        ]
+
+    # representation of the rollup using the account's name, the category and the date 
+    def __str__(self): 
+        return f"{self.account}'s {self.category} spend on {self.local_date}"
+    
+
 def get_default_dict(): 
     return dict(
         Housing=10, 
@@ -137,6 +177,10 @@ class Bill(models.Model):
         validators=[MinValueValidator(limit_value=Decimal(1.00))])
     due_date = models.DateField() 
 
+    class Meta: 
+        # the overdue bills of all users are swept by the due date every day
+        indexes = [models.Index(fields=["due_date", "id"], name="bill_due_date_idx")]
+
     def __str__(self): 
         return self.description
     
@@ -150,19 +194,23 @@ class PortfolioValue(models.Model):
     min_validator = [MinValueValidator(limit_value=Decimal(0.00))]
     given_date_value = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=min_validator)
 
+    class Meta: 
+        # only one value of the portfolio each date, so the daily valuation can be upserted 
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_portfolio_value_per_date")
+        ]
+
     def __str__(self): 
         return f"{self.user}'s portfolio value on {self.date}"
 
 
-# the stock that the user holds
-class Stock(models.Model):
+# the market data of the stock of each symbol, shared by all of the users holding it
+class Security(models.Model):
     min_validator = [MinValueValidator(limit_value=Decimal(0.00))]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)
     corporation = models.CharField(max_length=100)
     name = models.CharField(max_length=100)
-    symbol = models.CharField(max_length=10)
-    shares = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=min_validator)
+    symbol = models.CharField(max_length=10, unique=True)
 
     # close price of the stock on the updated date 
     previous_close = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=min_validator)
@@ -176,28 +224,64 @@ class Stock(models.Model):
     volume = models.BigIntegerField(default=0)  # volume of the stock's trading 
     last_updated_date = models.DateField("The last date the stock was updated")
 
-    # validate if the user has 2 different stocks of the same symbol 
-    def clean(self): 
-        # the list of stock with this stock symbol, but excluding this stock, if no instance, id = None
-        stock_list = self.user.stock_set.exclude(id=self.id).filter(symbol=self.symbol)
-        if stock_list.exists(): 
-            raise ValidationError(f"This stock overlaps the previous ones ({self.id})")
-    
-     # override in order to invoke clean() method before saving the instance 
+    # the security is pending until the job of its symbol has loaded its market data and prices 
+    state = models.CharField(max_length=10, choices={"pending": "PENDING", "ready": "READY"}, default="ready")
+
+    # representation of the security 
+    def __str__(self): 
+        return self.symbol
+
+
+# the stock that the user holds, the shares of the security 
+class Holding(models.Model): 
+    min_validator = [MinValueValidator(limit_value=Decimal(0.00))]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)
+    security = models.ForeignKey(Security, on_delete=models.CASCADE)
+    shares = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=min_validator)
+
+    class Meta: 
+        # the user can't have 2 different stocks of the same symbol 
+        constraints = [
+            models.UniqueConstraint(fields=["user", "security"], name="unique_holding_per_security")
+        ]
+
+     # override in order to validate the constraints before saving the instance 
     def save(self, *args, **kwargs): 
         self.full_clean()
         return super().save(*args, **kwargs) 
 
-    # representation of the stock 
+    # representation of the holding 
     def __str__(self): 
-        return self.symbol
+        return f"{self.user}'s {self.security.symbol}"
     
 
+# the job loading the market data and the prices of the security of the stock added by the user 
+class StockJob(models.Model): 
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # the security is deleted if its symbol isn't found, the job is kept to report the error 
+    security = models.ForeignKey(Security, on_delete=models.SET_NULL, null=True, blank=True)
+    symbol = models.CharField(max_length=10)
+    state = models.CharField(max_length=10, choices={
+        "pending": "PENDING", "running": "RUNNING", "done": "DONE", "failed": "FAILED"
+    }, default="pending")
+
+    num_prices = models.IntegerField(default=0) # the number of prices loaded 
+    error = models.CharField(max_length=200, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # representation of the job 
+    def __str__(self): 
+        return f"{self.user}'s job of {self.symbol} ({self.state})"
+
+
 # the price of the stock of the specific date 
 # only store the price of the stock on any date as of the first date of last month 
 # (1 month + x days of this month)
 class DateStockPrice(models.Model): 
-    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, default=1)
+    security = models.ForeignKey(Security, on_delete=models.CASCADE)
     date = models.DateField()
     given_date_close =  models.DecimalField(  # the close price of the given stock on the given date 
         max_digits=10, decimal_places=2, default=0, 
@@ -205,12 +289,16 @@ class DateStockPrice(models.Model):
     )
     
     class Meta: 
-        # order the stock price based on the stock and the date 
-        ordering = ["stock", "date"]
+        # order the stock price based on the security and the date 
+        ordering = ["security", "date"]
+        # the price of each symbol is stored only once each date 
+        constraints = [
+            models.UniqueConstraint(fields=["security", "date"], name="unique_security_price_per_date")
+        ]
     
     # representation of the stock's price 
     def __str__(self): 
-        return f"{self.stock.symbol}'s close on {self.date}"
+        return f"{self.security.symbol}'s close on {self.date}"
     
 
 # the message telling the user that the there are overdue bills 
@@ -224,6 +312,19 @@ class OverdueBillMessage(models.Model):
     bill_due_date = models.DateField("The date the overdue bill was due", null=True)
     appear_date = models.DateField("The date the message was created", null=True)
 
+    class Meta: 
+        # the messages of all users are deleted by the date they appeared
+        indexes = [models.Index(fields=["appear_date"], name="message_appear_date_idx")]
+
     def __str__(self): 
         return self.bill_description
-    
+
+
+# the last primary key deleted by the retention job, so the killed job resumes from it on any worker 
+class RetentionCheckpoint(models.Model): 
+    job_name = models.CharField(max_length=100, unique=True)
+    last_pk = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): 
+        return f"{self.job_name} checkpoint at {self.last_pk}"
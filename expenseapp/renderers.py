@@ -0,0 +1,9 @@
+from rest_framework.renderers import JSONRenderer
+
+"""
+    the JSON renderer selected by ?format=columnar, for the time series endpoints 
+    it renders the same way as the JSON renderer, the views give it the columnar data (see columnar_series()) 
+    instead of the object mapping each date to the value
+"""
+class ColumnarJSONRenderer(JSONRenderer): 
+    format = "columnar"
@@ -2,8 +2,85 @@ from .models import User
 from . import models
 from rest_framework.serializers import ValidationError as DRFValidationError
 from rest_framework import serializers, fields
+from typing import Dict, List
 import json
 
+"""
+    the read-only fast path of the list serializers, built on values() instead of the model instances
+    it gives the same JSON as serializer(queryset, many=True).data without the per-row field machinery,
+    and reads the related fields (like the account's name) in the same query
+"""
+class FastListMixin: 
+    fast_date_fields = [] # the fields formatted as "%m/%d/%Y" by to_representation()
+    fast_popped_fields = [] # the fields popped by to_representation()
+    fast_extra_lookups = [] # the lookups of values() needed by fast_extra_representation()
+
+    # the fields added by to_representation(), given the row of values()
+    @classmethod
+    def fast_extra_representation(cls, row: Dict) -> Dict: 
+        return {}
+    
+    # the list of (field name, lookup of values(), function converting the value) of the readable fields
+    @classmethod
+    def fast_field_specs(cls) -> List: 
+        field_specs = []
+        for field in cls().fields.values(): 
+            if field.write_only: 
+                continue
+            if field.field_name in cls.fast_date_fields: 
+                convert = lambda value: value.strftime("%m/%d/%Y")
+            elif isinstance(field, serializers.DecimalField): 
+                convert = field.to_representation
+            else: # the related fields are already primary keys, and the other fields are already in JSON type
+                convert = None
+            # the dotted source (like "security.symbol") is the lookup across the relation 
+            field_specs.append((field.field_name, field.source.replace(".", "__"), convert))
+        return field_specs
+    
+    # the lookups of values() needed by the fast path 
+    @classmethod
+    def fast_lookups(cls) -> List: 
+        return [source for _, source, _ in cls.fast_field_specs()] + cls.fast_extra_lookups
+
+    # serialize the rows of values() (or the queryset) to the same list as serializer(many=True).data
+    @classmethod
+    def fast_list(cls, rows) -> List: 
+        if hasattr(rows, "values"): 
+            rows = rows.values(*cls.fast_lookups())
+        field_specs = cls.fast_field_specs()
+
+        representation_list = []
+        for row in rows: 
+            representation = {}
+            for field_name, source, convert in field_specs: 
+                value = row[source]
+                representation[field_name] = value if value is None or convert is None else convert(value)
+            for field_name in cls.fast_popped_fields: 
+                representation.pop(field_name)
+            representation.update(cls.fast_extra_representation(row))
+            representation_list.append(representation)
+        return representation_list
+
+
+"""
+    the columnar representation of the time series of (date, value) points, in the order of the date 
+    the date of the first point is given once as the start, and each date as the days since the previous point, 
+    so the daily series is mostly 1s, and the values are the JSON numbers instead of the strings keyed by the date 
+"""
+def columnar_series(points: List) -> Dict: 
+    start_date = points[0][0] if points else None
+    dates, values = [], []
+    previous_date = start_date
+    for point_date, value in points: 
+        dates.append((point_date - previous_date).days)
+        values.append(value)
+        previous_date = point_date
+    return {
+        "start": start_date.strftime("%m/%d/%Y") if start_date else None, 
+        "dates": dates, "values": values
+    }
+
+
 class RegisterSerializer(serializers.ModelSerializer): 
     class Meta: 
         model = models.User
@@ -32,11 +109,13 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 # the serializer of the account 
-class AccountSerializer(serializers.ModelSerializer): 
+class AccountSerializer(FastListMixin, serializers.ModelSerializer): 
     class Meta: 
         model = models.Account 
         fields = "__all__"
 
+    fast_date_fields = ["due_date"]
+
     # overidding the representation of the date field 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -46,11 +125,19 @@ class AccountSerializer(serializers.ModelSerializer):
 
 
 # the serializer of the transaction 
-class TransactionSerializer(serializers.ModelSerializer): 
+class TransactionSerializer(FastListMixin, serializers.ModelSerializer): 
     class Meta: 
         model = models.Transaction
         exclude = ["user"] 
 
+    fast_date_fields = ["occur_date"]
+    fast_popped_fields = ["account"]
+    fast_extra_lookups = ["account__name"]
+
+    @classmethod
+    def fast_extra_representation(cls, row): 
+        return {"account_name": row["account__name"]}
+
     # create the account objects given the validated data
     def create(self, validated_data): 
         # create the transaction with the associated user, and account 
@@ -95,11 +182,18 @@ class BudgetPlanSerializer(serializers.ModelSerializer):
     
 
 # the serializer of the bills 
-class BillSerializer(serializers.ModelSerializer): 
+class BillSerializer(FastListMixin, serializers.ModelSerializer): 
     class Meta: 
         model = models.Bill
         fields = "__all__"
 
+    fast_date_fields = ["due_date"]
+    fast_extra_lookups = ["pay_account__name"]
+
+    @classmethod
+    def fast_extra_representation(cls, row): 
+        return {"pay_account_name": row["pay_account__name"]}
+
     # overidding the representation of the datetime field 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -109,11 +203,13 @@ class BillSerializer(serializers.ModelSerializer):
     
 
 # the serializer of the overdue bill message 
-class OverdueBillMessageSerializer(serializers.ModelSerializer): 
+class OverdueBillMessageSerializer(FastListMixin, serializers.ModelSerializer): 
     class Meta: 
         model = models.OverdueBillMessage
         exclude = ["appear_date"] 
 
+    fast_date_fields = ["bill_due_date"]
+
     def to_representation(self, instance):
         representation =  super().to_representation(instance)
         representation["bill_due_date"] = instance.bill_due_date.strftime("%m/%d/%Y")
@@ -121,27 +217,63 @@ class OverdueBillMessageSerializer(serializers.ModelSerializer):
     
 
 # the serializer of the price of stock on each date 
-class StockPriceSerializer(serializers.ModelSerializer): 
+class StockPriceSerializer(FastListMixin, serializers.ModelSerializer): 
     class Meta:
         model = models.DateStockPrice
         fields = "__all__"
 
+    fast_date_fields = ["date"]
+
     def to_representation(self, instance):
         representation =  super().to_representation(instance)
         representation["date"] = instance.date.strftime("%m/%d/%Y")
         return representation
 
 
-# serializer of the stock 
-class StockSerializer(serializers.ModelSerializer): 
+# serializer of the market data of the security, only used to validate the new security
+class SecuritySerializer(serializers.ModelSerializer): 
     class Meta: 
-        model = models.Stock
+        model = models.Security
         fields = "__all__"
 
-    # restrict the field the user can update 
+
+"""
+    serializer of the stock, the holding of the user along with the market data of its security
+    the representation is the same as the one of the stock before it was split into the security and holding
+"""
+class StockSerializer(FastListMixin, serializers.ModelSerializer): 
+    corporation = serializers.CharField(source="security.corporation", read_only=True)
+    name = serializers.CharField(source="security.name", read_only=True)
+    symbol = serializers.CharField(source="security.symbol", read_only=True)
+    previous_close = serializers.DecimalField(max_digits=10, decimal_places=2, source="security.previous_close", read_only=True)
+    current_close = serializers.DecimalField(max_digits=10, decimal_places=2, source="security.current_close", read_only=True)
+    open = serializers.DecimalField(max_digits=10, decimal_places=2, source="security.open", read_only=True)
+    low = serializers.DecimalField(max_digits=10, decimal_places=2, source="security.low", read_only=True)
+    high = serializers.DecimalField(max_digits=10, decimal_places=2, source="security.high", read_only=True)
+    volume = serializers.IntegerField(source="security.volume", read_only=True)
+    last_updated_date = serializers.DateField(source="security.last_updated_date", read_only=True)
+    # pending until the market data of the security is loaded 
+    state = serializers.CharField(source="security.state", read_only=True)
+
+    class Meta: 
+        model = models.Holding
+        fields = [
+            "id", "corporation", "name", "symbol", "shares", "previous_close", "current_close", 
+            "open", "low", "high", "volume", "last_updated_date", "state", "user"
+        ]
+
+    fast_date_fields = ["last_updated_date"]
+    fast_popped_fields = ["previous_close"]
+
+    @classmethod
+    def fast_extra_representation(cls, row): 
+        change = (row["security__current_close"] - row["security__previous_close"]) 
+        return {"change": '{0:.2f}'.format(change)}
+
+    # restrict the field the user can update, the market data is shared by all of the holders 
     def update(self, instance, validated_data): 
         # the user can't update 
-        if validated_data["symbol"] != instance.symbol: 
+        if self.initial_data.get("symbol", instance.security.symbol) != instance.security.symbol: 
             raise DRFValidationError("The data has different symbol. Can't update.")
         return super().update(instance, validated_data)
 
@@ -150,20 +282,29 @@ class StockSerializer(serializers.ModelSerializer):
         representation =  super().to_representation(instance)
         # change percentage from the previous close to the current close 
         representation.pop("previous_close")
-        change = (instance.current_close - instance.previous_close) 
+        change = (instance.security.current_close - instance.security.previous_close) 
         representation["change"] = '{0:.2f}'.format(change)
 
         # change format of the date
-        representation["last_updated_date"] = instance.last_updated_date.strftime("%m/%d/%Y")
+        representation["last_updated_date"] = instance.security.last_updated_date.strftime("%m/%d/%Y")
         return representation
     
 
+# serializer of the job loading the market data of the stock 
+class StockJobSerializer(serializers.ModelSerializer): 
+    class Meta: 
+        model = models.StockJob
+        fields = ["id", "symbol", "state", "num_prices", "error", "created_at", "finished_at"]
+
+
 # serializer of the value of the porfolio
-class PortfolioValueSerializer(serializers.ModelSerializer): 
+class PortfolioValueSerializer(FastListMixin, serializers.ModelSerializer): 
     class Meta: 
         model = models.PortfolioValue
         fields = "__all__"
 
+    fast_date_fields = ["date"]
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation["date"] = instance.date.strftime("%m/%d/%Y")
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Account, Bill, BudgetPlan
+from .finance import bump_data_version
+
+"""
+    the cached analytics of the user are out of date whenever the user's accounts, bills, or budget plans change
+    (the changes to the transactions bump the version through the daily rollup)
+"""
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+@receiver(post_save, sender=BudgetPlan)
+@receiver(post_delete, sender=BudgetPlan)
+def invalidate_user_analytics(sender, instance, **kwargs): 
+    bump_data_version(instance.user_id)
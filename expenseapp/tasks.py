@@ -1,13 +1,20 @@
 from timeit import default_timer
+from typing import Dict
 from celery import shared_task
+from django.conf import settings
 from .models import (
-    Account, PortfolioValue, User, Stock, DateStockPrice, 
-    Transaction, OverdueBillMessage 
+    Account, Bill, PortfolioValue, User, Security, DateStockPrice, StockJob,
+    Transaction, OverdueBillMessage, DailyCategorySpend
 )
 from django.db import transaction
-from django.db.models import F, Sum
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
 from datetime import timedelta, date
-from .finance import update_stock_data
+from .finance import (
+    update_stocks_data, load_stock_data, bump_data_version, get_first_and_last_dates, get_period_calendar,
+    delete_in_batches, format_retention_report, expire_rows_before, create_partitions, partitioned_models,
+    archive_transactions_before, set_archive_horizon, portfolio_values_materialized, delete_rows_by_pk
+)
 
 # update the due date of the credit account (every month)
 @shared_task(bind=True, max_retries=1, default_retry_delay=60)
@@ -33,7 +40,6 @@ def update_credit_due_date(self) -> None:
 
 # update the info of the stock and create the record for the previous day
 @shared_task(bind=True, max_retries=1, default_retry_delay=60)
-@transaction.atomic
 def update_info_and_create_price(self) -> None: 
     try: 
         # if it's sunday or monday, we won't need to check for the change since the market is closed 
@@ -42,132 +48,282 @@ def update_info_and_create_price(self) -> None:
             print(f"There is nothing to update.")
             return  
         
-        updated_stock_list = []
-        updated_field_list = ["previous_close", "current_close", "open", "low", "high", "volume", "last_updated_date"]
+        num_symbols, num_updated_stock, num_created_price = update_securities_and_prices()
+        print(f"{num_updated_stock} of {num_symbols} securities updated successfully!")
+        print(f"{num_created_price} dates stock price created")
 
-        for stock in Stock.objects.all(): 
-            # fetch the updated info about the stock 
-            updated_stock_data = update_stock_data(stock.symbol)
-
-            """
-                update the data of each stock instance in the database
-                current close, previous_close, open, low, high, volume
-            """
-            stock.previous_close = stock.current_close
-            stock.current_close = updated_stock_data["new_close"]
-            stock.open = updated_stock_data["new_open"]
-            stock.low = updated_stock_data["new_low"]
-            stock.high = updated_stock_data["new_high"]
-            stock.volume = updated_stock_data["new_volume"]
-
-            # update the last_updated_date 
-            if stock.last_updated_date.weekday() == 4: 
-                stock.last_updated_date += timedelta(days=3)
-            else: 
-                stock.last_updated_date += timedelta(days=1)
-
-            # add stock the list of stocks to update 
-            updated_stock_list.append(stock)
-                
-        # using bulk_update() to update with only 1 query 
-        num_updated_stock = Stock.objects.bulk_update(updated_stock_list, updated_field_list)
-        updated_stock_queryset = Stock.objects.all()
-        print(f"{num_updated_stock} stocks updated successfully!")
-
-        # create the new date price instance for the updated stock
-        created_stock_price_list = []
-        for updated_stock in updated_stock_queryset: 
-            created_stock_price_list.append(DateStockPrice(
-                stock=updated_stock, date=updated_stock.last_updated_date, 
-                given_date_close=updated_stock.current_close,
-            ))
-        # bulk_create() to make it more efficient 
-        created_queryset = DateStockPrice.objects.bulk_create(created_stock_price_list)
-        print(f"{len(created_queryset)} dates stock price created")
-
-        # create the value of the portfolio 
-        create_portfolio_value()
+        # create the value of the portfolio, if it isn't computed from the prices instead 
+        if portfolio_values_materialized(): 
+            create_portfolio_value()
         
     except Exception as exc: 
          raise self.retry(exc=exc)
 
 
-# create the new portfolio value for the previous date 
-def create_portfolio_value() -> None: 
+"""
+    update each security held by any user, and create (or correct) its price of the previous day 
+    each symbol is downloaded once, however many users hold it 
+    return the tuple (number of symbols, number of securities updated, number of prices created)
+"""
+def update_securities_and_prices() -> tuple: 
+    # the pending securities are left to the jobs loading their market data 
+    symbols = list(Security.objects.filter(holding__isnull=False, state="ready").order_by("symbol").values_list("symbol", flat=True).distinct())
+    chunk_size = getattr(settings, "MARKET_DATA_CHUNK_SIZE", 100)
+
+    num_updated_stock, num_created_price = 0, 0
+    for i in range(0, len(symbols), chunk_size): 
+        # download outside of the database transaction, so nothing is locked while waiting for the network 
+        updated_stocks_data = update_stocks_data(symbols[i:i + chunk_size], chunk_size)
+        with transaction.atomic(): 
+            updated_stock, created_price = apply_stocks_data(updated_stocks_data)
+        num_updated_stock += updated_stock
+        num_created_price += created_price
+    return len(symbols), num_updated_stock, num_created_price
+
+
+"""
+    apply the updated info of each symbol to its security, which every holding of the symbol shares,
+    and create (or correct) the price of the date of the info once per symbol 
+    return the tuple (number of securities updated, number of prices created)
+"""
+def apply_stocks_data(updated_stocks_data: Dict) -> tuple: 
+    updated_security_list = []
+    for security in Security.objects.filter(symbol__in=updated_stocks_data.keys()): 
+        updated_stock_data = updated_stocks_data[security.symbol]
+
+        security.previous_close = security.current_close
+        security.current_close = updated_stock_data["new_close"]
+        security.open = updated_stock_data["new_open"]
+        security.low = updated_stock_data["new_low"]
+        security.high = updated_stock_data["new_high"]
+        security.volume = updated_stock_data["new_volume"]
+        security.last_updated_date = updated_stock_data["date"]
+        updated_security_list.append(security)
+
+    # using bulk_update() to update with only 1 query 
+    Security.objects.bulk_update(updated_security_list, [
+        "previous_close", "current_close", "open", "low", "high", "volume", "last_updated_date"
+    ])
+
+    # the price of the date from the same info 
+    created_stock_price_list = [
+        DateStockPrice(security=security, date=security.last_updated_date, given_date_close=security.current_close)
+        for security in updated_security_list
+    ]
+    DateStockPrice.objects.bulk_create(
+        created_stock_price_list, update_conflicts=True, 
+        unique_fields=["security", "date"], update_fields=["given_date_close"]
+    )
+    return len(updated_security_list), len(created_stock_price_list)
+
+
+"""
+    load the market data and all of the prices of the pending security of the stocks just added by the users
+    the download happens outside of the database transaction, and the jobs of the security are updated with it 
+    the task is only acknowledged once it's done, so the task of the worker killed in the middle is delivered again
+"""
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, acks_late=True, reject_on_worker_lost=True)
+def load_security_data(self, security_id: int) -> None: 
+    security = Security.objects.filter(pk=security_id, state="pending").first()
+    if security is None: # the security was already loaded, or deleted 
+        return 
+    StockJob.objects.filter(security=security, state="pending").update(state="running")
+
+    try: 
+        stock_data = load_stock_data(security.symbol)
+    except IndexError: # if the stock with the given symbol isn't found 
+        fail_security_jobs(security_id, "No stock with the given symbol")
+        return 
+    except Exception as exc: 
+        # the provider might be down, so try again later until the retries run out 
+        if self.request.retries >= self.max_retries: 
+            fail_security_jobs(security_id, "The market data of the stock couldn't be loaded")
+            return 
+        raise self.retry(exc=exc)
+
+    stock_price_data = stock_data.pop("price_data")
+    with transaction.atomic(): 
+        # lock the security, so the stock added while it's being saved has its job updated as well 
+        security = Security.objects.select_for_update().filter(pk=security_id).first()
+        if security is None: 
+            return 
+        for field, value in stock_data.items(): 
+            setattr(security, field, value)
+        security.state = "ready"
+        security.save()
+
+        # add all of the price of the stock
+        DateStockPrice.objects.bulk_create([
+            DateStockPrice(security=security, date=price_data["date"], given_date_close=price_data["given_date_close"])
+            for price_data in stock_price_data
+        ], update_conflicts=True, unique_fields=["security", "date"], update_fields=["given_date_close"])
+
+        StockJob.objects.filter(security=security, state__in=["pending", "running"]).update(
+            state="done", num_prices=len(stock_price_data), finished_at=timezone.now())
+
+
+# fail the jobs of the security and delete it, along with the stocks of it the users added 
+def fail_security_jobs(security_id: int, error: str) -> None: 
+    with transaction.atomic(): 
+        security = Security.objects.select_for_update().filter(pk=security_id).first()
+        if security is None: 
+            return 
+        StockJob.objects.filter(security=security, state__in=["pending", "running"]).update(
+            state="failed", error=error, finished_at=timezone.now())
+        security.delete()
+
+
+# the number of users valued by each bulk_create() of the portfolio values
+PORTFOLIO_VALUE_CHUNK_SIZE = 5000
+
+
+"""
+    create the new portfolio value of every user for the previous date, including the users without any stock
+    the values of all users are computed by one grouped query, streamed in chunks of users with iterator(), 
+    and upserted on (user, date), so running it twice on the same date just updates the values
+"""
+def create_portfolio_value(chunk_size: int=PORTFOLIO_VALUE_CHUNK_SIZE) -> int: 
     # the date previous to the date in real time 
-    previous_date = date.today() - timedelta(days=1)
-    created_portfolio_value_list = []
+    previous_date = get_period_calendar().today - timedelta(days=1)
 
-    for user in User.objects.all(): 
-        # compute the total value of the user's portfolio 
-        user_portfolio = Stock.objects.filter(user=user).annotate(total_value=F("current_close") * F("shares"))
-        total_value = user_portfolio.aggregate(total=Sum("total_value", default=0))["total_value"]
+    # the total value of the portfolio of each user, 0 if the user has no stock 
+    user_total_values = User.objects.order_by("pk").annotate(total_value=Sum(
+        F("holding__security__current_close") * F("holding__shares"), default=0, 
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )).values_list("pk", "total_value")
 
+    num_created = 0 
+    created_portfolio_value_list = []
+    for user_id, total_value in user_total_values.iterator(chunk_size=chunk_size): 
         created_portfolio_value_list.append(PortfolioValue(
-            user=user, date=previous_date, given_date_value=total_value
+            user_id=user_id, date=previous_date, given_date_value=total_value
         ))
-    PortfolioValue.objects.bulk_create(created_portfolio_value_list)
+        if len(created_portfolio_value_list) >= chunk_size: 
+            num_created += upsert_portfolio_values(created_portfolio_value_list)
+            created_portfolio_value_list = []
+
+    if created_portfolio_value_list: 
+        num_created += upsert_portfolio_values(created_portfolio_value_list)
+    return num_created
+
+
+# create the portfolio values, or update the values of the ones of the same user and date
+def upsert_portfolio_values(portfolio_value_list) -> int: 
+    PortfolioValue.objects.bulk_create(
+        portfolio_value_list, update_conflicts=True, 
+        unique_fields=["user", "date"], update_fields=["given_date_value"]
+    )
+    return len(portfolio_value_list)
 
 
 # delete the list of date prices and portfolio prices that were beyond first day of last month
 @shared_task(bind=True, max_retries=1, default_retry_delay=60)
 def delete_price(self) -> None: 
     try:
-        # compute the first date of last month
-        current_month, current_year = date.today().month, date.today().year
-        prev_month, prev_year = current_month - 1, current_year
-        if prev_month < 0: 
-            prev_month, prev_year = 12, prev_year - 1
-        first_date_last_month = date(year=prev_year, month=prev_month, day=1)
-
-        # query the list of price instance and delete 
-        DateStockPrice.objects.filter(date__lt=first_date_last_month).delete()
-        PortfolioValue.objects.filter(date__lt=first_date_last_month).delete()
+        # the first date of last month
+        first_date_last_month = get_first_and_last_dates()[0]
+
+        # drop the months of the prices before it, and delete the rest of them in batches 
+        for job_name, price_model in [("date_stock_price", DateStockPrice), ("portfolio_value", PortfolioValue)]: 
+            print(format_retention_report(expire_rows_before(price_model, first_date_last_month, job_name)))
     except Exception as exc: 
         raise self.retry(exc=exc)
         
 
-# delete the list of transactions that 
+# delete the list of transactions that are 5 months old, along with their rollup 
 @shared_task(bind=True, max_retries=1, default_retry_delay=60)
 def delete_transactions(self) -> None: 
     try:
         # compute the first date of 5 months ago 
-        first_date_this_month = date(year=date.today().year, month=date.today().month, day=1)
+        first_date_this_month = get_period_calendar().current_dates("month")[0]
         filter_date = first_date_this_month - timedelta(weeks=18)
 
-        # query the list of transactions that are 5months old and delete
-        old_transaction_list = Transaction.objects.filter(occur_date__lt=filter_date)
-        old_transaction_list.delete()
+        """
+            archive the transactions that are 5 months old before they're deleted, 
+            and move the horizon of the archive, so the analytics read them from the archive from now on 
+        """
+        archive_report = archive_transactions_before(filter_date)
+        print(f"{archive_report['archived']} transactions archived to {archive_report['files']} files")
+        set_archive_horizon(filter_date)
+
+        # drop the months of the transactions that are 5 months old, and delete the rest of them in batches 
+        print(format_retention_report(expire_rows_before(Transaction, filter_date, "transaction")))
+
+        # the filter date is midnight in TIME_ZONE, so the rollup of those whole dates goes with them 
+        old_rollup_list = DailyCategorySpend.objects.filter(local_date__lt=filter_date)
+        affected_user_ids = set(old_rollup_list.values_list("user_id", flat=True).distinct())
+        print(format_retention_report(delete_in_batches(old_rollup_list, "daily_category_spend")))
+
+        # the cached analytics of the affected users are out of date
+        for user_id in affected_user_ids: 
+            bump_data_version(user_id)
     except Exception as exc: 
-        self.retry(exc=exc)
+        raise self.retry(exc=exc)
+
+
+# create the monthly partitions of the partitioned tables ahead of time (every week), does nothing on SQLite 
+@shared_task(bind=True, max_retries=1, default_retry_delay=60)
+def create_month_partitions(self, months_ahead: int=3) -> None: 
+    try: 
+        for partitioned_model in partitioned_models(): 
+            created_partitions = create_partitions(partitioned_model, months_ahead)
+            print(f"{len(created_partitions)} partitions of {partitioned_model._meta.label} created")
+    except Exception as exc: 
+        raise self.retry(exc=exc)
+
+
+# the number of overdue bills moved to the messages by each database transaction of the sweep
+OVERDUE_BILL_CHUNK_SIZE = 5000
+
+
+"""
+    move the bills that were due before the given date to the overdue messages, one chunk at a time
+    each chunk is one SELECT, one INSERT, and one DELETE in its own short database transaction, 
+    so the bills are locked only for the duration of the chunk 
+    the bills locked by the concurrent payment (BillsDetail) are skipped, so they're never both paid and moved 
+    return the number of overdue bills moved 
+"""
+def sweep_overdue_bills(today: date, chunk_size: int=OVERDUE_BILL_CHUNK_SIZE) -> int: 
+    num_swept = 0
+    while True: 
+        with transaction.atomic(): 
+            overdue_bill_rows = list(Bill.objects.select_for_update(skip_locked=True).filter(
+                due_date__lt=today).order_by("pk").values(
+                "pk", "user_id", "description", "amount", "due_date")[:chunk_size])
+            if not overdue_bill_rows: 
+                return num_swept
+
+            # add the overdue message corresponding to the bills
+            OverdueBillMessage.objects.bulk_create([
+                OverdueBillMessage(
+                    user_id=row["user_id"], bill_description=row["description"], 
+                    bill_amount=row["amount"], bill_due_date=row["due_date"], appear_date=today
+                ) for row in overdue_bill_rows
+            ])
+
+            """
+                delete the bills with one DELETE, skipping the per-row post_delete signals,
+                so the cached analytics are invalidated once per user instead of once per bill
+            """
+            delete_rows_by_pk(Bill, [row["pk"] for row in overdue_bill_rows])
+            for user_id in {row["user_id"] for row in overdue_bill_rows}: 
+                bump_data_version(user_id)
+        num_swept += len(overdue_bill_rows)
 
 
 # delete overdue bills, and add the messages to the list 
 @shared_task(bind=True, max_retries=1, default_retry_delay=60)
-@transaction.atomic
 def delete_overdue_bills_and_messages(self) -> None: 
     try:
-        for user in User.objects.all(): 
-            # query the given user's list of overdue bills 
-            overdue_bill_list = user.bills_set.filter(due_date__lt=date.today())
-            created_overdue_message_list = []
-
-            # add the overdue message corresponding to the bills
-            for overdue_bill in overdue_bill_list: 
-                created_overdue_message_list.append(OverdueBillMessage(
-                    user=user, bill_description=overdue_bill.description, 
-                    bill_amount=overdue_bill.amount, bill_due_date=overdue_bill.due_date, 
-                     appear_date=date.today()
-                ))
-            OverdueBillMessage.objects.bulk_create(created_overdue_message_list)
-            # delete the queryset 
-            overdue_bill_list.delete()
+        today = get_period_calendar().today
+        num_swept = sweep_overdue_bills(today)
+        print(f"{num_swept} overdue bills moved to the messages")
         
         """
             automatically delete the overdue bills message that are one day old
             query the list of 1-day-old overdue messages and delete them 
         """
-        overdue_message_list = OverdueBillMessage.objects.filter(appear_date__lt=date.today())
+        overdue_message_list = OverdueBillMessage.objects.filter(appear_date__lt=today)
         overdue_message_list.delete()
     except Exception as exc: 
-        self.retry(exc=exc)
+        raise self.retry(exc=exc)
@@ -1,18 +1,40 @@
 
 from .models import (
     category_dict,
-    User, Account, Transaction, DateStockPrice, Stock, PortfolioValue
+    User, Account, Transaction, DateStockPrice, Holding, PortfolioValue, Security, RetentionCheckpoint, StockJob, 
+    OverdueBillMessage
 )
 from .finance import (
     category_expense_dict, expense_composition_percentage, expense_change_percentage, 
-    get_first_and_last_dates
+    get_first_and_last_dates, apply_transactions_to_rollup, BalanceLedger, balance_delta, 
+    import_transactions, parse_csv_rows, parse_ofx_rows, ofx_to_csv_row, set_archive_horizon, 
+    delete_in_batches, expire_rows_before, daily_expense, interval_total_expense, get_budget_response_data, 
+    price_records
 )
+from .finance.market_data import (
+    FixtureProvider, CachingProvider, CachedFrame, get_market_data_provider, load_market_data_provider
+)
+from .tasks import update_securities_and_prices
+from .management.commands.benchmark_finance_backends import Command as FinanceBackendsBenchmark
+from .management.commands.benchmark_list_serializers import Command as ListSerializersBenchmark
+from .management.commands.benchmark_price_extraction import Command as PriceExtractionBenchmark
+from .management.commands.benchmark_series_payload import Command as SeriesPayloadBenchmark
+from .serializers import AccountSerializer, OverdueBillMessageSerializer, StockSerializer
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from rest_framework.test import APIClient
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from decimal import Decimal
+from threading import Thread
 from django.db.models import F, Sum
 from datetime import date, timedelta, datetime
 import random
 import json
+import tempfile
+import pandas as pd
+import time
 
 """THE FUNCTIONS TO UPLOAD TEST RECORDS TO THE DATABASE TO TEST FINANCE LOGICS"""
 
@@ -41,6 +63,7 @@ def upload_category_transactions(num_transaction_each: int=3):
             ))
 
     created_transactions = Transaction.objects.bulk_create(transactions_to_create)
+    apply_transactions_to_rollup(created_transactions)
     print(f"{len(created_transactions)} transactions were created.")
 
     # compute category expense this month and previous month using utils 
@@ -95,26 +118,29 @@ def upload_interval_transactions(num_transactions_each: int=2):
         current_date += timedelta(days=1)
 
     created_transactions = Transaction.objects.bulk_create(transactions_to_create)
+    apply_transactions_to_rollup(created_transactions)
     print(f"{len(created_transactions)} transactions were created.")
 
 
 @transaction.atomic
 def delete_test_transactions(): 
-    Transaction.objects.filter(description__contains="Test").delete()
+    test_transactions = Transaction.objects.filter(description__contains="Test")
+    apply_transactions_to_rollup(test_transactions, sign=-1)
+    test_transactions.delete()
     print("Test Transaction deleted successfully")
 
 
 @transaction.atomic
 def upload_test_portfolio_values(): 
     user = User.objects.get(username="mikeusername")
-    stocks = [stock for stock in Stock.objects.filter(user=user)]
+    holdings = Holding.objects.filter(user=user)
     created_portfolio_values = []
 
     first_date, last_date = get_first_and_last_dates()
     current_date = first_date 
     while current_date <= last_date: 
-        date_prices = DateStockPrice.objects.filter(date=current_date, stock__in=stocks)
-        date_prices = date_prices.annotate(total_value=F("given_date_close") * F("stock__shares"))
+        date_prices = DateStockPrice.objects.filter(date=current_date, security__holding__in=holdings)
+        date_prices = date_prices.annotate(total_value=F("given_date_close") * F("security__holding__shares"))
         total_value = date_prices.aggregate(total=Sum("total_value", default=0))["total"]
 
         if total_value != 0: 
@@ -124,3 +150,475 @@ def upload_test_portfolio_values():
         current_date += timedelta(days=1)
     num_values = PortfolioValue.objects.bulk_create(created_portfolio_values)
     print(f"{len(num_values)} created!")
+
+
+"""THE TESTS OF THE FINANCE LOGICS THAT NEED THE REAL DATABASE TRANSACTIONS"""
+
+
+"""
+    fire the parallel writers at the balance of one account through the ledger,
+    each writer applies its deltas in its own database transaction, so no update should be lost 
+"""
+class ConcurrentBalanceWritersTest(TransactionTestCase): 
+    num_writers = 8
+    num_deltas_each = 25
+
+    def test_no_update_is_lost(self): 
+        user = User.objects.create(username="ledgertestusername")
+        account = Account.objects.create(
+            user=user, account_number=9999, name="Ledger Test", institution="Test", account_type="Credit")
+
+        errors = []
+        def write_deltas(writer_index): 
+            try: 
+                for i in range(self.num_deltas_each): 
+                    with transaction.atomic(), BalanceLedger() as ledger: 
+                        ledger.add(account.pk, Decimal(writer_index + 1) + Decimal("0.01") * i)
+            except Exception as error: 
+                errors.append(error)
+            finally: 
+                # each thread has its own connection 
+                connection.close()
+
+        writers = [Thread(target=write_deltas, args=(writer_index,)) for writer_index in range(self.num_writers)]
+        for writer in writers: 
+            writer.start()
+        for writer in writers: 
+            writer.join()
+
+        expected_balance = sum(
+            Decimal(writer_index + 1) + Decimal("0.01") * i 
+            for writer_index in range(self.num_writers) for i in range(self.num_deltas_each)
+        )
+        account.refresh_from_db()
+        self.assertEqual(errors, [])
+        self.assertEqual(account.balance, expected_balance)
+
+
+# the signed deltas of the balances, and the ledger applying them in batches 
+class BalanceLedgerTest(TestCase): 
+    def setUp(self): 
+        self.user = User.objects.create(username="ledgerbatchusername")
+
+    # the debit account loses the expense and gains the income, the credit account the other way around 
+    def test_balance_delta_signs(self): 
+        amount = Decimal("12.50")
+        self.assertEqual(balance_delta("Debit", "Income", amount), amount)
+        self.assertEqual(balance_delta("Debit", "Grocery", amount), -amount)
+        self.assertEqual(balance_delta("Credit", "Income", amount), -amount)
+        self.assertEqual(balance_delta("Credit", "Grocery", amount), amount)
+
+    # the deltas of each account are added up, and the accounts are updated in batches of the batch size 
+    def test_batched_flush(self): 
+        accounts = [
+            Account.objects.create(
+                user=self.user, account_number=i, name=f"Ledger {i}", institution="Test", 
+                account_type="Debit" if i % 2 == 0 else "Credit", balance=100)
+            for i in range(5)
+        ]
+        ledger = BalanceLedger(batch_size=2)
+        for account in accounts: 
+            ledger.add_transaction(Transaction(account=account, category="Grocery", amount=Decimal("10.00")))
+            ledger.add_transaction(Transaction(account=account, category="Income", amount=Decimal("2.50")))
+        # the reversed transaction cancels its own delta 
+        ledger.add_transaction(Transaction(account=accounts[0], category="Grocery", amount=Decimal("1.00")))
+        ledger.add_transaction(Transaction(account=accounts[0], category="Grocery", amount=Decimal("1.00")), sign=-1)
+
+        # 3 UPDATEs of at most 2 accounts each 
+        with self.assertNumQueries(3): 
+            self.assertEqual(ledger.flush(), 5)
+        balances = [Account.objects.get(pk=account.pk).balance for account in accounts]
+        self.assertEqual(balances, [Decimal("92.50"), Decimal("107.50"), Decimal("92.50"), Decimal("107.50"), Decimal("92.50")])
+
+        # nothing is left to flush 
+        with self.assertNumQueries(0): 
+            self.assertEqual(ledger.flush(), 0)
+
+
+# import the rows of the bank exports, the invalid rows are reported and skipped, and the valid ones imported
+class ImportTransactionsTest(TestCase): 
+    def setUp(self): 
+        # each test has its own (empty) archive 
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        self.enterContext(self.settings(TRANSACTION_ARCHIVE_DIR=archive_dir.name))
+
+        self.user = User.objects.create(username="importtestusername")
+        self.account = Account.objects.create(
+            user=self.user, account_number=1000, name="Import Test", institution="Test", account_type="Debit", balance=100)
+
+    # the csv rows with the valid rows and the rows with the invalid amount, date, category, and account 
+    def test_csv_rows(self): 
+        lines = [
+            "Date,Description,Amount,Category,Account", 
+            f"10/01/2026,Paycheck,1000.00,Income,{self.account.pk}", 
+            "2026-10-02T12:30:00,Groceries,-25.50,,", 
+            "10/03/2026,Too large,123456789012345.00,,", 
+            "10/03/2026,Huge exponent,1e400,,", 
+            "10/03/2026,Not a number,abc,,", 
+            "13/45/2026,Bad date,-5,,", 
+            "10/04/2026,Bad category,-5,Nope,", 
+            "10/04/2026,Bad account,-5,,999999", 
+        ]
+        import_summary = import_transactions(self.user, parse_csv_rows(lines), self.account.pk)
+
+        self.assertEqual(import_summary["imported"], 2)
+        self.assertEqual(import_summary["skipped"], 6)
+        self.assertEqual([error["row"] for error in import_summary["errors"]], [3, 4, 5, 6, 7, 8])
+        self.assertIn("too large", import_summary["errors"][0]["error"])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list("category", "amount")), 
+            [("Income", Decimal("1000.00")), ("Others", Decimal("25.50"))]
+        )
+
+        # the income adds to the debit account, and the expense is taken from it 
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("1074.50"))
+
+    # the ofx rows (of the SGML OFX 1.x) with the valid row and the invalid amounts and date 
+    def test_ofx_rows(self): 
+        lines = [
+            "<OFX><BANKTRANLIST>", 
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261005120000<TRNAMT>-12.34<NAME>Coffee", 
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261006<TRNAMT>-123456789012345.00<NAME>Too large", 
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261006<TRNAMT>1e400<NAME>Huge exponent", 
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>bad<TRNAMT>-5<NAME>Bad date", 
+            "</BANKTRANLIST></OFX>", 
+        ]
+        raw_rows = (ofx_to_csv_row(raw_row) for raw_row in parse_ofx_rows(lines))
+        import_summary = import_transactions(self.user, raw_rows, self.account.pk)
+
+        self.assertEqual((import_summary["imported"], import_summary["skipped"]), (1, 3))
+        self.assertEqual([error["row"] for error in import_summary["errors"]], [2, 3, 4])
+        self.assertEqual(
+            list(Transaction.objects.filter(user=self.user).values_list("description", "amount")), 
+            [("Coffee", Decimal("12.34"))]
+        )
+
+    # the rows before the horizon of the archive are rejected, since their dates are already archived 
+    def test_rows_before_archive_horizon(self): 
+        set_archive_horizon(date(2026, 10, 1))
+        lines = ["Date,Description,Amount", "09/30/2026,Archived,-5", "10/01/2026,Kept,-5"]
+        import_summary = import_transactions(self.user, parse_csv_rows(lines), self.account.pk)
+
+        self.assertEqual((import_summary["imported"], import_summary["skipped"]), (1, 1))
+        self.assertIn("archived", import_summary["errors"][0]["error"])
+
+
+# the fixture provider counting the symbols it downloads 
+class CountingFixtureProvider(FixtureProvider): 
+    def __init__(self, fixture_dir=None, frames=None): 
+        super().__init__(fixture_dir, frames)
+        self.downloaded_symbols = []
+
+    def download(self, symbols, first_date, last_date): 
+        self.downloaded_symbols.extend(symbols)
+        return super().download(symbols, first_date, last_date)
+
+
+# the frame of the fixture with one row per date 
+def fixture_frame(closes: dict) -> pd.DataFrame: 
+    return pd.DataFrame({
+        "Open": [close - 1 for close in closes.values()], "High": [close + 1 for close in closes.values()], 
+        "Low": [close - 2 for close in closes.values()], "Close": list(closes.values()), 
+        "Adj Close": list(closes.values()), "Volume": [1000] * len(closes), 
+    }, index=pd.DatetimeIndex([pd.Timestamp(price_date) for price_date in closes], name="Date"))
+
+
+# the daily update of the securities held by the users, against the fixtures instead of the network 
+class UpdateSecuritiesTest(TestCase): 
+    def setUp(self): 
+        self.enterContext(self.settings(
+            MARKET_DATA_PROVIDER="expenseapp.tests.CountingFixtureProvider", MARKET_DATA_CHUNK_SIZE=2))
+        # the provider is created once per dotted path 
+        load_market_data_provider.cache_clear()
+        self.addCleanup(load_market_data_provider.cache_clear)
+        self.provider = get_market_data_provider()
+
+    # the committed fixture is read in the format exported by pandas, within the range of dates 
+    def test_fixture_csv(self): 
+        provider = FixtureProvider(fixture_dir=settings.MARKET_DATA_FIXTURE_DIR)
+        symbol_frames = provider.download(["AAPL", "NOFIXTURE"], date(2026, 10, 6), date(2026, 10, 8))
+
+        self.assertEqual(list(symbol_frames), ["AAPL"])
+        self.assertEqual(list(symbol_frames["AAPL"].index.date), [date(2026, 10, 6), date(2026, 10, 7)])
+        self.assertEqual(list(symbol_frames["AAPL"]["Close"]), [230.12, 229.06])
+
+    # each distinct symbol is downloaded once, its shared security updated, and its price of the day upserted 
+    def test_distinct_symbols(self): 
+        yesterday = date.today() - timedelta(days=1)
+        self.provider.frames = {
+            "AAPL": fixture_frame({yesterday - timedelta(days=1): 100.0, yesterday: 101.5}), 
+            "MSFT": fixture_frame({yesterday: 402.25}), 
+        }
+        securities = {
+            symbol: Security.objects.create(
+                corporation=symbol, name=symbol, symbol=symbol, current_close=99, last_updated_date=yesterday - timedelta(days=1))
+            for symbol in ["AAPL", "MSFT", "GONE"]
+        }
+        for i in range(3): 
+            user = User.objects.create(username=f"securitytestusername{i}")
+            Holding.objects.create(user=user, security=securities["AAPL"], shares=1)
+            Holding.objects.create(user=user, security=securities["MSFT" if i else "GONE"], shares=1)
+        # the price of the day already stored is corrected instead of duplicated 
+        DateStockPrice.objects.create(security=securities["AAPL"], date=yesterday, given_date_close=1)
+
+        self.assertEqual(update_securities_and_prices(), (3, 2, 2))
+        self.assertEqual(sorted(self.provider.downloaded_symbols), ["AAPL", "GONE", "MSFT"])
+
+        aapl = Security.objects.get(symbol="AAPL")
+        self.assertEqual(
+            (aapl.previous_close, aapl.current_close, aapl.last_updated_date), (Decimal("99.00"), Decimal("101.50"), yesterday))
+        self.assertEqual(Security.objects.get(symbol="GONE").last_updated_date, yesterday - timedelta(days=1))
+        self.assertEqual(
+            sorted(DateStockPrice.objects.values_list("security__symbol", "date", "given_date_close")), 
+            [("AAPL", yesterday, Decimal("101.50")), ("MSFT", yesterday, Decimal("402.25"))]
+        )
+
+
+# the cache of the market data, in front of the counting fixture provider and in its own directory 
+class CachingProviderTest(SimpleTestCase): 
+    def setUp(self): 
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        self.fixtures = CountingFixtureProvider(frames={
+            symbol: fixture_frame({date(2026, 10, day): 100.0 + day for day in range(5, 10)}) 
+            for symbol in ["AAPL", "MSFT", "NVDA"]
+        })
+
+    def caching_provider(self, **kwargs) -> CachingProvider: 
+        return CachingProvider(self.fixtures, cache_dir=self.cache_dir, ttl=kwargs.pop("ttl", 60), **kwargs)
+
+    # the fresh frame is served from the cache, the expired one is downloaded again 
+    def test_ttl(self): 
+        provider = self.caching_provider()
+        for _ in range(2): 
+            provider.download(["AAPL"], date(2026, 10, 5), date(2026, 10, 10))
+        self.assertEqual(self.fixtures.downloaded_symbols, ["AAPL"])
+
+        provider.memory_cache["AAPL"].downloaded_at = time.time() - 61
+        provider.download(["AAPL"], date(2026, 10, 5), date(2026, 10, 10))
+        self.assertEqual(self.fixtures.downloaded_symbols, ["AAPL", "AAPL"])
+
+    # the range inside the cached range is cut from the cache, the range beyond it is downloaded again 
+    def test_covered_range(self): 
+        provider = self.caching_provider()
+        provider.download(["AAPL"], date(2026, 10, 6), date(2026, 10, 9))
+
+        symbol_frames = provider.download(["AAPL"], date(2026, 10, 7), date(2026, 10, 9))
+        self.assertEqual(list(symbol_frames["AAPL"].index.date), [date(2026, 10, 7), date(2026, 10, 8)])
+        self.assertEqual(self.fixtures.downloaded_symbols, ["AAPL"])
+
+        symbol_frames = provider.download(["AAPL"], date(2026, 10, 5), date(2026, 10, 9))
+        self.assertEqual(symbol_frames["AAPL"].index[0].date(), date(2026, 10, 5))
+        self.assertEqual(self.fixtures.downloaded_symbols, ["AAPL", "AAPL"])
+
+        # the symbol without any data is cached too 
+        for _ in range(2): 
+            self.assertEqual(provider.download(["NOFIXTURE"], date(2026, 10, 5), date(2026, 10, 9)), {})
+        self.assertEqual(self.fixtures.downloaded_symbols.count("NOFIXTURE"), 1)
+
+    # the least recently used frame is evicted from the memory, and read back from the disk 
+    def test_memory_eviction(self): 
+        frame_bytes = CachedFrame(date(2026, 10, 5), date(2026, 10, 10), 0, self.fixtures.frames["AAPL"]).num_bytes
+        provider = self.caching_provider(max_memory_bytes=2 * frame_bytes)
+        for symbols in [["AAPL", "MSFT"], ["AAPL"], ["NVDA"]]: 
+            provider.download(symbols, date(2026, 10, 5), date(2026, 10, 10))
+        self.assertEqual(list(provider.memory_cache), ["AAPL", "NVDA"])
+        self.assertEqual(provider.memory_bytes, 2 * frame_bytes)
+
+        provider.download(["MSFT"], date(2026, 10, 5), date(2026, 10, 10))
+        self.assertEqual(list(provider.memory_cache), ["NVDA", "MSFT"])
+        self.assertEqual(self.fixtures.downloaded_symbols, ["AAPL", "MSFT", "NVDA"])
+
+    # the frame written to the .npz file is read back the same, along with its range and the time it was downloaded 
+    def test_npz_round_trip(self): 
+        frame = self.fixtures.frames["AAPL"].copy()
+        frame.index = frame.index.tz_localize("America/New_York")
+        for cached in [
+            CachedFrame(date(2026, 10, 5), date(2026, 10, 10), 1234.5, frame), 
+            CachedFrame(date(2026, 10, 5), date(2026, 10, 10), 1234.5, self.fixtures.frames["AAPL"]), 
+        ]: 
+            cache_path = f"{self.cache_dir}/round_trip.npz"
+            cached.save(cache_path)
+            loaded = CachedFrame.load(cache_path)
+            self.assertEqual(
+                (loaded.first_date, loaded.last_date, loaded.downloaded_at), (date(2026, 10, 5), date(2026, 10, 10), 1234.5))
+            pd.testing.assert_frame_equal(loaded.frame, cached.frame)
+
+        # another provider sharing the directory reads the cached frames instead of downloading them 
+        self.caching_provider().download(["AAPL", "NOFIXTURE"], date(2026, 10, 5), date(2026, 10, 10))
+        symbol_frames = self.caching_provider().download(["AAPL", "NOFIXTURE"], date(2026, 10, 5), date(2026, 10, 10))
+        self.assertEqual(self.fixtures.downloaded_symbols, ["AAPL", "NOFIXTURE"])
+        pd.testing.assert_frame_equal(symbol_frames["AAPL"], self.fixtures.frames["AAPL"])
+        self.assertNotIn("NOFIXTURE", symbol_frames)
+
+
+# the expired rows deleted in batches, resuming from the checkpoint of the job killed in the middle 
+class RetentionTest(TestCase): 
+    def setUp(self): 
+        self.enterContext(self.settings(RETENTION_BATCH_SIZE=3, RETENTION_PAUSE=0))
+        user = User.objects.create(username="retentiontestusername")
+        # 7 values before the cutoff date, and 3 values after it 
+        self.values = [
+            PortfolioValue.objects.create(user=user, date=date(2026, 7, day), given_date_value=day) for day in range(1, 11)
+        ]
+        self.cutoff_date = date(2026, 7, 8)
+
+    def remaining_days(self) -> list: 
+        return list(PortfolioValue.objects.order_by("date").values_list("date__day", flat=True))
+
+    # the expired rows are deleted 3 per batch (the months are only dropped as partitions on PostgreSQL) 
+    def test_expire_rows_before(self): 
+        report = expire_rows_before(PortfolioValue, self.cutoff_date, "expire-test")
+
+        self.assertEqual((report["deleted"], report["batches"], report["dropped_partitions"]), (7, 3, 0))
+        self.assertEqual(self.remaining_days(), [8, 9, 10])
+        self.assertFalse(RetentionCheckpoint.objects.filter(job_name="expire-test").exists())
+
+    # the run after the killed one starts after the checkpoint, and clears it at the end 
+    def test_resume_from_checkpoint(self): 
+        RetentionCheckpoint.objects.create(job_name="expire-test", last_pk=self.values[2].pk)
+        expired_values = PortfolioValue.objects.filter(date__lt=self.cutoff_date)
+        report = delete_in_batches(expired_values, "expire-test")
+
+        self.assertEqual((report["deleted"], report["batches"]), (4, 2))
+        self.assertEqual(self.remaining_days(), [1, 2, 3, 8, 9, 10])
+        self.assertFalse(RetentionCheckpoint.objects.filter(job_name="expire-test").exists())
+
+        # the next run starts from the first row again 
+        self.assertEqual(delete_in_batches(expired_values, "expire-test")["deleted"], 3)
+        self.assertEqual(self.remaining_days(), [8, 9, 10])
+
+
+# the stock added while the job of its security has lost its task enqueues the job again 
+class StockJobTest(TestCase): 
+    def setUp(self): 
+        self.security = Security.objects.create(
+            corporation="Apple", name="Apple Inc.", symbol="AAPL", last_updated_date=date.today(), state="pending")
+        owner = User.objects.create(username="stockjobownerusername")
+        Holding.objects.create(user=owner, security=self.security, shares=1)
+        self.job = StockJob.objects.create(user=owner, security=self.security, symbol="AAPL", state="running")
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="stockjobtestusername"))
+
+    # the number of the tasks enqueued by the stock added 
+    def add_stock(self) -> int: 
+        with self.captureOnCommitCallbacks() as callbacks: 
+            response = self.client.post("/expenseapp/stocks", {"symbol": "AAPL", "shares": 2}, format="json")
+        self.assertEqual(response.status_code, 202)
+        return len(callbacks)
+
+    # the job still running has its task, so no other one is enqueued 
+    def test_running_job(self): 
+        self.assertEqual(self.add_stock(), 0)
+
+    # the job running for longer than the timeout (its worker died) is enqueued again 
+    def test_lost_job(self): 
+        StockJob.objects.filter(pk=self.job.pk).update(created_at=timezone.now() - timedelta(seconds=settings.STOCK_JOB_TIMEOUT + 1))
+        self.assertEqual(self.add_stock(), 1)
+
+
+# the vectorized (numpy) finance backend gives the same analytics as the orm one, on the data of its benchmark 
+class FinanceBackendsTest(TestCase): 
+    def test_same_analytics(self): 
+        user, _ = FinanceBackendsBenchmark().seed_user(500)
+        analytics = {
+            "daily_expense": lambda: daily_expense(user), 
+            "expense_composition_percentage": lambda: expense_composition_percentage(user), 
+            "expense_change_percentage (month)": lambda: expense_change_percentage(user, "month"), 
+            "expense_change_percentage (week)": lambda: expense_change_percentage(user, "week"), 
+            "interval_total_expense": lambda: interval_total_expense(user), 
+            "get_budget_response_data": lambda: get_budget_response_data(user, "month"), 
+        }
+        for name, compute in analytics.items(): 
+            with self.subTest(name): 
+                with self.settings(FINANCE_BACKEND="orm"): 
+                    orm_result = compute()
+                with self.settings(FINANCE_BACKEND="numpy"): 
+                    self.assertEqual(compute(), orm_result)
+
+
+# the fast path (values()) of each list serializer renders the same JSON as the serializer, on the data of its benchmark 
+class ListSerializersTest(TestCase): 
+    def test_same_json(self): 
+        benchmark = ListSerializersBenchmark()
+        user, security = benchmark.seed_user(200)
+        Holding.objects.create(user=user, security=security, shares=10)
+        OverdueBillMessage.objects.create(
+            user=user, bill_description="Overdue Bill", bill_amount=10, bill_due_date=date.today(), appear_date=date.today())
+        querysets = {
+            **benchmark.list_querysets(user, security), 
+            AccountSerializer: Account.objects.filter(user=user), 
+            StockSerializer: Holding.objects.filter(user=user), 
+            OverdueBillMessageSerializer: OverdueBillMessage.objects.filter(user=user), 
+        }
+
+        for serializer_class, queryset in querysets.items(): 
+            with self.subTest(serializer_class.__name__): 
+                self.assertEqual(
+                    JSONRenderer().render(serializer_class.fast_list(queryset.all())), 
+                    JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+                )
+
+
+# the vectorized extraction of the prices gives the same records as the day-by-day loop it replaced 
+class PriceExtractionTest(SimpleTestCase): 
+    def test_same_prices(self): 
+        benchmark = PriceExtractionBenchmark()
+        last_date = date(2026, 10, 18)
+        frame = benchmark.make_frame(last_date - timedelta(days=3 * 365), last_date)
+        date_ranges = {
+            "whole frame": (last_date - timedelta(days=3 * 365), last_date), 
+            "part of the frame": (date(2025, 2, 15), date(2025, 9, 1)), 
+            "beyond the frame": (last_date - timedelta(days=5 * 365), last_date + timedelta(days=30)), 
+        }
+        for name, (first_date, last_date) in date_ranges.items(): 
+            with self.subTest(name): 
+                self.assertEqual(
+                    price_records(frame, first_date, last_date), benchmark.legacy_records(frame, first_date, last_date))
+
+
+# the series of the columnar data, as the dictionary mapping each date to the value 
+def decode_columnar(columnar_data: dict) -> dict: 
+    series = {}
+    if columnar_data["start"] is None: 
+        return series
+    this_date = datetime.strptime(columnar_data["start"], "%m/%d/%Y").date()
+    for delta, value in zip(columnar_data["dates"], columnar_data["values"]): 
+        this_date += timedelta(days=delta)
+        series[this_date.strftime("%m/%d/%Y")] = Decimal(str(value))
+    return series
+
+
+# the columnar format of the time series endpoints gives the same series as the default one, on the data of its benchmark 
+class SeriesPayloadTest(TestCase): 
+    def setUp(self): 
+        user, _ = SeriesPayloadBenchmark().seed_user(90)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    # the series of the endpoint in the format, as the dictionary mapping each date to the value 
+    def get_series(self, path: str) -> dict: 
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.content)
+        return response_data.get("price_list", response_data)
+
+    def test_same_series(self): 
+        since_date = date.today() - timedelta(days=8)
+        since = since_date.strftime("%m/%d/%Y")
+        for source in ["materialized", "computed"]: 
+            for path in ["/expenseapp/stocks/BNCHS", "/expenseapp/portfolio_value"]: 
+                with self.subTest(f"{path} ({source})"), self.settings(PORTFOLIO_VALUE_SOURCE=source): 
+                    default_series = {series_date: Decimal(value) for series_date, value in self.get_series(path).items()}
+                    self.assertTrue(default_series)
+                    self.assertEqual(decode_columnar(self.get_series(f"{path}?format=columnar")), default_series)
+
+                    # only the dates after the since date 
+                    self.assertEqual(decode_columnar(self.get_series(f"{path}?format=columnar&since={since}")), {
+                        series_date: value for series_date, value in default_series.items() 
+                        if datetime.strptime(series_date, "%m/%d/%Y").date() > since_date
+                    })
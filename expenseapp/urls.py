@@ -15,6 +15,7 @@ urlpatterns = [
     # user's financial summary
     path("summary", views.user_summary_detail, name="user_summary"),
     path("full_summary", views.user_full_summary_detail, name="user_full_summary"),
+    path("expense_history", views.user_expense_history, name="user_expense_history"),
 
     # account list, detail, and financial summary
     path("accounts", views.AccountList.as_view(), name="account_list"),
@@ -23,6 +24,7 @@ urlpatterns = [
 
     # transaction list
     path("transactions", views.UserTransactionList.as_view(), name="user_transactions"),
+    path("transactions/import", views.TransactionImport.as_view(), name="import_transactions"),
 
     path("transactions/interval", views.IntervalTransactionList.as_view(), name="interval_transactions"),
     path("transactions/category/<str:arg_cat>", views.CategoryTransactionList.as_view(), name="category_transactionss"),
@@ -42,6 +44,7 @@ urlpatterns = [
 
     # stock list, and details
     path("stocks", views.StockList.as_view(), name="stock_list"), 
+    path("stocks/jobs/<uuid:job_id>", views.StockJobDetail.as_view(), name="stock_job_detail"),
     path("stocks/<str:symbol>", views.StockPriceDetail.as_view(), name="stock_price_detail"),
     path("portfolio_value", views.PortfolioValueList.as_view(), name="porfolio_value_list")
 ]
\ No newline at end of file
@@ -6,7 +6,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from expenseapp.models import Account, Transaction
 from expenseapp.serializers import AccountSerializer
-from expenseapp.finance import expense_change_percentage, expense_composition_percentage
+from expenseapp.finance import (
+    expense_change_percentage, expense_composition_percentage, apply_transactions_to_rollup, cached_analytics
+)
 import datetime
 
 # handling the list of accounts of the user 
@@ -17,7 +19,7 @@ class AccountList(APIView):
     def get_response_data(self, request):
         # query and serialize the account list 
         account_list = Account.objects.filter(user=request.user)
-        response_data = AccountSerializer(account_list, many=True).data
+        response_data = AccountSerializer.fast_list(account_list)
         return response_data
 
     # GET method, return the list of accounts of the user
@@ -63,11 +65,12 @@ class AccountDetail(generics.RetrieveUpdateDestroyAPIView):
             else: 
                 description = f"Account's balance decreases ${abs(balance_change)}"
                 category = "Income" if updated_account.account_type == "Credit" else "Others"
-            # create transaction
-            Transaction.objects.create(
+            # create transaction, and add it to the daily rollup
+            new_transaction = Transaction.objects.create(
                 user=updated_account.user, account=updated_account, description=description, 
                 amount=abs(balance_change), occur_date=datetime.datetime.now(), category=category
             )
+            apply_transactions_to_rollup([new_transaction])
 
         
 # handling the info of the financial summary of the specific account
@@ -80,13 +83,18 @@ class AccountSummary(APIView):
         except Account.DoesNotExist: 
             raise Http404("Account with the given pk not found.")
         
-        # calculate the change & composition percentage of the account 
-        change_percentage = expense_change_percentage(queried_account)
-        composition_percentage = expense_composition_percentage(queried_account)
+        def get_response_data(): 
+            # calculate the change & composition percentage of the account 
+            change_percentage = expense_change_percentage(queried_account)
+            composition_percentage = expense_composition_percentage(queried_account)
 
-        # the response data 
-        response_data = {
-            "change_percentage": change_percentage, 
-            "composition_percentage": composition_percentage, 
-        }
+            # the response data 
+            return {
+                "change_percentage": change_percentage, 
+                "composition_percentage": composition_percentage, 
+            }
+        
+        # only recompute if the user's data or the date has changed 
+        response_data = cached_analytics(
+            "account_summary", queried_account.user_id, get_response_data, scope=queried_account.pk)
         return Response(response_data)
\ No newline at end of file
@@ -5,8 +5,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from expenseapp.models import BudgetPlan, OverdueBillMessage, Transaction, Bill
 from expenseapp.serializers import BudgetPlanSerializer, BillSerializer, OverdueBillMessageSerializer
-from expenseapp.finance import get_budget_response_data, adjust_account_balance
-from datetime import date, datetime
+from expenseapp.finance import (
+    get_budget_response_data, apply_transactions_to_balances, apply_transactions_to_rollup, cached_analytics, 
+    get_period_calendar
+)
+from django.db import transaction
+from datetime import datetime
 
 # handling the budget plan of the user 
 class UserBudget(APIView): 
@@ -19,9 +23,9 @@ class UserBudget(APIView):
             response_data[time_type] = get_budget_response_data(request.user, time_type)
         return response_data
     
-    # GET method 
+    # GET method, only recompute if the user's data or the date has changed 
     def get(self, request, format=None): 
-        response_data = self.get_response_data(request)
+        response_data = cached_analytics("budget", request.user.pk, lambda: self.get_response_data(request))
         return Response(response_data)
     
     # POST method 
@@ -88,7 +92,7 @@ class BillList(APIView):
     # get the response data 
     def get_response_data(self, request):
         bills_list = Bill.objects.filter(user=request.user)
-        response_data = BillSerializer(bills_list, many=True).data
+        response_data = BillSerializer.fast_list(bills_list)
         return response_data 
     
     # GET method, return list of bills for the user 
@@ -123,9 +127,15 @@ class BillsDetail(generics.RetrieveUpdateDestroyAPIView):
             raise Http404("Bill with the given pk not found.")
 
     # overriding the destroying behavior 
+    @transaction.atomic
     def perform_destroy(self, instance):
+        # lock the bill, so it's neither paid twice nor paid and moved to the overdue messages by the sweep at once
+        instance = Bill.objects.select_for_update().filter(pk=instance.pk).first()
+        if instance is None: 
+            return 
+
         # if there is pay account and the bills isn't overdue yet
-        if instance.pay_account != None and instance.due_date >= date.today():
+        if instance.pay_account != None and instance.due_date >= get_period_calendar().today:
     
             # create transactions indicating that user's paid the bills 
             new_transaction = Transaction.objects.create(
@@ -133,8 +143,9 @@ class BillsDetail(generics.RetrieveUpdateDestroyAPIView):
                 description=f"Payment: {instance.description}", category=instance.category,
                 amount=instance.amount, occur_date=datetime.now()
             )
-            # adjust the account 
-            adjust_account_balance(new_transaction.account, new_transaction)
+            # adjust the account (with one UPDATE), and the daily rollup 
+            apply_transactions_to_balances([new_transaction])
+            apply_transactions_to_rollup([new_transaction])
 
         # destroy the bills 
         instance.delete()
@@ -145,6 +156,6 @@ class OverdueMessageList(APIView):
 
     def get(self, request, format=None): 
         overdue_message_list = OverdueBillMessage.objects.filter(user=request.user)
-        response_data = OverdueBillMessageSerializer(overdue_message_list, many=True).data
+        response_data = OverdueBillMessageSerializer.fast_list(overdue_message_list)
         return Response(response_data)
     
\ No newline at end of file
@@ -2,6 +2,7 @@ from rest_framework import generics
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.validators import ValidationError
 from expenseapp.models import User, Transaction, PortfolioValue
 from django.db import transaction
 from expenseapp.serializers import RegisterSerializer, TransactionSerializer
@@ -15,6 +16,9 @@ class Register(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         created_user = serializer.save()
+        # the portfolio values are computed from the holdings, so there is nothing to create 
+        if not portfolio_values_materialized(): 
+            return created_user
 
         # create the list of initial portfolio value of the user 
         first_date, last_date = get_first_and_last_dates()
@@ -41,21 +45,26 @@ def user_summary_detail(request):
     # get method only 
     if request.method == "GET": 
         queried_user = request.user
-        # first and last dates of month
-        first_date, last_date = get_current_dates("month")
-
-        response_data = {
-            # calculate the financial info of the user 
-            "total_balance": total_balance_and_amount_due(queried_user)[0], 
-            "total_amount_due": total_balance_and_amount_due(queried_user)[1], 
-            "total_income": total_income(queried_user), 
-            "total_expense": category_expense_dict(queried_user, first_date, last_date)["Total"], 
-
-            # calculate the daily expense, the change, and composition percentage of user 
-            "change_percentage": expense_change_percentage(queried_user), 
-            "composition_percentage": expense_composition_percentage(queried_user), 
-            "daily_expense": daily_expense(queried_user), 
-        }
+
+        def get_response_data(): 
+            # first and last dates of month
+            first_date, last_date = get_current_dates("month")
+
+            return {
+                # calculate the financial info of the user 
+                "total_balance": total_balance_and_amount_due(queried_user)[0], 
+                "total_amount_due": total_balance_and_amount_due(queried_user)[1], 
+                "total_income": total_income(queried_user), 
+                "total_expense": category_expense_dict(queried_user, first_date, last_date)["Total"], 
+
+                # calculate the daily expense, the change, and composition percentage of user 
+                "change_percentage": expense_change_percentage(queried_user), 
+                "composition_percentage": expense_composition_percentage(queried_user), 
+                "daily_expense": daily_expense(queried_user), 
+            }
+        
+        # only recompute if the user's data or the date has changed 
+        response_data = cached_analytics("summary", queried_user.pk, get_response_data)
         return Response(response_data)
 
 
@@ -66,22 +75,73 @@ def user_full_summary_detail(request):
 
     # get method only 
     if request.method == "GET": 
-        interval_expense_dict = interval_total_expense(request.user)
 
-        # initial first date and last date 
-        initial_first_date = interval_expense_dict["month"][0]["first_date"]
-        initial_last_date = interval_expense_dict["month"][0]["last_date"]
+        def get_response_data(): 
+            interval_expense_dict = interval_total_expense(request.user)
+
+            # initial first date and last date 
+            initial_first_date = interval_expense_dict["month"][0]["first_date"]
+            initial_last_date = interval_expense_dict["month"][0]["last_date"]
 
-        # compute the initial list of transaction
-        initial_transactions = Transaction.objects.filter(
-            user=request.user,
-            occur_date__gte=initial_first_date, occur_date__lte=initial_last_date).order_by("-occur_date")[:10]
+            # compute the initial list of transaction
+            initial_transactions = Transaction.objects.filter(
+                user=request.user,
+                occur_date__gte=initial_first_date, occur_date__lte=initial_last_date).order_by("-occur_date")[:10]
+            
+            initial_transaction_data = TransactionSerializer.fast_list(initial_transactions)
+            
+            # structure of the response data
+            return {
+                "latest_interval_expense": interval_expense_dict,
+                "initial_transaction_data": initial_transaction_data,
+            }
         
-        initial_transaction_data = TransactionSerializer(initial_transactions, many=True).data
+        # only recompute if the user's data or the date has changed 
+        response_data = cached_analytics("full_summary", request.user.pk, get_response_data)
+        return Response(response_data)
+
+
+# the number of months of the expense history by default, and at most 
+DEFAULT_HISTORY_MONTHS = 36
+MAX_HISTORY_MONTHS = 120
+
+
+"""
+handling the long-range history of the expense of the user, month by month, latest first 
+the months before the horizon of the archive are aggregated from the archive, without querying the database 
+params: first_month, last_month (YYYY-MM), the latest 36 months by default 
+"""
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def user_expense_history(request): 
+
+    # get method only 
+    if request.method == "GET": 
+        last_month = parse_history_month(request.query_params.get("last_month"), get_period_calendar().today)
+        first_month = parse_history_month(
+            request.query_params.get("first_month"), add_months(last_month, 1 - DEFAULT_HISTORY_MONTHS))
+
+        # validate 
+        if first_month > last_month: 
+            raise ValidationError({"message": "The first month is after the last month"})
+        if len(month_starts(first_month, last_month)) > MAX_HISTORY_MONTHS: 
+            raise ValidationError({"message": f"The history is limited to {MAX_HISTORY_MONTHS} months"})
+
+        def get_response_data(): 
+            return monthly_expense_history(request.user, first_month, last_month)
         
-        # structure of the response data
-        response_data = {
-            "latest_interval_expense": interval_expense_dict,
-            "initial_transaction_data": initial_transaction_data,
-        }
-        return Response(response_data)
\ No newline at end of file
+        # only recompute if the user's data or the date has changed 
+        response_data = cached_analytics(
+            "expense_history", request.user.pk, get_response_data, scope=f"{first_month}:{last_month}")
+        return Response(response_data)
+
+
+# the first date of the month of the param (YYYY-MM), or of the default date if the param isn't given 
+def parse_history_month(arg_month: str, default_date: date) -> date: 
+    if arg_month is None: 
+        return month_start(default_date)
+    try: 
+        year, month = arg_month.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError: 
+        raise ValidationError({"message": "The month has to be in the format YYYY-MM"})
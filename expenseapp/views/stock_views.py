@@ -1,12 +1,47 @@
+import re
+from datetime import datetime, timedelta
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import ValidationError
+from django.core.exceptions import ValidationError as ModelValidationError
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from expenseapp.models import DateStockPrice, Stock, PortfolioValue
-from expenseapp.serializers import PortfolioValueSerializer, StockSerializer, StockPriceSerializer
-from expenseapp.finance import load_stock_data
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from expenseapp.models import Holding, Security, StockJob, PortfolioValue
+from expenseapp.serializers import (
+    PortfolioValueSerializer, SecuritySerializer, StockJobSerializer, StockSerializer, StockPriceSerializer, 
+    columnar_series
+)
+from expenseapp.renderers import ColumnarJSONRenderer
+from expenseapp.finance import (
+    cached_portfolio_value_points, get_period_calendar, portfolio_value_series, portfolio_values_materialized
+)
+from expenseapp.tasks import load_security_data
+
+# the symbols of the stocks, checked before the job of the symbol is created 
+SYMBOL_PATTERN = re.compile(r"^[A-Za-z0-9.^=-]{1,10}$")
+
+# the renderers of the time series endpoints, ?format=columnar selects the columnar one 
+SERIES_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+
+
+# the date of the since param (MM/DD/YYYY, like the dates of the series), None if the param isn't given 
+def parse_since_date(arg_since: str): 
+    if arg_since is None: 
+        return None
+    try: 
+        return datetime.strptime(arg_since, "%m/%d/%Y").date()
+    except ValueError: 
+        raise ValidationError({"message": "The since date has to be in the format MM/DD/YYYY"})
+
+
+# if the columnar format of the time series is requested 
+def is_columnar(request) -> bool: 
+    return getattr(request.accepted_renderer, "format", None) == ColumnarJSONRenderer.format
 
 # handling the list of stocks 
 class StockList(APIView): 
@@ -14,8 +49,8 @@ class StockList(APIView):
 
     # get the response data 
     def get_response_data(self, request):
-        stock_list = Stock.objects.filter(user=request.user)
-        response_data = StockSerializer(stock_list, many=True).data
+        stock_list = Holding.objects.filter(user=request.user)
+        response_data = StockSerializer.fast_list(stock_list)
         return response_data
     
     # GET method, return the list of stock of the user 
@@ -23,72 +58,133 @@ class StockList(APIView):
         response_data = self.get_response_data(request)
         return Response(response_data)
     
-    # POST method, add the stock the list of stock of user 
-    @transaction.atomic
+    """
+        POST method, add the stock to the list of stock of user 
+        if the security of the symbol is already loaded, the stock is added right away (201)
+        otherwise, the pending security is created and its market data is loaded by the job in the background (202), 
+        so the request never waits for the provider of the market data 
+    """
     def post(self, request, format=None): 
         request_data = request.data 
         request_data["user"] = request.user.pk
-        symbol = request_data["symbol"]
-
-        # load the price data of the stock with the given symbol 
-        try: 
-            stock_data = load_stock_data(symbol)
-        except IndexError: # if the stock with the given symbol isn't found 
-            return Response({"error": "No stock with the given symbol"}, status=status.HTTP_404_NOT_FOUND)
-        
-        stock_price_data = stock_data.pop("price_data")
-        for data_field in list(stock_data.keys()): 
-            request_data[data_field] = stock_data[data_field]
-
-        # add to the list 
+        symbol = str(request_data.get("symbol", ""))
+        if not SYMBOL_PATTERN.match(symbol): 
+            return Response({"error": "The symbol is invalid"}, status=status.HTTP_400_BAD_REQUEST)
+
+        """
+            the concurrent request adding the same symbol (by the same user, or the new symbol by another user) 
+            makes this one fail on the unique constraints, so it's tried once more, 
+            and then sees the stock or the security added by the other request 
+        """
+        for attempt in range(2): 
+            try: 
+                with transaction.atomic(): 
+                    return self.add_stock(request, symbol)
+            except (IntegrityError, ModelValidationError): 
+                if attempt > 0: 
+                    return Response({"error": "The stock couldn't be added, please try again"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # add the stock of the symbol to the list of stock of the user, in the database transaction of post()
+    def add_stock(self, request, symbol: str) -> Response: 
+        request_data = request.data 
         new_stock_serializer = StockSerializer(data=request_data)
-        if new_stock_serializer.is_valid(): 
-            created_stock = new_stock_serializer.save() 
+        if not new_stock_serializer.is_valid(): 
+            return Response(new_stock_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            # add all of the price of the stock
-            stock_price_list = [] 
-            for i in range(len(stock_price_data)): 
-                stock_price_list.append(DateStockPrice(
-                    stock=created_stock, date=stock_price_data[i]["date"], given_date_close=stock_price_data[i]["given_date_close"]
-                ))
-            DateStockPrice.objects.bulk_create(stock_price_list)
+        if Holding.objects.filter(user=request.user, security__symbol=symbol).exists(): 
+            return Response({"error": "The stock with the given symbol already exists"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # lock the security, so it isn't loaded by its job while the stock is being added 
+        security = Security.objects.select_for_update().filter(symbol=symbol).first()
+        if security is not None and security.state == "ready": 
+            new_stock_serializer.save(security=security) 
 
             # return the response data
             response_data = self.get_response_data(request)
             return Response(response_data, status=status.HTTP_201_CREATED)
-        return Response(new_stock_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        """
+            the market data of the symbol is loaded if no other user has added it, 
+            or if the pending security has no job left loading it (its task was lost) 
+        """
+        if security is None: 
+            new_security_serializer = SecuritySerializer(data={
+                "symbol": symbol, "corporation": request_data.get("corporation"), "name": request_data.get("name"), 
+                "last_updated_date": get_period_calendar().today, "state": "pending"
+            })
+            if not new_security_serializer.is_valid(): 
+                # the security was added by the concurrent request since it was looked up, so post() tries again 
+                if Security.objects.filter(symbol=symbol).exists(): 
+                    raise IntegrityError(f"The security {symbol} was added concurrently")
+                return Response(new_security_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            security = new_security_serializer.save()
+            needs_loading = True
+        else: 
+            # the job pending or running for longer than the timeout has lost its task 
+            job_timeout = timedelta(seconds=getattr(settings, "STOCK_JOB_TIMEOUT", 60 * 60))
+            needs_loading = not StockJob.objects.filter(
+                security=security, state__in=["pending", "running"], created_at__gte=timezone.now() - job_timeout
+            ).exists()
+
+        new_stock_serializer.save(security=security) 
+        stock_job = StockJob.objects.create(user=request.user, security=security, symbol=symbol)
+        if needs_loading: 
+            security_id = security.pk
+            transaction.on_commit(lambda: load_security_data.delay(security_id))
+        return Response(StockJobSerializer(stock_job).data, status=status.HTTP_202_ACCEPTED)
+    
+
+# handling the job loading the market data of the stock added by the user 
+class StockJobDetail(APIView): 
+    permission_classes = [IsAuthenticated]
+
+    # GET method, return the state of the job 
+    def get(self, request, job_id, format=None): 
+        stock_job = get_object_or_404(StockJob, pk=job_id, user=request.user)
+        return Response(StockJobSerializer(stock_job).data)
     
 
 # handling the price detail of the stock 
 class StockPriceDetail(APIView): 
     permission_classes = [IsAuthenticated]
+    renderer_classes = SERIES_RENDERER_CLASSES
 
-    def get_response_data(self, request, symbol): 
-        stock = get_object_or_404(Stock, user=request.user, symbol=symbol)
-        # list of prices of the stock 
-        stock_price_list = stock.datestockprice_set.order_by("date")
+    """
+        get the response data, with the prices after the since date only (all of them if it's None), 
+        in the columnar format if columnar is True 
+    """
+    def get_response_data(self, request, symbol, since_date=None, columnar=False): 
+        stock = get_object_or_404(Holding.objects.select_related("security"), user=request.user, security__symbol=symbol)
+        # list of prices of the stock, shared by all of the holders of the symbol 
+        stock_price_list = stock.security.datestockprice_set.order_by("date")
+        if since_date is not None: 
+            stock_price_list = stock_price_list.filter(date__gt=since_date)
 
         # response data 
         response_data = {
             "stock": StockSerializer(stock).data, 
             "price_list": {}
         }
+        if columnar: 
+            response_data["price_list"] = columnar_series(list(stock_price_list.values_list("date", "given_date_close")))
+            return response_data
 
-        price_list = StockPriceSerializer(stock_price_list, many=True).data
+        price_list = StockPriceSerializer.fast_list(stock_price_list)
         for price in price_list: 
             response_data["price_list"][price["date"]] = price["given_date_close"]
         return response_data
     
-    # GET method, return the detail of the stock, including its list of price
+    # GET method, return the detail of the stock, including its list of price (after the since date)
     def get(self, request, symbol, format=None): 
-        response_data = self.get_response_data(request, symbol)
+        since_date = parse_since_date(request.query_params.get("since"))
+        response_data = self.get_response_data(request, symbol, since_date, is_columnar(request))
         return Response(response_data)
     
     # PUT method, update the stock 
     def put(self, request, symbol, format=None): 
         request_data = request.data
         request_data["user"] = request.user.pk
-        stock = get_object_or_404(Stock, user=request.user, symbol=symbol)
+        stock = get_object_or_404(Holding, user=request.user, security__symbol=symbol)
 
         updated_stock_serializer = StockSerializer(stock, data=request_data)
         if updated_stock_serializer.is_valid(): 
@@ -101,18 +197,36 @@ class StockPriceDetail(APIView):
     
     # DELETE method, delete the stock 
     def delete(self, request, symbol, format=None): 
-        stock = get_object_or_404(Stock, user=request.user, symbol=symbol)
+        stock = get_object_or_404(Holding, user=request.user, security__symbol=symbol)
         stock.delete()
         return Response({"message": "Stock deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
     
 
 class PortfolioValueList(APIView): 
     permission_classes = [IsAuthenticated] 
+    renderer_classes = SERIES_RENDERER_CLASSES
 
+    # GET method, return the value of the portfolio of the user on each date (after the since date) 
     def get(self, request, format=None): 
+        since_date = parse_since_date(request.query_params.get("since"))
+
+        # computed from the prices of the holdings, unless the values are materialized by the daily task 
+        if not portfolio_values_materialized(): 
+            points = [
+                point for point in cached_portfolio_value_points(request.user) 
+                if since_date is None or point[0] > since_date
+            ]
+            if is_columnar(request): 
+                return Response(columnar_series(points))
+            return Response(portfolio_value_series(points))
+
         # query the list of portfolios
         portfolio_value_list = PortfolioValue.objects.filter(user=request.user).order_by("date")
-        original_data = PortfolioValueSerializer(portfolio_value_list, many=True).data 
+        if since_date is not None: 
+            portfolio_value_list = portfolio_value_list.filter(date__gt=since_date)
+        if is_columnar(request): 
+            return Response(columnar_series(list(portfolio_value_list.values_list("date", "given_date_value"))))
+        original_data = PortfolioValueSerializer.fast_list(portfolio_value_list)
 
         response_data = {}
         for data_item in original_data: 
@@ -1,7 +1,7 @@
 from django.http import Http404
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-from rest_framework import status, generics
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -9,50 +9,155 @@ from rest_framework.validators import ValidationError
 from expenseapp.models import Account, Transaction
 from expenseapp.serializers import TransactionSerializer
 from expenseapp.finance import get_current_dates
-from datetime import date
+from datetime import date, datetime
 from calendar import monthrange
-from expenseapp.finance import adjust_account_balance
+from expenseapp.finance import (
+    apply_transactions_to_balances, apply_transactions_to_rollup, 
+    import_transactions, parse_csv_rows, parse_ofx_rows, ofx_to_csv_row
+)
+from django.db import transaction
+from django.db.models import Q
+import base64
+import binascii
+import codecs
+import json
 
-# TODO: ADD PAGINATION
 
-# base transaction view to handle pagination 
+"""
+base transaction view to handle the keyset (cursor) pagination on (occur_date, id), latest first
+the cursor stays stable even if new transactions are inserted between the pages 
+params: cursor (the next_cursor of the previous page), page_size
+"""
 class TransactionView(APIView): 
     permission_classes = [IsAuthenticated]
 
+    # the number of transactions of each page, given by the page_size param 
+    def get_page_size(self, request) -> int: 
+        default_page_size = getattr(settings, "TRANSACTION_PAGE_SIZE", 20)
+        max_page_size = getattr(settings, "TRANSACTION_MAX_PAGE_SIZE", 100)
+        try: 
+            page_size = int(request.query_params.get("page_size", default_page_size))
+        except ValueError: 
+            raise ValidationError({"message": "Page size must be an integer"})
+        return min(max(page_size, 1), max_page_size)
+
+    # encode the position of the transaction (the row of values()) into the opaque cursor 
+    def encode_cursor(self, last_transaction: dict) -> str: 
+        position = {"occur_date": last_transaction["occur_date"].isoformat(), "id": last_transaction["id"]}
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+    
+    # decode the cursor into the position (occur_date, id) of the last transaction of the previous page
+    def decode_cursor(self, cursor: str) -> tuple: 
+        try: 
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(position["occur_date"]), int(position["id"])
+        except (binascii.Error, ValueError, KeyError, TypeError): 
+            raise ValidationError({"message": "Invalid cursor"})
+
+    """
+        the query of the page of the transaction list after the position (occur_date, id) of the cursor, 
+        with one more transaction to know if there is the next page, as the rows of the fast path 
+    """
+    @classmethod
+    def page_queryset(cls, transaction_list, page_size: int, position: tuple=None): 
+        transaction_list = transaction_list.order_by("-occur_date", "-id")
+
+        # only the transactions that come after the last transaction of the previous page
+        if position is not None: 
+            occur_date, pk = position
+            transaction_list = transaction_list.filter(
+                Q(occur_date__lt=occur_date) | Q(occur_date=occur_date, id__lt=pk))
+        return transaction_list.values(*TransactionSerializer.fast_lookups())[:page_size + 1]
+
+    # return the page of the transaction list after the cursor, along with the cursor of the next page 
+    def paginate(self, request, transaction_list) -> dict: 
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get("cursor")
+        position = self.decode_cursor(cursor) if cursor else None
+
+        page = list(self.page_queryset(transaction_list, page_size, position))
+        next_cursor = self.encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+
+        return {
+            "results": TransactionSerializer.fast_list(page[:page_size]), 
+            "next_cursor": next_cursor,
+        }
+
 
 # handling the list of transactions of the user 
-class UserTransactionList(APIView): 
-    permission_classes = [IsAuthenticated]
+class UserTransactionList(TransactionView): 
 
     # get custom data as a response to the API 
     def get_response_data(self, request):
-        # query and serialize the transaction list 
-        transaction_list = Transaction.objects.filter(user=request.user).order_by("-occur_date")[:20]
-        response_data = TransactionSerializer(transaction_list, many=True).data
-        return response_data
+        # query and paginate the transaction list 
+        transaction_list = Transaction.objects.filter(user=request.user)
+        return self.paginate(request, transaction_list)
     
-    # GET method, return the list of 15 latest transactions 
+    # GET method, return the page of latest transactions 
     def get(self, request, format=None): 
         response_data = self.get_response_data(request)
         return Response(response_data)
     
     # POST method, create new transaction
+    @transaction.atomic
     def post(self, request, format=None): 
         new_trans_serializer = TransactionSerializer(data=request.data)
         if new_trans_serializer.is_valid(): 
             new_transaction = new_trans_serializer.save() # call the create method 
 
-            # adjust balance of the associated account 
-            adjust_account_balance(new_transaction.account, new_transaction)
+            # adjust balance of the associated account (with one UPDATE), and the daily rollup
+            apply_transactions_to_balances([new_transaction])
+            apply_transactions_to_rollup([new_transaction])
 
             response_data = self.get_response_data(request)
             return Response(response_data, status=status.HTTP_201_CREATED)
         return Response(new_trans_serializer.errors, status = status.HTTP_400_BAD_REQUEST)
 
 
+"""
+view to import the transactions from the bank export (CSV or OFX) of the user
+the file is parsed and created in chunks, and the summary of the import is returned instead of the list 
+form data: file, account (the default account of the rows), file_type ("csv" or "ofx", otherwise by the file's extension)
+"""
+class TransactionImport(APIView): 
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None): 
+        uploaded_file = request.FILES.get("file")
+        if uploaded_file is None: 
+            raise ValidationError({"message": "File not specified"})
+        
+        file_type = request.data.get("file_type") or uploaded_file.name.rsplit(".", 1)[-1]
+        file_type = file_type.lower()
+        if file_type not in ["csv", "ofx", "qfx"]: 
+            raise ValidationError({"message": "File type must be csv or ofx"})
+
+        default_account_id = request.data.get("account")
+        if default_account_id is not None: 
+            try: 
+                default_account_id = int(default_account_id)
+            except ValueError: 
+                raise ValidationError({"message": "Account must be an integer"})
+        
+        # the lines of the file are decoded one at a time, so the file is never read into memory at once
+        lines = codecs.iterdecode(uploaded_file, "utf-8-sig")
+        if file_type == "csv": 
+            raw_rows = parse_csv_rows(lines)
+        else: 
+            raw_rows = (ofx_to_csv_row(raw_row) for raw_row in parse_ofx_rows(lines))
+
+        try: 
+            import_summary = import_transactions(
+                request.user, raw_rows, default_account_id, 
+                chunk_size=getattr(settings, "TRANSACTION_IMPORT_CHUNK_SIZE", 5000))
+        except UnicodeDecodeError: 
+            raise ValidationError({"message": "File must be encoded in UTF-8"})
+        return Response(import_summary, status=status.HTTP_201_CREATED)
+
+
 """
 view to handle the list of transactions between 2 given dates in the endpoints 
-requires pagination 
+paginated by the cursor of TransactionView
 params: first_date, last_date 
 """
 class IntervalTransactionList(TransactionView): 
@@ -76,15 +181,15 @@ class IntervalTransactionList(TransactionView):
         # list of transactions between 2 dates 
         transaction_list = Transaction.objects.filter(
             user=request.user, 
-            occur_date__gte=first_date, occur_date__lte=last_date).order_by("-occur_date")
+            occur_date__gte=first_date, occur_date__lte=last_date)
 
-        # return serialized data
-        return Response(TransactionSerializer(transaction_list, many=True).data)
+        # return the page of serialized data
+        return Response(self.paginate(request, transaction_list))
     
 
 """
 view to handle the list of latest transactions in each category for the user 
-requires pagination 
+paginated by the cursor of TransactionView
 """
 class CategoryTransactionList(TransactionView): 
 
@@ -97,15 +202,15 @@ class CategoryTransactionList(TransactionView):
 
         transaction_list = Transaction.objects.filter(
             user=request.user, category=arg_cat,
-            occur_date__gte=first_date, occur_date__lte=last_date).order_by("-occur_date")
+            occur_date__gte=first_date, occur_date__lte=last_date)
         
-        # serialized data 
-        return Response(TransactionSerializer(transaction_list, many=True).data)
+        # the page of serialized data 
+        return Response(self.paginate(request, transaction_list))
     
 
 """
 views to handle list of transactions of category between 2 dates
-requires pagination 
+paginated by the cursor of TransactionView
 params: first_date, last_date, category
 """ 
 class BothTransactionList(TransactionView): 
@@ -131,24 +236,23 @@ class BothTransactionList(TransactionView):
 
         transaction_list = Transaction.objects.filter(
             user=request.user, category=category, 
-            occur_date__gte=first_date, occur_date__lte=last_date).order_by("-occur_date")
+            occur_date__gte=first_date, occur_date__lte=last_date)
         
-        return Response(TransactionSerializer(transaction_list, many=True).data)
+        return Response(self.paginate(request, transaction_list))
 
 
-# view to handle the 20 latest transactions of the account
-class AccountTransactionList(generics.ListAPIView): 
-    permission_classes = [IsAuthenticated]
-    serializer_class = TransactionSerializer
+# view to handle the pages of latest transactions of the account
+class AccountTransactionList(TransactionView): 
 
-    def get_queryset(self):
-        queried_account = get_object_or_404(Account, pk=self.kwargs["pk"])
-        return Transaction.objects.filter(account=queried_account).order_by("-occur_date")[:20]
+    def get(self, request, pk, format=None): 
+        queried_account = get_object_or_404(Account, pk=pk)
+        transaction_list = Transaction.objects.filter(account=queried_account)
+        return Response(self.paginate(request, transaction_list))
     
 
 """
 handling the list of latest transactions in each category for the account
-requires pagination 
+paginated by the cursor of TransactionView
 params: category
 """
 class AccBothTransactionList(TransactionView): 
@@ -158,13 +262,13 @@ class AccBothTransactionList(TransactionView):
         if arg_category is None: 
             raise ValidationError({"error": "Category not specified"})
         
-        queried_account = get_current_dates(Account, pk=pk)
+        queried_account = get_object_or_404(Account, pk=pk)
         
         # the list of transactions with picked category 
         first_date, last_date = get_current_dates(period_type="month")
 
         transaction_list = Transaction.objects.filter(
             account=queried_account, category=arg_category, 
-            occur_date__gte=first_date, occur_date__lte=last_date).order_by("-occur_date")
+            occur_date__gte=first_date, occur_date__lte=last_date)
         
-        return Response(TransactionSerializer(transaction_list, many=True).data)
\ No newline at end of file
+        return Response(self.paginate(request, transaction_list))
\ No newline at end of file
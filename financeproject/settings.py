@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'expenseapp.middleware.PeriodCalendarMiddleware',
 
     'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
@@ -74,6 +75,13 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = 'expenseapp.User'
 
+# the default and max number of transactions of each page of the transaction lists
+TRANSACTION_PAGE_SIZE = 20
+TRANSACTION_MAX_PAGE_SIZE = 100
+
+# the number of imported transactions created by each bulk_create()
+TRANSACTION_IMPORT_CHUNK_SIZE = 5000
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -157,6 +165,12 @@ DATABASES = {
     "default": dj_database_url.parse(os.environ.get('DATABASE_URL', ''))
 }
 
+# the SQLite test database is a file instead of the memory, so the concurrent writers of the tests share it, 
+# and each write transaction takes the lock when it begins and waits for the other ones instead of failing 
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3": 
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+    DATABASES["default"].setdefault("OPTIONS", {}).update({"timeout": 20, "transaction_mode": "IMMEDIATE"})
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -189,11 +203,64 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Cache of the analytics of the summary endpoints, shared by all the processes on the Redis-compatible server of REDIS_URL 
+# without it nothing is cached, since the cache in the local memory of each process would miss the bumped data versions 
+# of the other processes (the web workers and the celery workers), and serve the stale analytics 
+if os.environ.get("REDIS_URL"): 
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_URL"),
+        }
+    }
+else: 
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        }
+    }
+
+# Backend of the expense and budget finance functions: "orm" or "numpy" (vectorized)
+FINANCE_BACKEND = os.environ.get("FINANCE_BACKEND", "orm")
+
+# the provider of the market data of the stocks, FixtureProvider reads MARKET_DATA_FIXTURE_DIR instead of the network
+MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "expenseapp.finance.market_data.CachingProvider")
+MARKET_DATA_FIXTURE_DIR = os.environ.get("MARKET_DATA_FIXTURE_DIR", BASE_DIR / "fixtures" / "market_data")
+
+# the provider cached by CachingProvider, on the disk for MARKET_DATA_CACHE_TTL seconds, and in the memory up to the bytes
+MARKET_DATA_CACHED_PROVIDER = os.environ.get("MARKET_DATA_CACHED_PROVIDER", "expenseapp.finance.market_data.YFinanceProvider")
+MARKET_DATA_CACHE_DIR = os.environ.get("MARKET_DATA_CACHE_DIR", BASE_DIR / "cache" / "market_data")
+MARKET_DATA_CACHE_TTL = 6 * 60 * 60
+MARKET_DATA_CACHE_MAX_MEMORY = 64 * 1024 * 1024
+
+# the number of symbols of each download of the provider
+MARKET_DATA_CHUNK_SIZE = 100
+
+# the number of rows of each DELETE of the retention tasks, and the seconds they pause between the DELETEs
+RETENTION_BATCH_SIZE = 5000
+RETENTION_PAUSE = 0.05
+
+# the directory of the archive of the expired transactions, one compressed file per month and shard of users
+TRANSACTION_ARCHIVE_DIR = os.environ.get("TRANSACTION_ARCHIVE_DIR", BASE_DIR / "archive" / "transactions")
+TRANSACTION_ARCHIVE_SHARDS = 64
+# the maximum bytes of the archive files kept in the memory of each process by the analytics
+TRANSACTION_ARCHIVE_CACHE_MAX_MEMORY = 32 * 1024 * 1024
+
+# the source of the portfolio values: "computed" from the prices and the shares on each request, 
+# or "materialized" in the table of the portfolio values by the daily task
+PORTFOLIO_VALUE_SOURCE = os.environ.get("PORTFOLIO_VALUE_SOURCE", "computed")
+# the seconds the computed portfolio values are cached, 0 to compute them on every request
+PORTFOLIO_VALUE_CACHE_TIMEOUT = 300
+
 # Celery Configuration Options
 CELERY_TIMEZONE =  "US/Central"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# the seconds the job loading the market data of the stock may stay pending or running, 
+# after that its task is taken as lost, and the next stock added with the same symbol enqueues it again 
+STOCK_JOB_TIMEOUT = 60 * 60
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/